@@ -1,7 +1,9 @@
 # 10/23/16
 # The OneTileset Creator wizard for end users.
 
+import concurrent.futures
 import json
+import multiprocessing
 import os
 import os.path
 import re
@@ -12,6 +14,7 @@ import traceback
 from PyQt5 import QtCore, QtGui, QtWidgets; Qt = QtCore.Qt
 from PyQt5.Qt import PYQT_VERSION_STR
 import nsmbulib
+import nsmbulib.Object
 import nsmbulib.Sarc
 import nsmbulib.Tileset
 import nsmbulib.Yaz0
@@ -24,6 +27,7 @@ ONE_TILESET_SCRIPTS = {
     (True, False): 'oneTilesetScript_nsmbu.json',
     (False, True): 'oneTilesetScript_nslu.json',
 }
+TIMING_REPORT_NAME = 'timing_report.txt'
 
 
 ########################################################################
@@ -127,6 +131,9 @@ translations = {
 
         'Output will be written to <code>[path]</code>': '',
 
+        'Quick mode (use all CPU cores, and skip objects that are '
+        'already up to date)': '',
+
 
         'Creating OneTileset': '',
 
@@ -136,6 +143,8 @@ translations = {
 
         'Loading <code>[path]</code>': '',
 
+        'Processed <code>[path]</code>': '',
+
         'Processing <code>[tset]</code> from <code>[path]</code>': '',
 
         'Finished.': '',
@@ -306,6 +315,8 @@ translations = {
 
         'Loading <code>[path]</code>': 'Ładowanie <code>[path]</code>',
 
+        'Processed <code>[path]</code>': 'Przetworzono <code>[path]</code>',
+
         'Processing <code>[tset]</code> from <code>[path]</code>':
         'Przetwarzanie <code>[tset]</code> z <code>[path]</code>',
 
@@ -494,6 +505,8 @@ translations = {
 
         'Loading <code>[path]</code>': '<code>[path]</code> aan het laden...',
 
+        'Processed <code>[path]</code>': '<code>[path]</code> verwerkt',
+
         'Processing <code>[tset]</code> from <code>[path]</code>':
         '<code>[tset]</code> uit <code>[path]</code> aan het behandelen...',
 
@@ -614,34 +627,151 @@ def updateDynTrans():
 ########################################################################
 
 
-def export(object, name, path, info):
+def setObjectInfo(object, name, info):
     """
-    Export object `object` to path `path`, with name `name` and info `info`.
+    Give object `object` name `name` and info `info`.
     """
     object.name = name
     object.role = object.Role(info.get('role', '?'))
     object.decorative = info.get('decorative', False)
     object.description = info.get('description', '')
 
-    if not os.path.isdir(path):
-        os.makedirs(path)
 
-    objectFiles = object.asNewFormat()
-    for fn, fd in objectFiles.items():
+def objectFileNames(name):
+    """
+    Return the names of the files nsmbulib.Tileset.exportToNew() writes
+    for an object with name `name`.
+    """
+    return nsmbulib.Object.newFormatFileNames(name)
+
+
+def isUpToDate(name, path, sourceTime):
+    """
+    Check if the object with name `name` has already been exported to
+    path `path` after `sourceTime` (a timestamp).
+    """
+    for fn in objectFileNames(name):
         fullFn = os.path.join(path, fn)
-        with open(fullFn, 'wb') as f:
-            f.write(fd)
+        if not os.path.isfile(fullFn) or os.path.getmtime(fullFn) < sourceTime:
+            return False
+    return True
+
+
+def processLevel(levelPath, tilesets, outputPath, scriptTime,
+        skipUpToDate=False, tilesetStarted=None, exportProcesses=1):
+    """
+    Export the objects the script wants from the tilesets in one level.
+    `tilesets` is the level's part of the script. Objects whose files
+    are newer than both the level and `scriptTime` are skipped if
+    `skipUpToDate` is True. `tilesetStarted`, if given, is called with
+    each tileset's name before it's processed. The objects' PNGs are
+    encoded in up to `exportProcesses` worker processes (see
+    nsmbulib.Tileset.exportToNew()). By default, that's done in this
+    process: each tileset only has a few objects, so starting worker
+    processes for every one of them would take longer than it saves.
+    This can run in a worker process. It returns a dict of timing
+    information for the level.
+    """
+    startTime = time.perf_counter()
+    timings = {
+        'level': levelPath,
+        'load': 0, 'decode': 0, 'export': 0,
+        'exported': 0, 'skipped': 0,
+        }
+    sourceTime = max(os.path.getmtime(levelPath), scriptTime)
+
+    def loadLevel():
+        with open(levelPath, 'rb') as f:
+            levelData = f.read()
+
+        if nsmbulib.Yaz0.isCompressed(levelData):
+            levelData = nsmbulib.Yaz0.decompress(levelData)
+
+        return nsmbulib.Sarc.load(levelData)
+
+    level = None # Not loaded until something actually needs exporting
+    for tilesetName, objectDefs in tilesets.items():
+        if tilesetStarted is not None:
+            tilesetStarted(tilesetName)
+
+        toExport = {}
+        for objectNum, objectDef in objectDefs.items():
+            if skipUpToDate and isUpToDate(
+                    objectDef['name'],
+                    os.path.join(outputPath, objectDef['path']),
+                    sourceTime):
+                timings['skipped'] += 1
+            else:
+                toExport[int(objectNum)] = objectDef
+        if not toExport: continue
+
+        if level is None:
+            t = time.perf_counter()
+            level = loadLevel()
+            timings['load'] = time.perf_counter() - t
+
+        if tilesetName not in level:
+            raise RuntimeError(tilesetName + ' could not be found.')
 
+        # Only decode the tiles these objects actually use
+        t = time.perf_counter()
+        tileset = nsmbulib.Tileset.load(level[tilesetName], objectNums=toExport)
+        timings['decode'] += time.perf_counter() - t
 
-def createOneTileset(updateProgress, nsmbuPath, nsluPath, outputPath):
+        t = time.perf_counter()
+        objects = []
+        for objectNum, objectDef in toExport.items():
+            objectDef = dict(objectDef)
+            objectName, newPath = objectDef.pop('name'), objectDef.pop('path')
+
+            setObjectInfo(tileset[objectNum], objectName, objectDef)
+            objects.append((newPath, tileset[objectNum]))
+
+        nsmbulib.Tileset.exportToNew(
+            objects, outputPath, processes=exportProcesses)
+        timings['exported'] += len(objects)
+        timings['export'] += time.perf_counter() - t
+
+    timings['total'] = time.perf_counter() - startTime
+    return timings
+
+
+def writeTimingReport(path, allTimings, totalTime):
+    """
+    Write a plain-text report of how long each level took to process
+    """
+    lines = ['OneTileset Creator %s timing report' % VERSION, '']
+    lines.append('%8s %8s %8s %8s %8s %8s  %s' % (
+        'Total', 'Load', 'Decode', 'Export', 'Exported', 'Skipped', 'Level'))
+    for t in sorted(allTimings, key=lambda t: -t['total']):
+        lines.append('%7.2fs %7.2fs %7.2fs %7.2fs %8d %8d  %s' % (
+            t['total'], t['load'], t['decode'], t['export'],
+            t['exported'], t['skipped'], t['level']))
+    lines.append('')
+    lines.append('%d levels, %d objects exported, %d skipped, %.2fs in total' % (
+        len(allTimings),
+        sum(t['exported'] for t in allTimings),
+        sum(t['skipped'] for t in allTimings),
+        totalTime))
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def createOneTileset(updateProgress, nsmbuPath, nsluPath, outputPath, *,
+        quick=False):
     """
     This is the actual main function that creates OneTileset.
     `updateProgress` should be a callback that takes two parameters:
     a string describing the current operation and an amount-done value
     between 0 and 1. ONE_TILESET_DIR_NAME will be appended to
     `outputPath` for you.
+    If `quick` is True, levels are processed in parallel worker
+    processes, objects that are already up to date are skipped, and a
+    timing report is written to TIMING_REPORT_NAME in the output folder.
     """
     updateProgress(_('Setting up'), 0)
+    startTime = time.perf_counter()
 
     # Sanitize paths and append ONE_TILESET_DIR_NAME to the output path
     if not os.path.isdir(outputPath):
@@ -654,16 +784,10 @@ def createOneTileset(updateProgress, nsmbuPath, nsluPath, outputPath):
     fn = ONE_TILESET_SCRIPTS[(nsmbuPath is not None, nsluPath is not None)]
     with open(fn, 'r', encoding='utf-8') as f:
         script = json.load(f)
+    scriptTime = os.path.getmtime(fn)
 
-    # Count the total number of levels and tilesets we'll have to open.
-    # We count these together, and increment a counter whenever we
-    # finish loading either one.
-    totalThingsToLoad = 0
-    for levels in script.values():
-        for tilesets in levels.values():
-            totalThingsToLoad += len(tilesets) + 1
-    thingsLoaded = -1
-
+    # Find all of the levels first
+    levels = []
     for game, courseResPack in [('NSMBU', nsmbuPath), ('NSLU', nsluPath)]:
         if courseResPack is None: continue
         if game not in script: continue
@@ -674,42 +798,56 @@ def createOneTileset(updateProgress, nsmbuPath, nsluPath, outputPath):
                 if os.path.isfile(levelPath): break
             else:
                 raise RuntimeError(levelName + ' could not be found.')
+            levels.append((levelPath, tilesets))
+
+    allTimings = []
+    if quick:
+        # Each level is independent of the others, so they can all be
+        # processed at the same time. Progress is reported per level.
+        with concurrent.futures.ProcessPoolExecutor() as executor:
+            futures = [
+                executor.submit(processLevel,
+                    levelPath, tilesets, outputPath, scriptTime, True)
+                for levelPath, tilesets in levels]
+            for future in concurrent.futures.as_completed(futures):
+                timings = future.result()
+                allTimings.append(timings)
+                updateProgress(
+                    _('Processed <code>[path]</code>', path=timings['level']),
+                    len(allTimings) / len(levels))
+
+    else:
+        # Count the total number of levels and tilesets we'll have to
+        # open. We count these together, and increment a counter
+        # whenever we finish loading either one.
+        totalThingsToLoad = 0
+        for levelPath, tilesets in levels:
+            totalThingsToLoad += len(tilesets) + 1
+        thingsLoaded = -1
 
+        for levelPath, tilesets in levels:
             thingsLoaded += 1
             updateProgress(
                 _('Loading <code>[path]</code>', path=levelPath),
                 thingsLoaded / totalThingsToLoad)
 
-            with open(levelPath, 'rb') as f:
-                levelData = f.read()
-
-            if nsmbulib.Yaz0.isCompressed(levelData):
-                levelData = nsmbulib.Yaz0.decompress(levelData)
-
-            level = nsmbulib.Sarc.load(levelData)
-
-            for tilesetName, objectDefs in tilesets.items():
-
+            def tilesetStarted(tilesetName):
+                nonlocal thingsLoaded
                 thingsLoaded += 1
                 updateProgress(_(
                     'Processing <code>[tset]</code> from <code>[path]</code>',
                     tset=tilesetName, path=levelPath),
                     thingsLoaded / totalThingsToLoad)
 
-                if tilesetName not in level:
-                    raise RuntimeError(tilesetName + ' could not be found.')
-
-                tileset = nsmbulib.Tileset.load(level[tilesetName])
+            allTimings.append(processLevel(
+                levelPath, tilesets, outputPath, scriptTime,
+                tilesetStarted=tilesetStarted))
 
-                for objectNum, objectDef in objectDefs.items():
-                    objectName, newPath = objectDef['name'], objectDef['path']
-                    del objectDef['name']; del objectDef['path']
-
-                    export(
-                        tileset[int(objectNum)],
-                        objectName,
-                        os.path.join(outputPath, newPath),
-                        objectDef)
+    if quick:
+        os.makedirs(outputPath, exist_ok=True)
+        writeTimingReport(
+            os.path.join(outputPath, TIMING_REPORT_NAME),
+            allTimings, time.perf_counter() - startTime)
 
     updateProgress(_('Finished.'), 1)
 
@@ -1008,9 +1146,17 @@ class ConfirmationPage(QtWidgets.QWizardPage):
         dynTrans(label.setText, '') # placeholder
         wizard.confirmationLabel = label
 
+        # Quick mode checkbox
+        quickCheckbox = QtWidgets.QCheckBox(self)
+        dynTrans(quickCheckbox.setText, 'Quick mode (use all CPU cores, and '
+            'skip objects that are already up to date)')
+        quickCheckbox.setChecked(True)
+        wizard.quickModeCheckbox = quickCheckbox
+
         # Layout
         L = QtWidgets.QVBoxLayout(self)
         L.addWidget(label)
+        L.addWidget(quickCheckbox)
 
 
     def initializePage(self):
@@ -1103,7 +1249,8 @@ class ProgressPage(QtWidgets.QWizardPage):
                     self.progressCallback,
                     self.wizard().chooseInputNSMBUEdit.text(),
                     self.wizard().chooseInputNSLUEdit.text(),
-                    self.wizard().chooseOutputEdit.text())
+                    self.wizard().chooseOutputEdit.text(),
+                    quick=self.wizard().quickModeCheckbox.isChecked())
             except Exception as e:
                 tb = traceback.format_exc().replace('\n', '<br>')
                 tb = tb.replace(' ', '&nbsp;')
@@ -1225,4 +1372,7 @@ def main(argv):
 
     return app.exec_()
 
-main(sys.argv)
\ No newline at end of file
+if __name__ == '__main__':
+    # Quick mode uses worker processes, which import this file again
+    multiprocessing.freeze_support()
+    main(sys.argv)
\ No newline at end of file
@@ -0,0 +1,219 @@
+import collections
+import struct
+import zlib
+
+from PIL import Image
+
+from . import Sarc
+from . import Tile
+from . import Tileset
+from . import Yaz0
+
+
+# A read-only view of NSMBU levels, with just enough parsed to render
+# them without the editor (see renderArea()). Objects are positioned in
+# tiles; sprites and zones in 16ths of a tile, like in the course files.
+
+TILE_SIZE = 60
+
+# Main (Pa0) tilesets are shared by most levels, so the last few that
+# were loaded are kept around (see loadTilesets())
+MAIN_TILESET_CACHE_SIZE = 4
+_mainTilesetCache = collections.OrderedDict()
+
+LevelObject = collections.namedtuple('LevelObject',
+    'tileset idx x y width height contents')
+Sprite = collections.namedtuple('Sprite', 'type x y data')
+Zone = collections.namedtuple('Zone', 'x y width height id')
+
+_objectStruct = struct.Struct('>HhhHHB')
+_spriteStruct = struct.Struct('>HHH10sxx2sxxxx')
+_zoneStruct = struct.Struct('>HHHHxxxxB')
+
+
+class Area:
+    """
+    One area of a level
+    """
+
+    def __init__(self, number, course, layers):
+        """
+        Parse the area from its course file and its three layer files
+        (any of which can be None)
+        """
+        self.number = number
+
+        getblock = struct.Struct('>II')
+        blocks = []
+        for i in range(15):
+            offset, size = getblock.unpack_from(course, i * 8)
+            blocks.append(course[offset:offset + size])
+
+        self.tilesetNames = [
+            name.strip(b'\0').decode('latin-1')
+            for name in struct.unpack_from('32s32s32s32s', blocks[0])]
+
+        self.sprites = []
+        for offset in range(0, len(blocks[7]) - 23, 24):
+            type, x, y, data1, data2 = _spriteStruct.unpack_from(blocks[7], offset)
+            self.sprites.append(Sprite(type, x, y, data1 + data2))
+
+        self.zones = [
+            Zone(*_zoneStruct.unpack_from(blocks[9], offset))
+            for offset in range(0, len(blocks[9]) - 27, 28)]
+
+        self.layers = []
+        for data in layers:
+            objects = []
+            if data is not None:
+                for offset in range(0, len(data) - 15, 16):
+                    type, x, y, w, h, contents = _objectStruct.unpack_from(data, offset)
+                    if type == 0xFFFF: break # end of the layer
+                    objects.append(LevelObject(type >> 12, type & 4095, x, y, w, h, contents))
+            self.layers.append(objects)
+
+
+    def bounds(self):
+        """
+        Return the rect (x, y, w, h, in tiles) containing every zone in
+        the area, or every object if it has no zones
+        """
+        rects = [zoneRect(zone) for zone in self.zones]
+        if not rects:
+            rects = [(o.x, o.y, o.width, o.height) for layer in self.layers for o in layer]
+        if not rects:
+            return (0, 0, 0, 0)
+
+        x1 = min(r[0] for r in rects)
+        y1 = min(r[1] for r in rects)
+        x2 = max(r[0] + r[2] for r in rects)
+        y2 = max(r[1] + r[3] for r in rects)
+        return (x1, y1, x2 - x1, y2 - y1)
+
+
+class Level:
+    """
+    A level, as loaded from a .szs or .sarc file
+    """
+
+    def __init__(self, data, name=''):
+        """
+        Load the level from the file's data. name is the file name,
+        which is used to find the course data in it.
+        """
+        if Yaz0.isCompressed(data):
+            data = Yaz0.decompress(data)
+        self.files = Sarc.load(data)
+
+        # The course data is usually named after the level
+        possibilities = [name]
+        if 'levelname' in self.files:
+            possibilities.append(self.files['levelname'].decode('utf-8'))
+        if name:
+            possibilities.append(name.split()[-1])
+            possibilities.append(name.split()[0])
+            possibilities.append(name.split('.')[0])
+            possibilities.append(name.split('_')[0])
+        for fn in possibilities:
+            if fn in self.files:
+                course = Sarc.load(self.files[fn])
+                break
+        else:
+            raise ValueError("Could not identify the level's internal filename")
+
+        self.areas = []
+        number = 1
+        while 'course/course%d.bin' % number in course:
+            self.areas.append(Area(number, course['course/course%d.bin' % number], [
+                course.get('course/course%d_bgdatL%d.bin' % (number, i))
+                for i in range(3)]))
+            number += 1
+
+
+    def loadTilesets(self, area, mainTilesets=None):
+        """
+        Load the four tilesets the area uses, as lists of objects. The
+        main tileset isn't in every level, so it can also come from
+        mainTilesets, a dict of tileset names -> SARC data.
+        """
+        names = area.tilesetNames
+
+        tilesets = [[], [], [], []]
+        data = self.files.get(names[0])
+        if data is None and mainTilesets is not None:
+            data = mainTilesets.get(names[0])
+        if data is not None:
+            key = (names[0], len(data), zlib.crc32(data))
+            if key in _mainTilesetCache:
+                _mainTilesetCache.move_to_end(key)
+            else:
+                _mainTilesetCache[key] = Tileset.load(data)
+                while len(_mainTilesetCache) > MAIN_TILESET_CACHE_SIZE:
+                    _mainTilesetCache.popitem(last=False)
+            tilesets[0] = _mainTilesetCache[key]
+
+        others = [self.files.get(name) if name else None for name in names[1:]]
+        if any(others):
+            tilesets[1:] = Tileset.loadAll(None, *others)[1:]
+
+        return tilesets
+
+
+def load(path):
+    """
+    Load the level at path
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    return Level(data, path.replace('\\', '/').split('/')[-1])
+
+
+def zoneRect(zone):
+    """
+    Return the rect (x, y, w, h) of the tiles the zone covers
+    """
+    x1, y1 = zone.x // 16, zone.y // 16
+    x2, y2 = -(-(zone.x + zone.width) // 16), -(-(zone.y + zone.height) // 16)
+    return (x1, y1, x2 - x1, y2 - y1)
+
+
+def renderArea(area, tilesets, rect=None, *, tileSize=TILE_SIZE, layers=(0, 1, 2)):
+    """
+    Render the objects in the area to an RGBA PIL image. tilesets is
+    the list of four lists of objects from Level.loadTilesets(). rect
+    (x, y, w, h, in tiles) defaults to area.bounds(). Each tile is
+    tileSize pixels wide in the image.
+    """
+    if rect is None: rect = area.bounds()
+    rx, ry, rw, rh = rect
+    img = Image.new('RGBA', (rw * tileSize, rh * tileSize), (0, 0, 0, 0))
+
+    # Tile id -> (tile, image at tileSize)
+    tileImages = {}
+
+    # Layer 0 is in front
+    for layerNum in sorted(layers, reverse=True):
+        for o in area.layers[layerNum]:
+            if o.x >= rx + rw or o.y >= ry + rh: continue
+            if o.x + o.width <= rx or o.y + o.height <= ry: continue
+
+            if o.tileset >= len(tilesets): continue
+            tileset = tilesets[o.tileset]
+            if o.idx >= len(tileset) or tileset[o.idx] is None: continue
+
+            for y, row in enumerate(tileset[o.idx].render(o.width, o.height), o.y):
+                if not ry <= y < ry + rh: continue
+                for x, tile in enumerate(row, o.x):
+                    if not rx <= x < rx + rw: continue
+                    if tile is None or tile is Tile.TileUnavailable: continue
+
+                    cached = tileImages.get(id(tile))
+                    if cached is None:
+                        tileImg = tile.image.convert('RGBA')
+                        if tileSize != TILE_SIZE:
+                            tileImg = tileImg.resize((tileSize, tileSize), Image.BILINEAR)
+                        cached = tileImages[id(tile)] = (tile, tileImg)
+
+                    img.alpha_composite(cached[1], ((x - rx) * tileSize, (y - ry) * tileSize))
+
+    return img
@@ -1,8 +1,11 @@
+import collections
 import copy
+import hashlib
 import io
 import json
 import os.path
 import struct
+import threading
 import warnings
 
 from PIL import Image
@@ -15,6 +18,25 @@ from . import Tile
 iterLayoutStr = _objectLayout.iterLayoutStr
 
 
+# (id(object), width, height) -> (object, compiled layout, rendering).
+# Renderings are shared between every caller asking for the same object
+# at the same size. The object itself is kept in the value so that its
+# id can't be reused while the entry exists.
+RENDER_CACHE_SIZE = 4096
+_renderCache = collections.OrderedDict()
+
+# LazyObject tile source -> (all tiles, estimated size in bytes,
+# {id(object): (object, tiles, random replacement tiles)}), least
+# recently used first. See LazyObject.
+LAZY_TILES_MEMORY_BUDGET = 256 * 1024 * 1024
+_lazyTiles = collections.OrderedDict()
+_lazyTilesSize = 0
+
+# Held while either of the caches above is used, so that objects can be
+# rendered from more than one thread
+_cacheLock = threading.RLock()
+
+
 
 def _loadImgAndNml(imgPath):
     """
@@ -127,6 +149,11 @@ class Object:
     _tiles = []
     randomReplacementTiles = []
     _layoutstr = b'\0\0\0'
+    _compiled = None
+    _uniqueTiles = None
+    _contentSignature = None
+    _tileSignature = None
+    _sortKey = None
 
     @classmethod
     def fromRetail(
@@ -163,15 +190,7 @@ class Object:
         obj = cls()
 
         jsonDict = json.loads(jsonData)
-
-        obj.name = name
-        obj.width = jsonDict['width']
-        obj.height = jsonDict['height']
-        obj.randomizeX = jsonDict.get('replace_x', False)
-        obj.randomizeY = jsonDict.get('replace_y', False)
-        obj.role = cls.Role(jsonDict.get('role', '?'))
-        obj.decorative = jsonDict.get('decorative', False)
-        obj.description = jsonDict.get('description', '')
+        obj._loadNewMetadata(name, jsonDict)
 
         obj._tiles, _, obj._layoutstr = cls._pickTiles(
             layoutstr, 0, alltiles, forcePa1=True)
@@ -182,6 +201,20 @@ class Object:
         return obj
 
 
+    def _loadNewMetadata(self, name, jsonDict):
+        """
+        Set the properties stored in a new-style object's JSON data
+        """
+        self.name = name
+        self.width = jsonDict['width']
+        self.height = jsonDict['height']
+        self.randomizeX = jsonDict.get('replace_x', False)
+        self.randomizeY = jsonDict.get('replace_y', False)
+        self.role = self.Role(jsonDict.get('role', '?'))
+        self.decorative = jsonDict.get('decorative', False)
+        self.description = jsonDict.get('description', '')
+
+
     @classmethod
     def fromPathNew(cls, jsonPath):
         """
@@ -298,18 +331,17 @@ class Object:
 
         # Copy all the tiles. Deepcopy fails for PIL Image objects
         # (https://github.com/python-pillow/Pillow/issues/1769), so we
-        # use copy() instead.
-        newtiles, newrandomtiles = [], []
-        for t in tiles:
-            if t is Tile.TileUnavailable:
-                newtiles.append(t)
-            else:
-                newtiles.append(copy.copy(t))
-        for t in randomtiles:
+        # use copy() instead. A tile used more than once is only copied
+        # once, so that allTiles still sees it as the same tile.
+        copies = {}
+        def copyTile(t):
             if t is Tile.TileUnavailable:
-                newrandomtiles.append(t)
-            else:
-                newrandomtiles.append(copy.copy(t))
+                return t
+            if id(t) not in copies:
+                copies[id(t)] = copy.copy(t)
+            return copies[id(t)]
+        newtiles = [copyTile(t) for t in tiles]
+        newrandomtiles = [copyTile(t) for t in randomtiles]
 
         return newtiles, newrandomtiles, newLayoutStr
 
@@ -381,26 +413,101 @@ class Object:
         return False
 
 
+    def _compiledLayout(self):
+        """
+        Return this object's layout, compiled for fast rendering. It's
+        only compiled again if the layout string or tiles are replaced.
+        """
+        compiled = self._compiled
+        if (compiled is None
+                or compiled[0] is not self._layoutstr
+                or compiled[1] is not self._tiles):
+            layout = _objectLayout.compileLayout(
+                list(self.annotatedLayoutStr()),
+                normalizeTileStep=(lambda tileStep: tileStep.tile)
+                )
+            compiled = self._compiled = (self._layoutstr, self._tiles, layout)
+        return compiled[2]
+
+
     def render(self, w=None, h=None):
         """
         Render this tile for the given width and height. Returns a 2D
         array of `Tile.Tile`s and `None`s.
+        The array is cached and shared with other callers rendering this
+        object at the same size, so please don't modify it.
         """
         if w is None or w < 1: w = self.width
         if h is None or h < 1: h = self.height
 
-        s = list(self.annotatedLayoutStr())
-        arr = _objectLayout.renderObject(
-            s, w, h,
-            normalizeTileStep=(lambda tileStep: tileStep.tile)
-            )
+        layout = self._compiledLayout()
+
+        key = (id(self), w, h)
+        with _cacheLock:
+            cached = _renderCache.get(key)
+            if cached is not None and cached[0] is self and cached[1] is layout:
+                _renderCache.move_to_end(key)
+                return cached[2]
+
+        arr = tuple(_objectLayout.renderCompiled(layout, w, h))
 
         # Ensure that the rendering is the requested size. If it's not,
-        # something went wrong in _objectLayout.renderObject().
+        # something went wrong in _objectLayout.renderCompiled().
+        assert len(arr) == h
+        assert len(arr[0]) == w
+        assert all(len(arr[0]) == len(row) for row in arr)
+
+        with _cacheLock:
+            _renderCache[key] = (self, layout, arr)
+            while len(_renderCache) > RENDER_CACHE_SIZE:
+                _renderCache.popitem(last=False)
+
+        return arr
+
+
+    def renderResized(self, previous, w=None, h=None):
+        """
+        Render this object for the given width and height, like
+        render(), reusing the unchanged parts of `previous` (an earlier
+        return value of render() or renderResized() for this object).
+        This is much faster than render() when an object is resized
+        interactively.
+        """
+        if w is None or w < 1: w = self.width
+        if h is None or h < 1: h = self.height
+
+        layout = self._compiledLayout()
+
+        key = (id(self), w, h)
+        prevH = len(previous)
+        prevW = len(previous[0]) if previous else 0
+        with _cacheLock:
+            cached = _renderCache.get(key)
+            if cached is not None and cached[0] is self and cached[1] is layout:
+                _renderCache.move_to_end(key)
+                return cached[2]
+
+            # Make sure that's really a rendering of this object as it
+            # is now, by checking that it's still in the cache
+            prevCached = _renderCache.get((id(self), prevW, prevH))
+
+        if (prevCached is None
+                or prevCached[0] is not self
+                or prevCached[1] is not layout
+                or prevCached[2] is not previous):
+            return self.render(w, h)
+
+        arr = tuple(_objectLayout.rerenderCompiled(layout, previous, w, h))
+
         assert len(arr) == h
         assert len(arr[0]) == w
         assert all(len(arr[0]) == len(row) for row in arr)
 
+        with _cacheLock:
+            _renderCache[key] = (self, layout, arr)
+            while len(_renderCache) > RENDER_CACHE_SIZE:
+                _renderCache.popitem(last=False)
+
         return arr
 
 
@@ -418,7 +525,14 @@ class Object:
         if self.randomizeX != other.randomizeX: return False
         if self.randomizeY != other.randomizeY: return False
 
-        for t1, t2 in zip(self.allTiles, other.allTiles):
+        # Tiles with exactly the same pixels and collisions are equal,
+        # so only fall back to comparing images if that isn't the case
+        selfSig, otherSig = self.tileSignature, other.tileSignature
+        if selfSig == otherSig: return True
+
+        for t1, t2, sig1, sig2 in zip(
+                self.allTiles, other.allTiles, selfSig, otherSig):
+            if t1 is t2 or sig1 == sig2: continue
             if t1 != t2:
                 return False
 
@@ -439,42 +553,43 @@ class Object:
             else pass
         then finally, alphabetically by name.
         """
+        return self.sortKey < other.sortKey
 
-        # Compare by role
-        if self.role != other.role:
-            if self.role < other.role:
-                return True
-            return False
-
-        # Compare by Decorative flag
-        if self.decorative != other.decorative:
-            if (not self.decorative) and other.decorative:
-                return True
-            return False
-
-        # Compare by size
-        selfSize = self.width * self.height
-        otherSize = other.width * other.height
-        if selfSize != otherSize:
-            if selfSize < otherSize:
-                return True
-            return False
 
-        # Compare by slope "outward" flag
+    @property
+    def sortKey(self):
+        """
+        A key for sorting objects in the order __lt__() uses, so that
+        they can be sorted with sorted(key=...) without comparing layout
+        strings over and over again. It doesn't need the object's tiles.
+        The value is cached until the layout string or any of the other
+        attributes it's made from change.
+        """
+        attrs = (self.role, self.decorative, self.width, self.height, self.name)
+        cached = self._sortKey
+        if (cached is not None
+                and cached[0] is self._layoutstr
+                and cached[1] == attrs):
+            return cached[2]
+
+        # Slope "outward" flag. Only the first slope in the layout
+        # string counts; objects normally only have one.
+        inward = False
         if self.role in (self.Role.top_slope, self.Role.bottom_slope):
-            for selfStep in self.annotatedLayoutStr():
-                if selfStep.type == 'slope':
-                    for otherStep in other.annotatedLayoutStr():
-                        if otherStep.type == 'slope':
-                            # Now we can finally compare them.
-
-                            if selfStep.outward != otherStep.outward:
-                                if selfStep.outward and (not otherStep.outward):
-                                    return True
-                                return False
-
-        # Compare by name
-        return self.name < other.name
+            for step in iterLayoutStr(self._layoutstr):
+                if step.type == 'slope':
+                    inward = not step.outward
+                    break
+
+        key = (
+            _roleOrder[self.role],
+            self.decorative,
+            self.width * self.height,
+            inward,
+            self.name,
+            )
+        self._sortKey = (self._layoutstr, attrs, key)
+        return key
 
 
     @property
@@ -486,16 +601,99 @@ class Object:
         separately.
         Randomization tiles are yielded after all others.
         """
-        yielded = []
+        return iter(self._getUniqueTiles())
+
+
+    @property
+    def tileSignature(self):
+        """
+        A tuple with one entry per tile in allTiles, which can be used
+        to quickly check whether two objects use exactly the same tiles.
+        Each entry is `(tile.fingerprint, tile.collisions)`, or the tile
+        itself if it's `None` or `Tile.TileUnavailable`.
+        The value is cached until the layout string, tiles or random
+        replacement tiles are replaced.
+        """
+        tiles = self._getUniqueTiles()
+        cached = self._tileSignature
+        if cached is not None and cached[0] is tiles:
+            return cached[1]
+
+        sig = tuple(
+            (t.fingerprint, t.collisions) if isinstance(t, Tile.Tile) else t
+            for t in tiles)
+        self._tileSignature = (tiles, sig)
+        return sig
+
+
+    @property
+    def contentSignature(self):
+        """
+        A string that's the same for two objects that look exactly the
+        same when rendered at their default size, even across sessions.
+        It's meant to be used as a key for caching things made from the
+        object's appearance, such as previews.
+        The value is cached until the size, layout string, tiles or
+        random replacement tiles change.
+        """
+        cached = self._contentSignature
+        if (cached is not None
+                and cached[0] is self._layoutstr
+                and cached[1] is self._tiles
+                and cached[2] is self.randomReplacementTiles
+                and cached[3] == (self.width, self.height)):
+            return cached[4]
+
+        h = hashlib.sha1(struct.pack('>HH', self.width, self.height))
+        h.update(self._layoutstr)
+        for t in self._tiles + [b'|'] + self.randomReplacementTiles:
+            if isinstance(t, Tile.Tile):
+                h.update(b'T' + t.fingerprint + bytes([len(t.collisions)]) + t.collisions)
+            elif t is None:
+                h.update(b'N')
+            elif t is Tile.TileUnavailable:
+                h.update(b'U')
+            else:
+                h.update(t)
+
+        signature = h.hexdigest()
+        self._contentSignature = (
+            self._layoutstr, self._tiles, self.randomReplacementTiles,
+            (self.width, self.height), signature)
+        return signature
+
+
+    def _getUniqueTiles(self):
+        """
+        Return a tuple of the tiles allTiles yields. Tiles are told apart
+        by identity, not by comparing their images. The tuple is cached
+        until the layout string, tiles or random replacement tiles are
+        replaced.
+        """
+        cached = self._uniqueTiles
+        if (cached is not None
+                and cached[0] is self._layoutstr
+                and cached[1] is self._tiles
+                and cached[2] is self.randomReplacementTiles):
+            return cached[3]
+
+        seen = set()
+        tiles = []
         for step in self.annotatedLayoutStr():
-            if step.type != 'tile': continue
-            if step.tile in yielded: continue
-            yielded.append(step.tile)
-            yield step.tile
+            if step.type == 'tile':
+                t = step.tile
+                if id(t) in seen: continue
+                seen.add(id(t))
+                tiles.append(t)
         for t in self.randomReplacementTiles:
-            if t in yielded: continue
-            yielded.append(t)
-            yield t
+            if id(t) in seen: continue
+            seen.add(id(t))
+            tiles.append(t)
+
+        tiles = tuple(tiles)
+        self._uniqueTiles = (
+            self._layoutstr, self._tiles, self.randomReplacementTiles, tiles)
+        return tiles
 
 
     def __str__(self):
@@ -505,13 +703,25 @@ class Object:
         return '<Object: %dx%d "%s">' % (self.width, self.height, self.name)
 
 
-    def asNewFormat(self):
+    def asNewFormat(self, *, compressLevel=None):
         """
         Return this object as a dictionary of filename -> filedata
-        pairs
+        pairs. compressLevel is the zlib compression level (0-9) for
+        the PNGs; by default, PIL's default is used.
         """
-        files = {}
+        name, img, nml, colls, layoutStr, j = self._newFormatParts()
+        return _newFormatFiles(
+            name, _encodePng(img, compressLevel), _encodePng(nml, compressLevel),
+            colls, layoutStr, j)
 
+
+    def _newFormatParts(self):
+        """
+        Return everything asNewFormat() needs, before the images are
+        encoded: (name, image, normal map, collisions, layout string,
+        JSON). Encoding the PNGs takes the most time by far, so this
+        lets Tileset.exportToNew() do that in other processes.
+        """
         # First, the image, normal map and collisions.
         # Much of the reason this is so complicated is because of NSMBU Pa1_7-37_1.
 
@@ -532,7 +742,6 @@ class Object:
 
         img = Image.new('RGBA', (actualW * 60, actualH * 60), _common.DEFAULT_IMAGE_COLOR)
         nml = Image.new('RGBA', (actualW * 60, actualH * 60), _common.DEFAULT_NORMAL_MAP_COLOR)
-        mask = Image.new('1', (60, 60), 'white')
 
         # Find the actual number of tiles in each line
         lineWidths = [0] # ignoring flipY
@@ -561,8 +770,8 @@ class Object:
                 if flipY: actualY = self.height - y - 1
 
                 if self._tiles[i] is not None and not self._tiles[i].empty:
-                    img.paste(self._tiles[i].image, (x * 60, actualY * 60), mask)
-                    nml.paste(self._tiles[i].normal, (x * 60, actualY * 60), mask)
+                    img.paste(self._tiles[i].image, (x * 60, actualY * 60))
+                    nml.paste(self._tiles[i].normal, (x * 60, actualY * 60))
                     actualColls[actualY][x] = self._tiles[i].collisions
 
                 step.tileNum = actualY * self.width + x
@@ -581,29 +790,21 @@ class Object:
         randRepls = []
         if addrandomizeY:
             for y in range(self.height, self.height + len(self.randomReplacementTiles)):
-                img.paste(self.randomReplacementTiles[i].image, (0, y * 60 - 60), mask)
-                nml.paste(self.randomReplacementTiles[i].normal, (0, y * 60 - 60), mask)
+                img.paste(self.randomReplacementTiles[i].image, (0, y * 60 - 60))
+                nml.paste(self.randomReplacementTiles[i].normal, (0, y * 60 - 60))
                 actualColls[y - 1][0] = self.randomReplacementTiles[i].collisions
                 randRepls.append(actualW * (y - 1))
                 i += 1
         else:
             for x in range(self.width, self.width + len(self.randomReplacementTiles)):
-                img.paste(self.randomReplacementTiles[i].image, (x * 60 - 60, 0), mask)
-                nml.paste(self.randomReplacementTiles[i].normal, (x * 60 - 60, 0), mask)
+                img.paste(self.randomReplacementTiles[i].image, (x * 60 - 60, 0))
+                nml.paste(self.randomReplacementTiles[i].normal, (x * 60 - 60, 0))
                 actualColls[0][x - 1] = self.randomReplacementTiles[i].collisions
                 randRepls.append(x - 1)
                 i += 1
 
         randRepls = randRepls[1:] # The first replacement is the tile itself
 
-        # Image -> bytes (PNG)
-        imgPngArr = io.BytesIO()
-        nmlPngArr = io.BytesIO()
-        img.save(imgPngArr, format='PNG')
-        nml.save(nmlPngArr, format='PNG')
-        imgPng = imgPngArr.getvalue()
-        nmlPng = nmlPngArr.getvalue()
-
         # Now, the collisions
         colls = b''.join([b''.join(row) for row in actualColls])
 
@@ -627,15 +828,198 @@ class Object:
 
         j = json.dumps(j).encode('utf-8')
 
-        # Return the files
         name = self.name if self.name else 'object'
-        return {
-            name + '.png': imgPng,
-            name + '_nml.png': nmlPng,
-            name + '.colls': colls,
-            name + '.' + name + '.objlyt': actualLayoutStr,
-            name + '.' + name + '.json': j,
-        }
+        return name, img, nml, colls, actualLayoutStr, j
+
+
+def _encodePng(img, compressLevel=None):
+    """
+    Encode a PIL Image as PNG, with this zlib compression level (or
+    PIL's default if it's None)
+    """
+    f = io.BytesIO()
+    if compressLevel is None:
+        img.save(f, format='PNG')
+    else:
+        img.save(f, format='PNG', compress_level=compressLevel)
+    return f.getvalue()
+
+
+def newFormatFileNames(name):
+    """
+    Return the names of the files an object with name `name` is made
+    of in the new format, in the order asNewFormat() returns them:
+    image, normal map, collisions, layout and JSON info.
+    """
+    return [
+        name + '.png',
+        name + '_nml.png',
+        name + '.colls',
+        name + '.' + name + '.objlyt',
+        name + '.' + name + '.json',
+    ]
+
+
+def _newFormatFiles(name, imgPng, nmlPng, colls, layoutStr, j):
+    """
+    Put together the dictionary of filename -> filedata pairs
+    asNewFormat() returns
+    """
+    return dict(zip(newFormatFileNames(name), [imgPng, nmlPng, colls, layoutStr, j]))
+
+
+# Role -> its position in the sort order
+_roleOrder = {role: i for i, role in enumerate(Object.Role)}
+
+
+class LazyObject(Object):
+    """
+    An Object that doesn't load its tiles until they're first needed
+    (for example, by render() or allTiles). Tiles are loaded by calling
+    a "tile source": a function taking no arguments that returns the
+    list of tiles the object's layout string refers to, just like the
+    `alltiles` argument to fromNew(). Objects that use the same image
+    should share a tile source, so that it's only loaded once.
+
+    Loaded tiles are forgotten again, least recently used first, once
+    they take up more than LAZY_TILES_MEMORY_BUDGET bytes. They're
+    then simply loaded again if they're needed.
+    """
+    _tileSource = None
+    _sourceSignature = None
+    _rawLayoutStr = b'\0\0\0'
+    _replaceIdxs = ()
+
+
+    @classmethod
+    def fromNewLazy(
+            cls, name, layoutstr, jsonData, tileSource, tileCount,
+            sourceSignature=None):
+        """
+        Like fromNew(), but with a tile source instead of the tiles
+        themselves. tileCount is the number of tiles the tile source
+        will return. sourceSignature can be a string that changes
+        whenever the tiles the tile source returns do (for example,
+        made from the stamps of the files they're loaded from); if it's
+        given, contentSignature doesn't need to load the tiles.
+        """
+        obj = cls()
+
+        jsonDict = json.loads(jsonData)
+        obj._loadNewMetadata(name, jsonDict)
+
+        # Check the layout string and random replacements against some
+        # placeholder tiles now, so that this fails in the same cases
+        # fromNew() would
+        placeholders = [Tile.TileUnavailable] * tileCount
+        _, _, obj._layoutstr = cls._pickTiles(
+            layoutstr, 0, placeholders, forcePa1=True)
+        obj._replaceIdxs = jsonDict.get('replace', [])
+        for idx in obj._replaceIdxs:
+            placeholders[idx]
+
+        obj._rawLayoutStr = layoutstr
+        obj._tileSource = tileSource
+        obj._sourceSignature = sourceSignature
+
+        return obj
+
+
+    @property
+    def contentSignature(self):
+        if self._sourceSignature is None:
+            return super().contentSignature
+
+        h = hashlib.sha1(struct.pack('>HH', self.width, self.height))
+        h.update(self._rawLayoutStr)
+        h.update(repr((self._replaceIdxs, self._sourceSignature)).encode('utf-8'))
+        return h.hexdigest()
+
+
+    @property
+    def _tiles(self):
+        return self._loadTiles()[0]
+
+
+    @property
+    def randomReplacementTiles(self):
+        return self._loadTiles()[1]
+
+
+    def _loadTiles(self):
+        """
+        Return (tiles, random replacement tiles) for this object,
+        loading them from the tile source if needed.
+        """
+        global _lazyTilesSize
+
+        source = self._tileSource
+        loaded = None
+        while True:
+            with _cacheLock:
+                entry = _lazyTiles.get(source)
+                if entry is not None:
+                    _lazyTiles.move_to_end(source)
+                elif loaded is not None:
+                    entry = _lazyTiles[source] = loaded
+                    _lazyTilesSize += loaded[1]
+                    _evictLazyTiles()
+
+                if entry is not None:
+                    alltiles, _, picked = entry
+                    if id(self) not in picked:
+                        tiles, _, _ = self._pickTiles(
+                            self._rawLayoutStr, 0, alltiles, forcePa1=True)
+                        randomtiles = [alltiles[idx] for idx in self._replaceIdxs]
+                        picked[id(self)] = (self, tiles, randomtiles)
+
+                    return picked[id(self)][1:]
+
+            # Loading the tiles takes a while, so the lock isn't held
+            # for it, and other objects can be rendered in the meantime.
+            # If another thread loads the same tiles first, its copy is
+            # used instead.
+            alltiles = source()
+            loaded = (alltiles, _estimateTilesSize(alltiles), {})
+
+
+def _estimateTilesSize(tiles):
+    """
+    Estimate how much memory the images of these tiles take up, in
+    bytes
+    """
+    size = 0
+    for tile in tiles:
+        if not isinstance(tile, Tile.Tile): continue
+        for img in (tile._image, tile._normal):
+            if img is not None:
+                size += img.width * img.height * len(img.getbands())
+    return size
+
+
+def _evictLazyTiles():
+    """
+    Forget the least recently used LazyObject tiles until they fit
+    into LAZY_TILES_MEMORY_BUDGET again. The most recently used tile
+    source is always kept.
+    """
+    global _lazyTilesSize
+
+    evicted = set()
+    while _lazyTilesSize > LAZY_TILES_MEMORY_BUDGET and len(_lazyTiles) > 1:
+        _, (_, size, picked) = _lazyTiles.popitem(last=False)
+        _lazyTilesSize -= size
+
+        # Drop everything else that refers to these tiles, too
+        for obj, _, _ in picked.values():
+            obj._compiled = None
+            obj._uniqueTiles = None
+            obj._tileSignature = None
+            evicted.add(id(obj))
+
+    if evicted:
+        for key in [key for key in _renderCache if key[0] in evicted]:
+            del _renderCache[key]
 
 
 # Aliases
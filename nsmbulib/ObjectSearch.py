@@ -0,0 +1,215 @@
+import bisect
+import collections
+import functools
+import heapq
+import re
+
+
+# Objects are put into these size buckets by their area, in tiles. The
+# last bucket is for everything bigger.
+SIZE_BUCKETS = [
+    (1, 'tiny'),
+    (4, 'small'),
+    (16, 'medium'),
+    (64, 'large'),
+    (None, 'huge'),
+    ]
+
+# How many prefix lookups an ObjectIndex remembers. Typing a query
+# looks up one longer prefix at a time, so this makes that fast.
+PREFIX_CACHE_SIZE = 256
+
+# Prefixes up to this long are looked up ahead of time, when the index
+# is made. They match so many tokens that looking them up on demand
+# would be the slowest part of typing a query.
+PRECOMPUTED_PREFIX_LENGTH = 2
+
+_camelCaseRegex = re.compile(r'([a-z0-9])([A-Z])')
+_separatorRegex = re.compile(r'[^0-9a-z]+')
+
+
+@functools.lru_cache(maxsize=4096)
+def tokenize(text):
+    """
+    Split text into a tuple of lowercase search tokens. camelCase words
+    are split apart, too.
+    """
+    text = _camelCaseRegex.sub(r'\1 \2', text)
+    return tuple(t for t in _separatorRegex.split(text.lower()) if t)
+
+
+def sizeBucket(width, height):
+    """
+    Return the name of the size bucket for an object of this size
+    """
+    area = width * height
+    for maxArea, name in SIZE_BUCKETS:
+        if maxArea is None or area <= maxArea:
+            return name
+
+
+@functools.lru_cache(maxsize=None)
+def _roleTokens(role):
+    """
+    Return the search tokens for this object role
+    """
+    return ('role:' + role.name,) + tokenize(str(role))
+
+
+def _objectTokens(name, obj, folders):
+    """
+    Return the set of search tokens for this object
+    """
+    tokens = set(tokenize(name))
+    tokens.update(tokenize(obj.description))
+    for folder in folders:
+        tokens.update(tokenize(folder))
+
+    tokens.update(_roleTokens(obj.role))
+    tokens.add('size:' + sizeBucket(obj.width, obj.height))
+    tokens.add('%dx%d' % (obj.width, obj.height))
+    if obj.decorative:
+        tokens.add('decorative')
+
+    return tokens
+
+
+def _collectFolders(hierarchy, path, folders):
+    """
+    Fill in folders (object name -> list of folder names) from a
+    hierarchy like the one Tileset.loadFromNew() returns
+    """
+    for key, value in hierarchy.items():
+        if key == '/':
+            for name in value:
+                folders[name] = path
+        else:
+            _collectFolders(value, path + [key], folders)
+
+
+class ObjectIndex:
+    """
+    An inverted index over the metadata of a lot of objects (such as
+    OneTileset), for searching it quickly. Nothing here needs the
+    objects' tiles, so lazily-loaded objects stay unloaded.
+
+    A query is made up of words separated by spaces. Each word has to
+    be the start of one of an object's tokens, which are:
+        - the words in its name, description and folders
+        - "role:" and the name of its role (like "role:top_left"), and
+          the words of the role's description ("top-left corner")
+        - "size:" and its size bucket (see SIZE_BUCKETS)
+        - its size, like "2x3"
+        - "decorative", if it's decorative
+    Words starting with "-" exclude the objects they match instead.
+    """
+
+    def __init__(self, objects, hierarchy=None):
+        """
+        objects is a dict of object names -> objects, and hierarchy is
+        the matching hierarchy, as returned by Tileset.loadFromNew().
+        """
+        self.names = list(objects)
+
+        folders = {}
+        if hierarchy:
+            _collectFolders(hierarchy, [], folders)
+
+        postings = {}
+        for i, name in enumerate(self.names):
+            for token in _objectTokens(name, objects[name], folders.get(name, ())):
+                postings.setdefault(token, set()).add(i)
+
+        self._postings = {token: frozenset(ids) for token, ids in postings.items()}
+
+        # Special tokens (with a ":") are kept apart from the plain
+        # ones, so that a plain word like "s" doesn't match every
+        # object's "size:" token
+        self._tokens = sorted(t for t in self._postings if ':' not in t)
+        self._specialTokens = sorted(t for t in self._postings if ':' in t)
+
+        shortPrefixes = {}
+        for token in self._tokens:
+            for length in range(1, min(len(token), PRECOMPUTED_PREFIX_LENGTH) + 1):
+                shortPrefixes.setdefault(token[:length], []).append(self._postings[token])
+        self._shortPrefixes = {
+            prefix: frozenset().union(*idSets) for prefix, idSets in shortPrefixes.items()}
+
+        self._all = frozenset(range(len(self.names)))
+        self._prefixCache = collections.OrderedDict()
+
+
+    def _lookupPrefix(self, prefix):
+        """
+        Return the set of objects (by index) with a token starting
+        with prefix. Prefixes with a ":" only match special tokens, and
+        ones without only match plain tokens.
+        """
+        special = ':' in prefix
+        if not special and len(prefix) <= PRECOMPUTED_PREFIX_LENGTH:
+            return self._shortPrefixes.get(prefix, frozenset())
+
+        ids = self._prefixCache.get(prefix)
+        if ids is not None:
+            self._prefixCache.move_to_end(prefix)
+            return ids
+
+        tokens = self._specialTokens if special else self._tokens
+        start = bisect.bisect_left(tokens, prefix)
+        end = bisect.bisect_left(tokens, prefix + '\uffff', start)
+        if end - start == 1:
+            ids = self._postings[tokens[start]]
+        else:
+            ids = frozenset().union(
+                *(self._postings[token] for token in tokens[start:end]))
+
+        self._prefixCache[prefix] = ids
+        while len(self._prefixCache) > PREFIX_CACHE_SIZE:
+            self._prefixCache.popitem(last=False)
+        return ids
+
+
+    def searchIndices(self, query):
+        """
+        Return the set of indices (into self.names) of the objects
+        matching the query. An empty query matches everything.
+        """
+        required, excluded = [], []
+        for word in query.split():
+            negate = word.startswith('-') and len(word) > 1
+            if negate: word = word[1:]
+
+            # Special tokens are looked up as they are; everything else
+            # is split up the same way names are
+            if ':' in word:
+                prefixes = [word.lower()]
+            else:
+                prefixes = tokenize(word)
+
+            for prefix in prefixes:
+                (excluded if negate else required).append(self._lookupPrefix(prefix))
+
+        if len(required) == 1:
+            ids = required[0]
+        elif required:
+            required.sort(key=len)
+            ids = required[0].intersection(*required[1:])
+        else:
+            ids = self._all
+        if excluded:
+            ids = ids.difference(*excluded)
+        return ids
+
+
+    def search(self, query, limit=None):
+        """
+        Return the names of the objects matching the query, in the
+        order they were given in. If limit is given, only the first
+        that many are returned.
+        """
+        ids = self.searchIndices(query)
+        if limit is not None and limit < len(ids):
+            ids = heapq.nsmallest(limit, ids)
+        else:
+            ids = sorted(ids)
+        return [self.names[i] for i in ids]
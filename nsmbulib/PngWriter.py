@@ -0,0 +1,79 @@
+import struct
+import zlib
+
+
+# Writes an RGBA8 PNG a few rows at a time, so that images too big to
+# keep in memory all at once can still be saved
+
+
+class PngWriter:
+    """
+    Writes an RGBA8 PNG to a file, from rows of pixel data given to it
+    in order from top to bottom
+    """
+
+    def __init__(self, file, width, height, *, compressLevel=6):
+        """
+        file is a file opened in binary mode. width and height are the
+        size of the image in pixels.
+        """
+        self.file = file
+        self.width = width
+        self.height = height
+        self.rowsLeft = height
+        self._compressor = zlib.compressobj(compressLevel)
+
+        file.write(b'\x89PNG\r\n\x1a\n')
+        self._writeChunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+
+
+    def _writeChunk(self, type, data):
+        """
+        Write one PNG chunk
+        """
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(type)
+        self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(type))))
+
+
+    def writeRows(self, data):
+        """
+        Write some rows of the image. data is the RGBA8 pixel data of
+        one or more whole rows.
+        """
+        rowSize = self.width * 4
+        rows = len(data) // rowSize
+        if rows * rowSize != len(data):
+            raise ValueError('The data is not made of whole rows')
+        if rows > self.rowsLeft:
+            raise ValueError('Too many rows')
+        self.rowsLeft -= rows
+
+        # Each row starts with its filter type, which is always "none"
+        view = memoryview(data)
+        filtered = bytearray()
+        for i in range(0, len(data), rowSize):
+            filtered.append(0)
+            filtered += view[i:i + rowSize]
+
+        compressed = self._compressor.compress(filtered)
+        if compressed:
+            self._writeChunk(b'IDAT', compressed)
+
+
+    def close(self):
+        """
+        Finish the image. Every row has to have been written.
+        """
+        if self.rowsLeft:
+            raise ValueError('%d rows were not written' % self.rowsLeft)
+        self._writeChunk(b'IDAT', self._compressor.flush())
+        self._writeChunk(b'IEND', b'')
+
+
+    def __enter__(self):
+        return self
+    def __exit__(self, type, value, traceback):
+        if type is None:
+            self.close()
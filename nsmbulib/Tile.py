@@ -1,8 +1,15 @@
 import binascii
+import collections
+import hashlib
+import io
+import os.path
+import pickle
 
 from PIL import Image
 
 from . import _common
+from . import _gtxImagePlugin
+from . import _gtxTextureFormats
 from . import Texture
 from . import Tileset
 
@@ -22,6 +29,18 @@ TileUnavailable = _TileUnavailableType()
 _TileUnavailableType.__new__ = lambda *args, **kwargs: None
 
 
+# (tile fingerprint, format name) -> (mainData, normalData, mainMipmaps,
+# normalMipmaps). This is shared by every save in the session, so tiles
+# that were already encoded once don't need to be padded, mipmapped and
+# BC3-compressed again. See _getRawDataForTiles(). Least recently used
+# entries are forgotten once the data takes up more than
+# ENCODED_DATA_CACHE_MEMORY bytes (about 3000 BC3 tiles).
+ENCODED_DATA_CACHE_MEMORY = 32 * 1024 * 1024
+_encodedDataCache = collections.OrderedDict()
+_encodedDataCacheSize = 0
+_ENCODED_DATA_CACHE_VERSION = 1
+
+
 class Tile:
     """
     A tileset tile, complete with collisions and a normal map!
@@ -35,6 +54,7 @@ class Tile:
     rawImageMipmapData = None
     rawNormalData = None
     rawNormalMipmapData = None
+    _fingerprint = None
 
     def __init__(self, image=None, normal=None, collisions=b'\0\0\0\0\0\0\0\0'):
         """
@@ -54,17 +74,19 @@ class Tile:
         if self._image:
             return self._image
         else:
-            return Image.new('RGBA', (60, 60), DEFAULT_IMAGE_COLOR)
+            return Image.new('RGBA', (60, 60), _common.DEFAULT_IMAGE_COLOR)
     @image.setter
     def image(self, image):
         self._image = image
         self.rawImageData = None
         self.rawImageMipmapData = None
+        self._fingerprint = None
     @image.deleter
     def image(self):
         self._image = None
         self.rawImageData = None
-        self.rawImageMipmapData
+        self.rawImageMipmapData = None
+        self._fingerprint = None
 
 
     @property
@@ -75,17 +97,19 @@ class Tile:
         if self._normal:
             return self._normal
         else:
-            return Image.new('RGBA', (60, 60), DEFAULT_NORMAL_MAP_COLOR)
+            return Image.new('RGBA', (60, 60), _common.DEFAULT_NORMAL_MAP_COLOR)
     @normal.setter
     def normal(self, normal):
         self._normal = normal
         self.rawNormalData = None
         self.rawNormalMipmapData = None
+        self._fingerprint = None
     @normal.deleter
     def normal(self):
         self._normal = None
         self.rawNormalData = None
         self.rawNormalMipmapData = None
+        self._fingerprint = None
 
 
     @property
@@ -101,6 +125,23 @@ class Tile:
         self._collisions = b'\0'
 
 
+    @property
+    def fingerprint(self):
+        """
+        A hash of this tile's image and normal map. Tiles with exactly
+        the same pixels have the same fingerprint. (Collisions are not
+        included, since they don't affect the tile's textures.)
+        The value is cached until the image or normal map is replaced.
+        """
+        if self._fingerprint is None:
+            h = hashlib.sha1()
+            for img in (self.image, self.normal):
+                h.update(('%s %dx%d;' % ((img.mode,) + img.size)).encode('ascii'))
+                h.update(img.tobytes())
+            self._fingerprint = h.digest()
+        return self._fingerprint
+
+
     @property
     def empty(self):
         """
@@ -132,10 +173,15 @@ class Tile:
         Are this tile and that tile equivalent?
         """
         if not isinstance(other, Tile): return False
+        if self is other: return True
 
         if self.collisions != other.collisions:
             return False
 
+        # Exactly the same pixels -- no need to compare them one by one
+        if self.fingerprint == other.fingerprint:
+            return True
+
         if not _common.imagesIdentical(self.image, other.image):
             return False
         if not _common.imagesIdentical(self.normal, other.normal):
@@ -254,6 +300,84 @@ def _makeTiles(mainImage, normalMap, collisions, *, padded=True):
     return tiles
 
 
+def _makeSomeTilesFromGtx(mainGtx, normalGtx, collisions, tileNums):
+    """
+    Like _makeTiles(), but straight from padded GTX image and normal map
+    data, and only for the tiles with these indices. The other tiles are
+    None. Only the blocks belonging to those tiles are deswizzled and
+    decoded, which is a lot faster if only a few tiles are needed.
+    """
+    wanted = set(tileNums)
+    textures = [_gtxImagePlugin.readGtx(io.BytesIO(gtx)) for gtx in (mainGtx, normalGtx)]
+    (size, format_, _, _), (nmlSize, nmlFormat, _, _) = textures
+
+    def makeAllTiles():
+        # Fallback: decode everything, and throw away what isn't needed
+        allTiles = _makeTiles(
+            Image.open(io.BytesIO(mainGtx)), Image.open(io.BytesIO(normalGtx)), collisions)
+        return [t if i in wanted else None for i, t in enumerate(allTiles)]
+
+    if not (format_ == nmlFormat == _gtxImagePlugin.GTX_FORMAT_BC3 and size == nmlSize):
+        return makeAllTiles()
+
+    w, h = size
+    tileCount = (w // 64) * (h // 64)
+    tileNums = sorted(n for n in wanted if 0 <= n < tileCount)
+    tiles = [None] * tileCount
+    if not tileNums:
+        return tiles
+
+    # Pick out the (deswizzled) BC3 data for each tile and its mipmaps
+    hasMipmaps = all(mipmaps for _, _, _, mipmaps in textures)
+    rawData = []
+    for _, _, data, mipmaps in textures:
+        rawData.append({})
+        for tileNum in tileNums:
+            tileX, tileY = tileNum % (w // 64), tileNum // (w // 64)
+            tileData = bytearray(_gtxTextureFormats.deswizzleBC3Region(
+                data, w, h, tileX * 16, tileY * 16, 16, 16))
+
+            mipmapData = []
+            for i, mip in enumerate(mipmaps if hasMipmaps else []):
+                mipTileSize = 32 // (2 ** i)
+                blocks = (mipTileSize + 3) // 4
+                mipmapData.append(bytearray(_gtxTextureFormats.deswizzleBC3Region(
+                    mip, w // (2 ** (i + 1)), h // (2 ** (i + 1)),
+                    tileX * mipTileSize // 4, tileY * mipTileSize // 4,
+                    blocks, blocks)))
+
+            rawData[-1][tileNum] = tileData, mipmapData
+
+    # Decode the tiles, stacked on top of each other in one column
+    try:
+        decoded = []
+        for texData in rawData:
+            column = b''.join(texData[tileNum][0] for tileNum in tileNums)
+            decoded.append(Image.frombytes(
+                'RGBA', (64, 64 * len(tileNums)),
+                _gtxTextureFormats.renderDeswizzledBC3(column, 64, 64 * len(tileNums))))
+    except Exception:
+        return makeAllTiles()
+
+    mainColumn, normalColumn = decoded
+    mainData, normalData = rawData
+    for i, tileNum in enumerate(tileNums):
+        box = (2, i * 64 + 2, 62, i * 64 + 62)
+        tile = Tile(
+            mainColumn.crop(box),
+            normalColumn.crop(box),
+            collisions[tileNum * 8 : tileNum * 8 + 8],
+            )
+        tile.rawImageData, mainMipmaps = mainData[tileNum]
+        tile.rawNormalData, normalMipmaps = normalData[tileNum]
+        if hasMipmaps:
+            tile.rawImageMipmapData = mainMipmaps
+            tile.rawNormalMipmapData = normalMipmaps
+        tiles[tileNum] = tile
+
+    return tiles
+
+
 
 def _getRawDataForTiles(tiles, format):
     """
@@ -297,6 +421,10 @@ def _getRawDataForTiles(tiles, format):
     imagesToConvertToBC3 = []
     imagesConvertedToBC3 = []
 
+    # (index into retVal, cache key) for each tile we encode from
+    # scratch, so the results can be added to the cache afterward
+    newlyEncoded = []
+
     for tile in tiles:
         mainData = normalData = mainMipmapData = normalMipmapData = None
         if tile in (None, TileUnavailable):
@@ -309,7 +437,16 @@ def _getRawDataForTiles(tiles, format):
                 for i in range(6):
                     mips.append(b'\0' * (32 >> i) ** 2)
                 mainMipmapData, normalMipmapData = mips, list(mips)
+        elif _hasNoRawData(tile) and (tile.fingerprint, format.name) in _encodedDataCache:
+            # We've already encoded a tile with these exact pixels
+            cacheKey = (tile.fingerprint, format.name)
+            _encodedDataCache.move_to_end(cacheKey)
+            mainData, normalData, mainMipmapData, normalMipmapData = _encodedDataCache[cacheKey]
+            mainMipmapData, normalMipmapData = list(mainMipmapData), list(normalMipmapData)
         else:
+            if _hasNoRawData(tile):
+                newlyEncoded.append((len(retVal), (tile.fingerprint, format.name)))
+
             if format is Tileset.TilesetFormat.RGBA8:
                 # RGBA8 is not a lossy format, so we don't have to
                 # do anything unusual except add the padding.
@@ -385,13 +522,15 @@ def _getRawDataForTiles(tiles, format):
         for idx, originalImage in enumerate(imagesToConvertToBC3):
             size = originalImage.size
 
+            # Each row of 4x4 blocks is contiguous in both images, so
+            # we can copy a whole row at a time
             bc3 = bytearray(size[0] * size[1])
+            rowLen = (size[0] + 3) // 4 * 16
             for y in range(0, size[1], 4):
-                for x in range(0, size[0], 4):
-                    i, j = (idx % 32) * 64 + x, (idx // 32) * 64 + y
-                    pointerA = ((2048 + 3) // 4 * (j // 4) + (i // 4)) * 16
-                    pointerB = ((size[0] + 3) // 4 * (y // 4) + (x // 4)) * 16
-                    bc3[pointerB:pointerB+16] = allBC3[pointerA:pointerA+16]
+                i, j = (idx % 32) * 64, (idx // 32) * 64 + y
+                pointerA = ((2048 + 3) // 4 * (j // 4) + (i // 4)) * 16
+                pointerB = ((size[0] + 3) // 4 * (y // 4)) * 16
+                bc3[pointerB:pointerB+rowLen] = allBC3[pointerA:pointerA+rowLen]
             imagesConvertedToBC3.append(bytes(bc3))
 
 
@@ -415,10 +554,108 @@ def _getRawDataForTiles(tiles, format):
 
         retVal = newRetVal
 
+    # Remember everything we just encoded
+    for retIdx, cacheKey in newlyEncoded:
+        mainData, normalData, mainMipmapData, normalMipmapData = retVal[retIdx]
+        _addToEncodedDataCache(cacheKey, (
+            mainData, normalData, tuple(mainMipmapData), tuple(normalMipmapData)))
+    _trimEncodedDataCache()
+
     return retVal
 
 
 
+def _hasNoRawData(tile):
+    """
+    Return True if this tile has no original BC3 data attached to it,
+    which means that its textures have to be encoded from its images.
+    """
+    return not (tile.rawImageData or tile.rawNormalData
+        or tile.rawImageMipmapData or tile.rawNormalMipmapData)
+
+
+
+def _encodedDataSize(entry):
+    """
+    Return how many bytes of tile data an encoded data cache entry holds
+    """
+    mainData, normalData, mainMipmapData, normalMipmapData = entry
+    return (len(mainData) + len(normalData)
+        + sum(len(mip) for mip in mainMipmapData)
+        + sum(len(mip) for mip in normalMipmapData))
+
+
+def _addToEncodedDataCache(key, entry):
+    """
+    Put an entry into the encoded data cache, as the most recently used
+    one. Call _trimEncodedDataCache() afterwards.
+    """
+    global _encodedDataCacheSize
+
+    old = _encodedDataCache.pop(key, None)
+    if old is not None:
+        _encodedDataCacheSize -= _encodedDataSize(old)
+    _encodedDataCache[key] = entry
+    _encodedDataCacheSize += _encodedDataSize(entry)
+
+
+def _trimEncodedDataCache():
+    """
+    Forget the least recently used encoded tile data until it fits into
+    ENCODED_DATA_CACHE_MEMORY again
+    """
+    global _encodedDataCacheSize
+
+    while _encodedDataCacheSize > ENCODED_DATA_CACHE_MEMORY and _encodedDataCache:
+        _, entry = _encodedDataCache.popitem(last=False)
+        _encodedDataCacheSize -= _encodedDataSize(entry)
+
+
+def loadEncodedDataCache(path):
+    """
+    Load the encoded tile data cache from the file at `path`, if it
+    exists. Entries already in memory are kept. Use this together with
+    `saveEncodedDataCache()` to reuse encoded tiles across sessions.
+    """
+    if not os.path.isfile(path): return
+
+    try:
+        with open(path, 'rb') as f:
+            version, entries = pickle.load(f)
+    except Exception:
+        print('WARNING: Could not load the encoded tile data cache from ' + path)
+        return
+    if version != _ENCODED_DATA_CACHE_VERSION: return
+
+    # Entries already in memory stay the most recently used ones
+    for key, value in reversed(entries):
+        if key not in _encodedDataCache:
+            _addToEncodedDataCache(key, value)
+            _encodedDataCache.move_to_end(key, last=False)
+    _trimEncodedDataCache()
+
+
+def saveEncodedDataCache(path):
+    """
+    Save the encoded tile data cache to the file at `path`.
+    """
+    with open(path, 'wb') as f:
+        pickle.dump(
+            (_ENCODED_DATA_CACHE_VERSION, list(_encodedDataCache.items())),
+            f, pickle.HIGHEST_PROTOCOL)
+
+
+def clearEncodedDataCache():
+    """
+    Forget all encoded tile data.
+    """
+    global _encodedDataCacheSize
+
+    _encodedDataCache.clear()
+    _encodedDataCacheSize = 0
+
+
+
 def addPadding(image):
     """
     Add padding to a 60x60 image to make it 64x64.
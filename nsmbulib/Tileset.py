@@ -1,26 +1,39 @@
 
+import collections
+import concurrent.futures
+import functools
 import io
-import enum
 import json
 import os
 import os.path
+import pickle
 import struct
 
 from PIL import Image
 
 from . import _common
+from . import _newFormat
 from . import Object
 from . import Sarc
 from . import Texture
 from . import Tile
+from . import TilesetPack
 
 
-class TilesetFormat(enum.Enum):
-    """
-    Formats a tileset can be saved to.
-    """
-    RGBA8 = 1
-    BC3 = 2
+# Bump this whenever the format of the loadFromNew() cache changes
+_NEW_FORMAT_CACHE_VERSION = 2
+
+# Starting worker processes takes a while, so exportToNew() and
+# saveToNew() only encode PNGs in worker processes if there are at
+# least this many objects
+MIN_OBJECTS_FOR_PROCESS_POOL = 16
+
+# PNG zlib compression level exportToNew() and saveToNew() use by
+# default. (This is PIL's default, too.)
+DEFAULT_PNG_COMPRESS_LEVEL = 6
+
+
+TilesetFormat = _common.TilesetFormat
 
 
 class TilesetSizeError(Exception):
@@ -71,14 +84,33 @@ def loadAll(tileset0, tileset1, tileset2, tileset3):
     return objectsPerTileset
 
 
-def load(data):
+def load(data, *, objectNums=None):
     """
     Retail tileset SARC data -> list of objects
     Please use loadAll() instead if possible, as it handles edge cases
     more correctly!
+    If objectNums is given, only the objects with those numbers are
+    loaded, and the rest of the list is filled with None. Only the tiles
+    those objects use are decoded, so this is much faster than loading
+    everything if you just need a few objects.
     """
 
-    objidxs, objstrs, tiles, info = _loadTilesetArchiveData(data)
+    gtximg, gtxnml, colls, objidxs, objstrs, info = _findTilesetArchiveFiles(data)
+
+    indexstruct = struct.Struct('>HBBH')
+    entries = [indexstruct.unpack_from(objidxs, i * 6) for i in range(len(objidxs) // 6)]
+    if objectNums is not None:
+        objectNums = set(objectNums)
+
+    if objectNums is None:
+        tiles = _makeTilesetArchiveTiles(gtximg, gtxnml, colls)
+    else:
+        tileNums = set()
+        for i, (off, w, h, rand) in enumerate(entries):
+            if i in objectNums:
+                tileNums.update(_tileNumsUsed(objstrs[off:], rand & 0xF))
+        tiles = Tile._makeSomeTilesFromGtx(gtximg, gtxnml, colls, tileNums)
+
     tiles *= 4 # Apply the tiles loaded to all 4 slots. This will
                # allow the tileset to load properly, no matter what
                # slot it is supposed to be in. That is, UNLESS it
@@ -87,10 +119,10 @@ def load(data):
                # supposed to use loadAll() and not load().
 
     objects = []
-    objcount = len(objidxs) // 6
-    indexstruct = struct.Struct('>HBBH')
-    for i in range(objcount):
-        off, w, h, rand = indexstruct.unpack_from(objidxs, i * 6)
+    for i, (off, w, h, rand) in enumerate(entries):
+        if objectNums is not None and i not in objectNums:
+            objects.append(None)
+            continue
         objects.append(Object.Object.fromRetail(
             _breakOffEnd(objstrs[off:]),
             w, h, (rand >> 4) & 1, (rand >> 5) & 1, rand & 0xF,
@@ -103,11 +135,42 @@ def load(data):
     return objects
 
 
+def _tileNumsUsed(lytstr, randN):
+    """
+    Return the numbers (within its own tileset) of the tiles that the
+    object with this layout string uses, including its random
+    replacement tiles. This mirrors Object._pickTiles().
+    """
+    tileNums = set()
+    first = -1
+    for step in Object.iterLayoutStr(lytstr):
+        if step.type != 'tile': continue
+        if step.tileNum or step.tilesetNum:
+            tileNums.add(step.tileNum)
+            if first == -1: first = step.tileNum
+        elif first == -1:
+            first = 0
+    for i in range(first + 1, first + randN):
+        tileNums.add(i % 256)
+    return tileNums
+
+
 def _loadTilesetArchiveData(data):
     """
     Extract relevant tileset data. This exists to avoid duplicate
     code in loadAll() and load().
     """
+    gtximg, gtxnml, colls, objidxs, objstrs, info = _findTilesetArchiveFiles(data)
+    tiles = _makeTilesetArchiveTiles(gtximg, gtxnml, colls)
+    return objidxs, objstrs, tiles, info
+
+
+def _findTilesetArchiveFiles(data):
+    """
+    Find the files we need in the tileset archive. Returns the image,
+    normal map, collisions, object index data, object data and info
+    dict.
+    """
 
     contents = Sarc.load(data)
 
@@ -147,15 +210,19 @@ def _loadTilesetArchiveData(data):
     elif objstrs is None:
         raise ValueError('Could not find tileset object definition data.')
 
-    # Parse tile images
-    imgmain = Image.open(io.BytesIO(gtximg))
-    imgnml = Image.open(io.BytesIO(gtxnml))
-    tiles = Tile._makeTiles(imgmain, imgnml, colls)
-
     # Info
     infoDict = {id: name for id, name in json.loads(info)}
 
-    return objidxs, objstrs, tiles, infoDict
+    return gtximg, gtxnml, colls, objidxs, objstrs, infoDict
+
+
+def _makeTilesetArchiveTiles(gtximg, gtxnml, colls):
+    """
+    Decode all of the tiles in the tileset archive
+    """
+    imgmain = Image.open(io.BytesIO(gtximg))
+    imgnml = Image.open(io.BytesIO(gtxnml))
+    return Tile._makeTiles(imgmain, imgnml, colls)
 
 
 def _breakOffEnd(lytstr):
@@ -235,22 +302,23 @@ def save(objects, name, slot=None, *, format=None):
             if tileImg is None: continue
 
             if format is TilesetFormat.BC3:
+                # Each row of 4x4 blocks in a tile is contiguous in the
+                # tileset image, too, so we copy a whole row at a time.
                 for y in range(0, 64, 4):
-                    for x in range(0, 64, 4):
-                        i, j = (idx % 32) * 64 + x, (idx // 32) * 64 + y
-                        pointerA = ((2048 + 3) // 4 * (j // 4) + (i // 4)) * 16
-                        pointerB = ((64 + 3) // 4 * (y // 4) + (x // 4)) * 16
-                        allImgData[pointerA:pointerA+16] = tileImg[pointerB:pointerB+16]
-                        allNmlData[pointerA:pointerA+16] = tileNml[pointerB:pointerB+16]
+                    i, j = (idx % 32) * 64, (idx // 32) * 64 + y
+                    pointerA = ((2048 + 3) // 4 * (j // 4) + (i // 4)) * 16
+                    pointerB = ((64 + 3) // 4 * (y // 4)) * 16
+                    allImgData[pointerA:pointerA+256] = tileImg[pointerB:pointerB+256]
+                    allNmlData[pointerA:pointerA+256] = tileNml[pointerB:pointerB+256]
                 for mipIdx in range(6):
                     mipTileW = 32 >> mipIdx
+                    rowLen = (mipTileW + 3) // 4 * 16
                     for y in range(0, mipTileW, 4):
-                        for x in range(0, mipTileW, 4):
-                            i, j = (idx % 32) * mipTileW + x, (idx // 32) * mipTileW + y
-                            pointerA = (((1024 >> mipIdx) + 3) // 4 * (j // 4) + (i // 4)) * 16
-                            pointerB = ((mipTileW + 3) // 4 * (y // 4) + (x // 4)) * 16
-                            allImgMipmaps[mipIdx][pointerA:pointerA+16] = tileImgMips[mipIdx][pointerB:pointerB+16]
-                            allNmlMipmaps[mipIdx][pointerA:pointerA+16] = tileNmlMips[mipIdx][pointerB:pointerB+16]
+                        i, j = (idx % 32) * mipTileW, (idx // 32) * mipTileW + y
+                        pointerA = (((1024 >> mipIdx) + 3) // 4 * (j // 4) + (i // 4)) * 16
+                        pointerB = ((mipTileW + 3) // 4 * (y // 4)) * 16
+                        allImgMipmaps[mipIdx][pointerA:pointerA+rowLen] = tileImgMips[mipIdx][pointerB:pointerB+rowLen]
+                        allNmlMipmaps[mipIdx][pointerA:pointerA+rowLen] = tileNmlMips[mipIdx][pointerB:pointerB+rowLen]
             else:
                 for row in range(64):
                     pointerA = (idx // 32) * 524288 + (idx % 32) + 256 + row * 8192
@@ -290,16 +358,13 @@ def save(objects, name, slot=None, *, format=None):
     objIdxStruct = struct.Struct('>HBBH')
     for objIdx, obj in enumerate(objects):
 
-        # Build up a layout string
-        tilesSeen = []
+        # Build up a layout string. Tiles are numbered in the same order
+        # as obj.allTiles, which tells them apart by identity.
+        tilesSeen = {}
         layoutStr = b''
         for step in obj.annotatedLayoutStr():
             if step.type == 'tile':
-                if step.tile in tilesSeen:
-                    tileNum = tilesSeen.index(step.tile)
-                else:
-                    tilesSeen.append(step.tile)
-                    tileNum = len(tilesSeen) - 1
+                tileNum = tilesSeen.setdefault(id(step.tile), len(tilesSeen))
                 from_ = fromIdxs[(objIdx, tileNum)]
                 if from_ is None:
                     step.tileNum = step.tilesetNum = 0
@@ -386,7 +451,13 @@ def _getMinimalTilesFromObjects(objects):
     # This isn't too bad. We iterate over the objects and their allTiles-es,
     # and throw away any that are empty or match a tile already in the list.
 
+    # A tile with exactly the same pixels and collisions as one already
+    # in the list can't match anything earlier in the list either (or
+    # that one wouldn't have been added), so those are looked up
+    # directly instead of being compared against every tile.
+
     tiles = []
+    exactIdxs = {}
     fromIdxs = {}
     for i, obj in enumerate(objects):
         for j, tile in enumerate(obj.allTiles):
@@ -398,11 +469,17 @@ def _getMinimalTilesFromObjects(objects):
                 weDontWantThis = True
                 myIdx = None
             else:
-                for i2, t2 in enumerate(tiles):
-                    if t2 == tile:
-                        weDontWantThis = True
-                        myIdx = i2
-                        break
+                key = (tile.fingerprint, tile.collisions)
+                if key in exactIdxs:
+                    weDontWantThis = True
+                    myIdx = exactIdxs[key]
+                else:
+                    for i2, t2 in enumerate(tiles):
+                        if t2 == tile:
+                            weDontWantThis = True
+                            myIdx = i2
+                            break
+                    exactIdxs.setdefault(key, myIdx)
 
             fromIdxs[(i, j)] = myIdx
             if not weDontWantThis:
@@ -413,7 +490,80 @@ def _getMinimalTilesFromObjects(objects):
     return tiles, fromIdxs
 
 
-def loadFromNew(folder):
+def _loadNewFormatCache(path, folder, *, loadImages=True):
+    """
+    Load the loadFromNew() cache for the given folder from the file at
+    path. Returns three dicts (images, objects, imageSizes), which are
+    empty if there's no usable cache. If loadImages is False, the
+    cached images aren't loaded, and None is returned for them.
+    """
+    empty = ({} if loadImages else None), {}, {}
+    if not os.path.isfile(path): return empty
+
+    try:
+        with open(path, 'rb') as f:
+            version, cacheFolder, objects, imageSizes = pickle.load(f)
+            if version != _NEW_FORMAT_CACHE_VERSION: return empty
+            if cacheFolder != os.path.abspath(folder): return empty
+            images = pickle.load(f) if loadImages else None
+    except Exception:
+        print('WARNING: Could not load the OneTileset cache from ' + path)
+        return empty
+
+    return images, objects, imageSizes
+
+
+def _saveNewFormatCache(path, folder, images, objects, imageSizes):
+    """
+    Save the loadFromNew() cache to the file at path. If images is
+    None, the images already cached in that file are kept.
+    """
+
+    # The images come last in the file, so they can be copied over
+    # without being unpickled
+    imagesData = pickle.dumps({})
+    if images is None:
+        try:
+            with open(path, 'rb') as f:
+                version = pickle.load(f)[0]
+                if version == _NEW_FORMAT_CACHE_VERSION:
+                    imagesData = f.read()
+        except Exception:
+            pass
+    else:
+        imagesData = pickle.dumps(images, pickle.HIGHEST_PROTOCOL)
+
+    tempPath = path + '.tmp'
+    with open(tempPath, 'wb') as f:
+        pickle.dump(
+            (_NEW_FORMAT_CACHE_VERSION, os.path.abspath(folder), objects, imageSizes),
+            f, pickle.HIGHEST_PROTOCOL)
+        f.write(imagesData)
+    os.replace(tempPath, path)
+
+
+def _imageTileCount(fullName):
+    """
+    Return the number of tiles _makeTiles() would make from the image
+    for the .colls/.png pair at fullName (without an extension). Only
+    the image header is read.
+    """
+    with Image.open(fullName + '.png') as img:
+        return (img.width // 60) * (img.height // 60)
+
+
+def _loadTilesLazily(fullName):
+    """
+    Make the tiles for the .colls/.png pair at fullName (without an
+    extension). Used as the tile source for Object.LazyObject.
+    """
+    with open(fullName + '.colls', 'rb') as f:
+        collsData = f.read()
+    imgmain, imgnml = Object._loadImgAndNml(fullName + '.png')
+    return Tile._makeTiles(imgmain, imgnml, collsData, padded=False)
+
+
+def loadFromNew(folder, *, cachePath=None, progress=None, processes=None, lazy=False):
     """
     Folder path -> dict of objects and dict representing hierarchy
     Dict of objects: string (object name) -> Object instance
@@ -426,86 +576,246 @@ def loadFromNew(folder):
         within this folder.
     If you don't care about where exactly each object is in the
     folder structure, the hierarchy can be ignored.
+
+    If cachePath is given, the decoded images and object files are
+    cached in that file. Files whose size and modification time haven't
+    changed since the last call are then loaded from the cache instead
+    of being read and decoded again. The folder itself is still scanned
+    every time, so added and removed objects are picked up.
+
+    When there are many images to decode, they're decoded in parallel
+    by up to `processes` worker processes (by default, one per CPU).
+    Pass processes=1 to do everything in this process.
+
+    If progress is given, it's called as progress(done, total) each
+    time an image or object has been loaded.
+
+    If lazy is True, no images are decoded here. The objects are
+    Object.LazyObject instances instead, which load their tiles the
+    first time they're needed.
+
+    `folder` can also be the path to a file made by TilesetPack.save(),
+    in which case it's loaded with TilesetPack.load() instead.
     """
+    if os.path.isfile(folder):
+        return TilesetPack.load(folder, progress=progress, lazy=lazy)
     if not os.path.isdir(folder):
         raise ValueError('"%s" is not a folder.' % folder)
 
     objects = {}
-    hierarchy = {} # For convenience
-
-    def scanFolder(prependList, folder, outerLevelOfHierarchy, addThisFolder=True):
-        nonlocal objects
-        folderName = os.path.basename(folder)
-        if addThisFolder:
-            # += appends it in-place, causing issues
-            prependList = prependList + [folderName]
-
-        # Step 1: search for .colls/.png and .json/.objlyt
-        collsAndPngs = []
-        jsonAndObjlyts = []
-        for itemName in os.listdir(folder):
-            fullItemName = os.path.join(folder, itemName)
-            if os.path.isdir(fullItemName) and not itemName.startswith('_'):
-                outerLevelOfHierarchy[itemName] = {}
-                scanFolder(prependList, fullItemName, outerLevelOfHierarchy[itemName])
-            elif itemName.endswith('.json') and os.path.isfile(fullItemName[:-5] + '.objlyt'):
-                jsonAndObjlyts.append(itemName[:-5])
-            elif itemName.endswith('.colls') and os.path.isfile(fullItemName[:-6] + '.png'):
-                collsAndPngs.append(itemName[:-6])
-
-        # Step 2: load the .colls/.png files
-        allTiles = {}
-        for name in collsAndPngs:
-
-            # Load collisions, the main image and (optionally) the normal map
-            fullName = os.path.join(folder, name)
-            with open(fullName + '.colls', 'rb') as f:
-                collsData = f.read()
-            imgmain, imgnml = Object._loadImgAndNml(fullName + '.png')
-
-            # Create tiles
-            allTiles[name] = Tile._makeTiles(imgmain, imgnml, collsData, padded=False)
-
-        # Step 3: load the .json/.objlyt files, while
-        # keeping track of the object names loaded
-        outerLevelOfHierarchy['/'] = []
-        objList = outerLevelOfHierarchy['/']
-        for name in jsonAndObjlyts:
 
-            # Ensure that we actually have the tiles for this object
-            if name.count('.') != 1: continue
-            imageName = name.split('.')[0]
-            if imageName not in allTiles: continue
-            objectName = name.split('.')[1]
-
-            # Load files
-            fullName = os.path.join(folder, name)
+    # Full path (without extension) -> (file stamps, packed data)
+    # (For lazy loading, the cached images aren't needed at all.)
+    if cachePath is not None:
+        oldCachedImages, oldCachedObjects, oldImageSizes = \
+            _loadNewFormatCache(cachePath, folder, loadImages=not lazy)
+    else:
+        oldCachedImages, oldCachedObjects, oldImageSizes = {}, {}, {}
+    cachedImages = None if lazy else {}
+    cachedObjects, imageSizes = {}, {}
+    cacheChanged = False
+
+    # Step 1: find all of the .colls/.png and .json/.objlyt pairs, and
+    # put together the hierarchy while we're at it
+    hierarchy, imageNames, objectNames = _newFormat.scanNewFormatFolder(folder)
+
+    total = len(imageNames) + len(objectNames)
+    done = 0
+    def reportProgress():
+        nonlocal done
+        done += 1
+        if progress is not None:
+            progress(done, total)
+
+    # Step 2: load the .colls/.png files, from the cache if they haven't
+    # changed, or else in the worker processes
+    allTiles = {}
+    def addImageGroup(fullName, stamp, collsData, packedMain, packedNml):
+        if packedMain is None or packedNml is None:
+            imgmain, imgnml = Object._loadImgAndNml(fullName + '.png')
+        else:
+            imgmain, imgnml = _newFormat.unpackImage(packedMain), _newFormat.unpackImage(packedNml)
+        allTiles[fullName] = Tile._makeTiles(imgmain, imgnml, collsData, padded=False)
+        imageSizes[fullName] = (stamp[0], len(allTiles[fullName]))
+        reportProgress()
+
+    # Or, if we're loading lazily, just make the tile sources for the
+    # objects, which only need to know how many tiles there will be
+    tileSources, sourceSignatures = {}, {}
+    if lazy:
+        for fullName in imageNames:
+            stamp = _newFormat.fileStamp(fullName + '.png')
+            cached = oldImageSizes.get(fullName)
+            if cached is None or cached[0] != stamp:
+                cached = (stamp, _imageTileCount(fullName))
+                cacheChanged = True
+            imageSizes[fullName] = cached
+            tileSources[fullName] = functools.partial(_loadTilesLazily, fullName)
+            sourceSignatures[fullName] = repr((
+                fullName,
+                stamp,
+                _newFormat.fileStamp(fullName + '_nml.png'),
+                _newFormat.fileStamp(fullName + '.colls'),
+                ))
+            reportProgress()
+        imageNames = []
+
+    toDecode = []
+    for fullName in imageNames:
+        stamp = (
+            _newFormat.fileStamp(fullName + '.png'),
+            _newFormat.fileStamp(fullName + '_nml.png'),
+            _newFormat.fileStamp(fullName + '.colls'),
+            )
+        cached = oldCachedImages.get(fullName)
+        if cached is not None and cached[0] == stamp:
+            _, packedMain, packedNml, collsData = cached
+            addImageGroup(fullName, stamp, collsData, packedMain, packedNml)
+            cachedImages[fullName] = cached
+        else:
+            toDecode.append((fullName, stamp))
+
+    decoded = _newFormat.decodeImageGroups([fullName for fullName, _ in toDecode], processes)
+    for (fullName, stamp), (collsData, packedMain, packedNml) in zip(toDecode, decoded):
+        addImageGroup(fullName, stamp, collsData, packedMain, packedNml)
+        if packedMain is not None and packedNml is not None:
+            cachedImages[fullName] = (stamp, packedMain, packedNml, collsData)
+            cacheChanged = True
+
+    # Step 3: load the .json/.objlyt files
+    for folder_, name, imageName, objectName in objectNames:
+
+        # Load files, from the cache if they haven't changed
+        fullName = os.path.join(folder_, name)
+        stamp = (
+            _newFormat.fileStamp(fullName + '.json'),
+            _newFormat.fileStamp(fullName + '.objlyt'),
+            )
+        cached = oldCachedObjects.get(fullName)
+        if cached is not None and cached[0] == stamp:
+            _, jsonData, lytData = cached
+        else:
             with open(fullName + '.json', 'r', encoding='utf-8') as f:
                 jsonData = f.read()
             with open(fullName + '.objlyt', 'rb') as f:
                 lytData = f.read()
+            cached = (stamp, jsonData, lytData)
+            cacheChanged = True
+        cachedObjects[fullName] = cached
+
+        # Create an object
+        fullImageName = os.path.join(folder_, imageName)
+        try:
+            if lazy:
+                objects[objectName] = Object.LazyObject.fromNewLazy(
+                    objectName, lytData, jsonData,
+                    tileSources[fullImageName], imageSizes[fullImageName][1],
+                    sourceSignatures[fullImageName])
+            else:
+                objects[objectName] = Object.Object.fromNew(
+                    objectName, lytData, jsonData, allTiles[fullImageName])
+        except Exception:
+            print('WARNING: Could not load "' + objectName + '" from ' + folder_)
+
+        reportProgress()
+
+    # Save the cache if anything was added or removed
+    if cachePath is not None and (
+            cacheChanged
+            or (not lazy and len(cachedImages) != len(oldCachedImages))
+            or len(cachedObjects) != len(oldCachedObjects)
+            or len(imageSizes) != len(oldImageSizes)):
+        try:
+            _saveNewFormatCache(
+                cachePath, folder, cachedImages, cachedObjects, imageSizes)
+        except Exception:
+            print('WARNING: Could not save the OneTileset cache to ' + cachePath)
 
-            # Create an object
-            try:
-                objects[objectName] = \
-                    Object.Object.fromNew(objectName, lytData, jsonData, allTiles[imageName])
-            except Exception:
-                print('WARNING: Could not load "' + objectName + '" from ' + folder)
-            objList.append(objectName)
+    return objects, hierarchy
 
 
-        # If there are no objects at this level, we don't need the object list
-        # in the hierarchy
-        if not objList:
-            del outerLevelOfHierarchy['/']
+def _encodePngs(packedImages, compressLevel):
+    """
+    Encode images packed by _newFormat.packImage() as PNGs. This is run
+    in worker processes by _iterNewFormatFiles().
+    """
+    return [Object._encodePng(_newFormat.unpackImage(packed), compressLevel)
+            for packed in packedImages]
 
-    scanFolder([], folder, hierarchy, False)
 
-    return objects, hierarchy
+def _iterNewFormatFiles(objects, compressLevel, processes):
+    """
+    Yield obj.asNewFormat(compressLevel=compressLevel) for each of
+    objects, in order. If there are enough of them, the images are put
+    together here but encoded in up to `processes` worker processes (by
+    default, one per CPU). Only a few objects' images are waiting to be
+    encoded at any time, so this doesn't need much memory.
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes == 1 or len(objects) < MIN_OBJECTS_FOR_PROCESS_POOL:
+        for obj in objects:
+            yield obj.asNewFormat(compressLevel=compressLevel)
+        return
+
+    def finish(entry):
+        name, colls, layoutStr, j, future = entry
+        imgPng, nmlPng = future.result()
+        return Object._newFormatFiles(name, imgPng, nmlPng, colls, layoutStr, j)
+
+    maxPending = processes * 4
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        pending = collections.deque()
+        for obj in objects:
+            name, img, nml, colls, layoutStr, j = obj._newFormatParts()
+            future = executor.submit(
+                _encodePngs, [_newFormat.packImage(img), _newFormat.packImage(nml)], compressLevel)
+            pending.append((name, colls, layoutStr, j, future))
+
+            if len(pending) >= maxPending:
+                yield finish(pending.popleft())
+
+        while pending:
+            yield finish(pending.popleft())
+
+
+def saveToNew(objects, *, compressLevel=DEFAULT_PNG_COMPRESS_LEVEL, processes=None):
+    """
+    List of objects -> dictionary of "filename": filedata.
+    The PNGs are encoded with zlib compression level compressLevel, in
+    up to `processes` worker processes (see exportToNew()).
+    """
+    files = {}
+    for objFiles in _iterNewFormatFiles(list(objects), compressLevel, processes):
+        files.update(objFiles)
+    return files
 
 
-def saveToNew(objects):
+def exportToNew(objects, folder, *, compressLevel=DEFAULT_PNG_COMPRESS_LEVEL,
+        processes=None, progress=None):
     """
-    List of objects -> dictionary of "filename": filedata
+    Export a lot of objects to the new format at once. objects is a
+    list of (subfolder, object) pairs, and each object's files are
+    written to that subfolder of folder ('' for folder itself). Folders
+    that don't exist yet are made first.
+    The PNGs are encoded with zlib compression level compressLevel
+    (lower is faster, but makes bigger files), in up to `processes`
+    worker processes (by default, one per CPU). Pass processes=1 to do
+    everything in this process. If progress is given, it's called as
+    progress(done, total) each time an object has been written.
     """
-    raise NotImplementedError('This will be implemented later...')
+    objects = list(objects)
+
+    for subfolder in {subfolder for subfolder, _ in objects}:
+        os.makedirs(os.path.join(folder, subfolder), exist_ok=True)
+
+    allFiles = _iterNewFormatFiles(
+        [obj for _, obj in objects], compressLevel, processes)
+    for i, ((subfolder, _), objFiles) in enumerate(zip(objects, allFiles)):
+        path = os.path.join(folder, subfolder)
+        for fn, fd in objFiles.items():
+            with open(os.path.join(path, fn), 'wb') as f:
+                f.write(fd)
+
+        if progress is not None:
+            progress(i + 1, len(objects))
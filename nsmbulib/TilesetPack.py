@@ -0,0 +1,328 @@
+import functools
+import json
+import mmap
+import os
+import os.path
+import struct
+
+from PIL import Image
+
+from . import _common
+from . import _newFormat
+from . import Object
+from . import Tile
+
+
+# A tileset pack holds an entire new-format (OneTileset) folder in a
+# single file, so it can be loaded without touching thousands of small
+# files. The folder is still the thing you edit; the pack is made from
+# it with save().
+#
+# Layout (all integers are big-endian):
+#     Header
+#     Tile data, for each image in the folder:
+#         For each tile in the image:
+#             60x60 RGBA8 main image
+#             60x60 RGBA8 normal map
+#             Collisions (8 bytes)
+#             If the BC3 flag is set:
+#                 64x64 BC3 main image, then its 6 mipmaps
+#                 64x64 BC3 normal map, then its 6 mipmaps
+#     Index: one entry per image
+#     Metadata: UTF-8 JSON with the hierarchy and the objects
+
+MAGIC = b'OTPK'
+VERSION = 1
+
+# The extension tileset packs are saved with, so they can be told apart
+# from other files in file pickers
+EXTENSION = '.otpk'
+
+FLAG_BC3 = 1
+
+# magic, version, flags, index offset, image count, metadata offset,
+# metadata length
+_headerStruct = struct.Struct('>4sHHQIQI')
+
+# tile data offset, tile count
+_indexEntryStruct = struct.Struct('>QI')
+
+# Sizes of tile data, in bytes. BC3 data is stored in 4x4 blocks of 16
+# bytes each, so the smallest mipmaps are still one block.
+_RGBA8_SIZE = 60 * 60 * 4
+_BC3_SIZE = 64 * 64
+_BC3_MIPMAP_SIZES = [(((32 >> i) + 3) // 4) ** 2 * 16 for i in range(6)]
+
+
+class InvalidTilesetPackError(ValueError):
+    """
+    The tileset pack file is invalid.
+    """
+
+
+def save(folder, path, *, format=None, processes=None, progress=None):
+    """
+    Pack the new-format folder into a single file at path. If format is
+    Tileset.TilesetFormat.BC3, BC3 data for each tile is included, too,
+    so tilesets saved from the packed objects don't need to encode it
+    again. The images are decoded in up to `processes` worker processes,
+    like in Tileset.loadFromNew(). If progress is given, it's called as
+    progress(done, total) each time an image has been packed.
+    """
+    if not os.path.isdir(folder):
+        raise ValueError('"%s" is not a folder.' % folder)
+
+    hierarchy, imageNames, objectNames = _newFormat.scanNewFormatFolder(folder)
+    includeBC3 = format is _common.TilesetFormat.BC3
+
+    tempPath = path + '.tmp'
+    with open(tempPath, 'wb') as f:
+        f.write(b'\0' * _headerStruct.size)
+
+        # Tile data
+        index = []
+        decoded = _newFormat.decodeImageGroups(imageNames, processes)
+        for i, (fullName, (collsData, packedMain, packedNml)) in enumerate(zip(imageNames, decoded)):
+            if packedMain is None or packedNml is None:
+                imgmain, imgnml = Object._loadImgAndNml(fullName + '.png')
+            else:
+                imgmain = _newFormat.unpackImage(packedMain)
+                imgnml = _newFormat.unpackImage(packedNml)
+            tiles = Tile._makeTiles(imgmain, imgnml, collsData, padded=False)
+
+            index.append((f.tell(), len(tiles)))
+            if includeBC3:
+                rawData = Tile._getRawDataForTiles(tiles, format)
+
+            for j, tile in enumerate(tiles):
+                f.write(tile.image.convert('RGBA').tobytes())
+                f.write(tile.normal.convert('RGBA').tobytes())
+                f.write(tile.collisions.ljust(8, b'\0')[:8])
+                if includeBC3:
+                    mainData, normalData, mainMipmaps, normalMipmaps = rawData[j]
+                    for data, mipmaps in [(mainData, mainMipmaps), (normalData, normalMipmaps)]:
+                        f.write(bytes(data))
+                        for mipmap, size in zip(mipmaps, _BC3_MIPMAP_SIZES):
+                            f.write(bytes(mipmap).ljust(size, b'\0')[:size])
+
+            if progress is not None:
+                progress(i + 1, len(imageNames))
+
+        # Index
+        indexOffset = f.tell()
+        for entry in index:
+            f.write(_indexEntryStruct.pack(*entry))
+
+        # Metadata
+        imageIdxs = {fullName: i for i, fullName in enumerate(imageNames)}
+        objects = []
+        for objFolder, name, imageName, objectName in objectNames:
+            fullName = os.path.join(objFolder, name)
+            with open(fullName + '.json', 'r', encoding='utf-8') as jf:
+                jsonData = jf.read()
+            with open(fullName + '.objlyt', 'rb') as lf:
+                lytData = lf.read()
+            objects.append([
+                objectName,
+                imageIdxs[os.path.join(objFolder, imageName)],
+                jsonData,
+                lytData.hex(),
+                ])
+        metadata = json.dumps({
+            'hierarchy': hierarchy,
+            'objects': objects,
+            }).encode('utf-8')
+
+        metadataOffset = f.tell()
+        f.write(metadata)
+
+        # Header
+        f.seek(0)
+        f.write(_headerStruct.pack(
+            MAGIC, VERSION, FLAG_BC3 if includeBC3 else 0,
+            indexOffset, len(index), metadataOffset, len(metadata)))
+
+    os.replace(tempPath, path)
+
+
+class TilesetPack:
+    """
+    An open tileset pack file. The file is memory-mapped, so objects
+    and tiles can be loaded individually, without reading the rest of
+    the file.
+    """
+
+    def __init__(self, path):
+        """
+        Open the tileset pack at path
+        """
+        self.path = path
+        self._stamp = _newFormat.fileStamp(path)
+        self._file = open(path, 'rb')
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        try:
+            self._readIndexAndMetadata()
+        except Exception:
+            self.close()
+            raise
+
+
+    def _readIndexAndMetadata(self):
+        """
+        Read the header, index and metadata
+        """
+        data = self._data
+
+        if len(data) < _headerStruct.size or not data[:4] == MAGIC:
+            raise InvalidTilesetPackError('Incorrect tileset pack file magic')
+        (_, version, self.flags, indexOffset, imageCount, metadataOffset,
+            metadataLen) = _headerStruct.unpack_from(data, 0)
+        if version != VERSION:
+            raise InvalidTilesetPackError(
+                'Unsupported tileset pack version (%d)' % version)
+
+        self._index = [
+            _indexEntryStruct.unpack_from(data, indexOffset + i * _indexEntryStruct.size)
+            for i in range(imageCount)]
+
+        metadata = json.loads(
+            data[metadataOffset : metadataOffset + metadataLen].decode('utf-8'))
+        self.hierarchy = metadata['hierarchy']
+
+        # Object name -> (image index, JSON data, layout string)
+        self._objects = {}
+        self.objectNames = []
+        for objectName, imageIdx, jsonData, lytHex in metadata['objects']:
+            self._objects[objectName] = (imageIdx, jsonData, bytes.fromhex(lytHex))
+            self.objectNames.append(objectName)
+
+        self._tileSources = {}
+
+
+    def close(self):
+        """
+        Close the file. Lazily-loaded objects from this pack can't load
+        their tiles anymore after this.
+        """
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+        self._file.close()
+
+
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        self.close()
+
+
+    def loadTiles(self, imageIdx):
+        """
+        Load the tiles for the image with this index
+        """
+        data = self._data
+        offset, tileCount = self._index[imageIdx]
+        hasBC3 = self.flags & FLAG_BC3
+
+        tiles = []
+        for _ in range(tileCount):
+            image = Image.frombytes('RGBA', (60, 60), data[offset : offset + _RGBA8_SIZE])
+            offset += _RGBA8_SIZE
+            normal = Image.frombytes('RGBA', (60, 60), data[offset : offset + _RGBA8_SIZE])
+            offset += _RGBA8_SIZE
+            tile = Tile.Tile(image, normal, data[offset : offset + 8])
+            offset += 8
+
+            if hasBC3:
+                for attr, mipmapAttr in [
+                        ('rawImageData', 'rawImageMipmapData'),
+                        ('rawNormalData', 'rawNormalMipmapData')]:
+                    setattr(tile, attr, data[offset : offset + _BC3_SIZE])
+                    offset += _BC3_SIZE
+                    mipmaps = []
+                    for size in _BC3_MIPMAP_SIZES:
+                        mipmaps.append(data[offset : offset + size])
+                        offset += size
+                    setattr(tile, mipmapAttr, mipmaps)
+
+            tiles.append(tile)
+
+        return tiles
+
+
+    def loadObject(self, name, *, lazy=False):
+        """
+        Load the object with this name. If lazy is True, an
+        Object.LazyObject is returned, which loads its tiles from this
+        pack the first time they're needed.
+        """
+        imageIdx, jsonData, lytData = self._objects[name]
+        if lazy:
+            if imageIdx not in self._tileSources:
+                self._tileSources[imageIdx] = functools.partial(self.loadTiles, imageIdx)
+            return Object.LazyObject.fromNewLazy(
+                name, lytData, jsonData,
+                self._tileSources[imageIdx], self._index[imageIdx][1],
+                repr((self.path, self._stamp, imageIdx)))
+        else:
+            return Object.Object.fromNew(
+                name, lytData, jsonData, self.loadTiles(imageIdx))
+
+
+    def loadAll(self, *, lazy=False, progress=None):
+        """
+        Load all of the objects. Returns the same thing as
+        Tileset.loadFromNew().
+        """
+        objects = {}
+        tilesCache = {}
+        for i, name in enumerate(self.objectNames):
+            imageIdx, jsonData, lytData = self._objects[name]
+            try:
+                if lazy:
+                    objects[name] = self.loadObject(name, lazy=True)
+                else:
+                    if imageIdx not in tilesCache:
+                        tilesCache[imageIdx] = self.loadTiles(imageIdx)
+                    objects[name] = Object.Object.fromNew(
+                        name, lytData, jsonData, tilesCache[imageIdx])
+            except Exception:
+                print('WARNING: Could not load "' + name + '" from ' + self.path)
+
+            if progress is not None:
+                progress(i + 1, len(self.objectNames))
+
+        return objects, self.hierarchy
+
+
+def load(path, *, lazy=False, progress=None):
+    """
+    Load all of the objects from the tileset pack at path. Returns the
+    same thing as Tileset.loadFromNew(). If lazy is True, the file is
+    kept open so that the objects can load their tiles later.
+    """
+    pack = TilesetPack(path)
+    try:
+        return pack.loadAll(lazy=lazy, progress=progress)
+    finally:
+        if not lazy:
+            pack.close()
+
+
+if __name__ == '__main__':
+    # python -m nsmbulib.TilesetPack [--bc3] <folder> <output file>
+    import sys
+    args = sys.argv[1:]
+    format = None
+    if '--bc3' in args:
+        args.remove('--bc3')
+        format = _common.TilesetFormat.BC3
+    if len(args) != 2:
+        print('Usage: python -m nsmbulib.TilesetPack [--bc3] <folder> <output file (%s)>' % EXTENSION)
+        sys.exit(1)
+    save(args[0], args[1], format=format)
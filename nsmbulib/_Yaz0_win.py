@@ -1,11 +1,17 @@
 import os
-import shutil
 import subprocess
 
 from . import _common
 
 
 
+def _toolPath(name):
+    """
+    Return the full path to one of the tools next to this file
+    """
+    return os.path.join(os.path.dirname(os.path.realpath(__file__)), name)
+
+
 def decompress(data):
     """
     Decompress Yaz0 using YAZ0UNP
@@ -20,25 +26,24 @@ def decompress(data):
         # choke on. Just return b'' manually.
         return b''
 
-    with _common.cwdAsPathTo(__file__):
+    # Each call runs YAZ0UNP in its own temporary folder, so that
+    # several processes can decompress at once
+    with _common.tempFolder() as folder:
 
-        with open(_common.TEMP_FILE_NAME + '.szs', 'wb') as f:
+        with open(os.path.join(folder, _common.TEMP_FILE_NAME + '.szs'), 'wb') as f:
             f.write(data)
 
         with _common.getDevNull() as devnull:
             with subprocess.Popen(
-                ['YAZ0UNP.EXE', _common.TEMP_FILE_NAME + '.szs'],
+                [_toolPath('YAZ0UNP.EXE'), _common.TEMP_FILE_NAME + '.szs'],
                 stdout=devnull,
+                cwd=folder,
                 ) as proc:
                 proc.communicate()
 
-        os.remove(_common.TEMP_FILE_NAME + '.szs')
-
-        with open('UNPACK/0.UNP', 'rb') as f:
+        with open(os.path.join(folder, 'UNPACK', '0.UNP'), 'rb') as f:
             unp = f.read()
 
-        shutil.rmtree('UNPACK')
-
     return unp
 
 
@@ -61,25 +66,21 @@ def _compressFake(data):
     # 1) Call "fake_yaz0.exe uncompressedFile outputFile"
     # 2) The "compressed" data is put into outputFile.
 
-    with _common.cwdAsPathTo(__file__):
+    with _common.tempFolder() as folder:
 
-        with open(_common.TEMP_FILE_NAME + '.bin', 'wb') as f:
+        with open(os.path.join(folder, _common.TEMP_FILE_NAME + '.bin'), 'wb') as f:
             f.write(data)
 
         with subprocess.Popen([
-                'fake_yaz0.exe',
+                _toolPath('fake_yaz0.exe'),
                 _common.TEMP_FILE_NAME + '.bin',
                 _common.TEMP_FILE_NAME + '.szs',
-                ]) as proc:
+                ], cwd=folder) as proc:
             proc.communicate()
 
-        os.remove(_common.TEMP_FILE_NAME + '.bin')
-
-        with open(_common.TEMP_FILE_NAME + '.szs', 'rb') as f:
+        with open(os.path.join(folder, _common.TEMP_FILE_NAME + '.szs'), 'rb') as f:
             packed = f.read()
 
-        os.remove(_common.TEMP_FILE_NAME + '.szs')
-
     return packed
 
 
@@ -98,20 +99,17 @@ def _compressYAZ0COMP(data):
     # 2) Call YAZ0COMP.EXE (no arguments)
     # 3) The compressed data is put into a file called "!out".
 
-    with _common.cwdAsPathTo(__file__):
+    with _common.tempFolder() as folder:
 
-        with open('unp', 'wb') as f:
+        with open(os.path.join(folder, 'unp'), 'wb') as f:
             f.write(data)
 
         with _common.getDevNull() as devnull:
-            with subprocess.Popen('YAZ0COMP.EXE', stdout=devnull) as proc:
+            with subprocess.Popen(
+                _toolPath('YAZ0COMP.EXE'), stdout=devnull, cwd=folder) as proc:
                 proc.communicate()
 
-        os.remove('unp')
-
-        with open('!out', 'rb') as f:
+        with open(os.path.join(folder, '!out'), 'rb') as f:
             packed = f.read()
 
-        os.remove('!out')
-
     return packed
@@ -4,7 +4,9 @@ import itertools
 import logging
 import os
 import os.path
+import shutil
 import struct
+import tempfile
 import traceback
 
 
@@ -31,6 +33,14 @@ class SortableEnum(enum.Enum):
         return True
 
 
+class TilesetFormat(enum.Enum):
+    """
+    Formats a tileset can be saved to.
+    """
+    RGBA8 = 1
+    BC3 = 2
+
+
 def getDevNull():
     """
     Returns a handle to /dev/null/. (Cross-platform.)
@@ -121,6 +131,21 @@ def cwdAsPathTo(filepath):
     os.chdir(oldcwd)
 
 
+@contextlib.contextmanager
+def tempFolder():
+    """
+    A context manager that makes a new, empty temporary folder, and
+    deletes it again afterwards. The value bound to the target of the
+    `as` clause is its full path. Every call gets its own folder, so
+    this can be used from several processes or threads at once.
+    """
+    folder = tempfile.mkdtemp(prefix='nsmbulib')
+    try:
+        yield folder
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
 def imagesIdentical(first, second):
     """
     Compare these images to see if they're the same or not.
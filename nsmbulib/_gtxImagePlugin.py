@@ -73,78 +73,88 @@ class RawTexInfoStruct(struct.Struct):
         self._90, self._94, self._98) = self.unpack_from(data, idx)
 
 
-class GtxImageFile(ImageFile.ImageFile):
+def readGtx(fp):
+    """
+    Read the texture info and raw (still swizzled) data from a GTX file,
+    without decoding it. Returns (size, format, data, mipmaps).
+    """
+    size, format_ = (0, 0), 0
+    rawData = b''
 
-    format = 'GTX'
-    format_description = 'Nintendo Wii U GTX Texture'
+    gfx2Header = fp.read(32)
+    headStruct = Gfx2HeaderStruct()
+    headStruct.loadFrom(gfx2Header, 0)
+    if headStruct.magic != GFX2_MAGIC:
+        raise ValueError('Not a GTX texture')
 
-    def _open(self):
+    idx = headStruct.size
+
+    mipmapDataSplit = []
 
-        width, height, format = 0, 0, 0
-        rawData = b''
+    # Parse each BLK section
+    blkStruct = BLKHeaderStruct()
+    rawTexInfoStruct = RawTexInfoStruct()
+    while True:
+        blkHeaderData = fp.read(blkStruct.size)
 
-        gfx2Header = self.fp.read(32)
-        headStruct = Gfx2HeaderStruct()
-        headStruct.loadFrom(gfx2Header, 0)
-        if headStruct.magic != GFX2_MAGIC:
-            raise ValueError('Not a GTX texture')
+        if len(blkHeaderData) < blkStruct.size:
+            break # EOF
 
-        idx = headStruct.size
+        blkStruct.loadFrom(blkHeaderData, 0)
 
-        mipmapDataSplit = []
+        if blkStruct.magic != BLK_MAGIC:
+            raise ValueError('Wrong BLK section magic')
 
-        # Parse each BLK section
-        blkStruct = BLKHeaderStruct()
-        rawTexInfoStruct = RawTexInfoStruct()
-        while True:
-            blkHeaderData = self.fp.read(blkStruct.size)
+        if blkStruct._10 == 0x0B:
+            # Raw texture info
 
-            if len(blkHeaderData) < blkStruct.size:
-                break # EOF
+            rawTexHeaderData = fp.read(rawTexInfoStruct.size)
 
-            blkStruct.loadFrom(blkHeaderData, 0)
+            if len(rawTexHeaderData) < rawTexInfoStruct.size:
+                raise ValueError('Truncated BLK header')
 
-            if blkStruct.magic != BLK_MAGIC:
-                raise ValueError('Wrong BLK section magic')
+            rawTexInfoStruct.loadFrom(rawTexHeaderData, 0)
 
-            if blkStruct._10 == 0x0B:
-                # Raw texture info
+            size = (rawTexInfoStruct.width, rawTexInfoStruct.height)
+            format_ = rawTexInfoStruct.format_
 
-                rawTexHeaderData = self.fp.read(rawTexInfoStruct.size)
+        elif blkStruct._10 == 0x0C and not rawData:
+            # Grab raw data
 
-                if len(rawTexHeaderData) < rawTexInfoStruct.size:
-                    raise ValueError('Truncated BLK header')
+            rawData = fp.read(blkStruct.sectionSize)
+            if len(rawData) < blkStruct.sectionSize:
+                raise ValueError('Truncated texture data')
 
-                rawTexInfoStruct.loadFrom(rawTexHeaderData, 0)
+        elif blkStruct._10 == 0x0D and not mipmapDataSplit:
+            # Grab mipmap data
 
-                self._size = (rawTexInfoStruct.width, rawTexInfoStruct.height)
-                format_ = rawTexInfoStruct.format_
+            mipmapData = fp.read(blkStruct.sectionSize)
+            if len(mipmapData) < blkStruct.sectionSize:
+                raise ValueError('Truncated mipmap data')
 
-            elif blkStruct._10 == 0x0C and not rawData:
-                # Grab raw data
+            if mipmapData:
+                i = 0
+                sizeToGet = len(rawData) // 4
+                while sizeToGet >= 4:
+                    mipmapDataSplit.append(mipmapData[i:i+sizeToGet])
+                    i += sizeToGet
+                    sizeToGet //= 4
 
-                rawData = self.fp.read(blkStruct.sectionSize)
-                if len(rawData) < blkStruct.sectionSize:
-                    raise ValueError('Truncated texture data')
+        else:
+            # Ignore.
+            fp.read(blkStruct.sectionSize)
+
+    return size, format_, rawData, mipmapDataSplit
 
-            elif blkStruct._10 == 0x0D and not mipmapDataSplit:
-                # Grab mipmap data
 
-                mipmapData = self.fp.read(blkStruct.sectionSize)
-                if len(mipmapData) < blkStruct.sectionSize:
-                    raise ValueError('Truncated mipmap data')
+class GtxImageFile(ImageFile.ImageFile):
 
-                if mipmapData:
-                    i = 0
-                    sizeToGet = len(rawData) // 4
-                    while sizeToGet >= 4:
-                        mipmapDataSplit.append(mipmapData[i:i+sizeToGet])
-                        i += sizeToGet
-                        sizeToGet //= 4
+    format = 'GTX'
+    format_description = 'Nintendo Wii U GTX Texture'
+
+    def _open(self):
 
-            else:
-                # Ignore.
-                self.fp.read(blkStruct.sectionSize)
+        self._size, format_, rawData, mipmapDataSplit = readGtx(self.fp)
 
         # This is hardcoded because we're about to manually convert the
         # compressed texture to RGBA. PIL needs to know that what it's
@@ -1,3 +1,4 @@
+import functools
 import os
 import os.path
 import struct
@@ -134,6 +135,15 @@ def renderBC3(data, w, h):
     return _renderBC3_py(data, w, h)
 
 
+def renderDeswizzledBC3(data, w, h):
+    """
+    Standard BC3 -> unswizzled RGBA8
+    """
+    if AmdCompressAvailable:
+        return _renderBC3_AmdCompress(data, w, h)
+    return _renderDeswizzledBC3_py(data, w, h)
+
+
 def _renderBC3_py(data, w, h):
     """
     Swizzled BC3 -> unswizzled RGBA8
@@ -223,6 +233,124 @@ def deswizzleBC3(data, w, h):
     return bytes(work)
 
 
+def _swizzledBC3BlockPos(x, y, blobWidth):
+    """
+    Index of the block at (x, y) in GTX-swizzled BC3 data
+    """
+    pos = ((y >> 4) * (blobWidth * 16)) & 0xFFFF
+    pos ^= (y & 1)
+    pos ^= (x & 7) << 1
+    pos ^= (x & 8) << 1
+    pos ^= (x & 8) << 2
+    pos ^= (x & 0x10) << 2
+    pos ^= (x & ~0x1F) << 4
+    pos ^= (y & 2) << 6
+    pos ^= (y & 4) << 6
+    pos ^= (y & 8) << 1
+    pos ^= (y & 0x10) << 2
+    pos ^= (y & 0x20)
+    return pos
+
+
+@functools.lru_cache()
+def _bc3SwizzleIsPermutation(w, h):
+    """
+    Check if the swizzle for this texture size just moves blocks
+    around. For some small sizes, it points past the end of the data
+    instead, and deswizzleBC3() gives a differently-sized result.
+    """
+    blobWidth, blobHeight = w // 4, h // 4
+    positions = sorted(
+        _swizzledBC3BlockPos(x, y, blobWidth)
+        for y in range(blobHeight) for x in range(blobWidth))
+    return positions == list(range(blobWidth * blobHeight))
+
+
+def deswizzleBC3Region(data, w, h, blockX, blockY, blockW, blockH):
+    """
+    GTX-swizzled BC3 -> standard BC3, for only a rectangle of the
+    texture. The rectangle is given in 4x4 blocks, not pixels. The
+    result is the same as cutting the rectangle out of deswizzleBC3()'s
+    output, but a lot faster for small rectangles.
+    """
+    blobWidth, blobHeight = w // 4, h // 4
+    work = bytearray(blockW * blockH * 16)
+
+    inBounds = blockX + blockW <= blobWidth and blockY + blockH <= blobHeight
+    if inBounds and _bc3SwizzleIsPermutation(w, h):
+        source, getPos = data, _swizzledBC3BlockPos
+    else:
+        source = deswizzleBC3(data, w, h)
+        getPos = lambda x, y, blobWidth: y * blobWidth + x
+
+    toPos = 0
+    for y in range(blockY, blockY + blockH):
+        for x in range(blockX, blockX + blockW):
+            pos = getPos(x, y, blobWidth) * 16
+            work[toPos:toPos + 16] = source[pos:pos + 16]
+            toPos += 16
+
+    return bytes(work)
+
+
+# 5- and 6-bit color channel -> 8 bits, rounded like
+# _calculateRGBFromDxtAtPosition() does it
+_expand5 = [int(v * 0xFF / 0x1F) for v in range(0x20)]
+_expand6 = [int(v * 0xFF / 0x3F) for v in range(0x40)]
+
+
+def _renderDeswizzledBC3_py(data, w, h):
+    """
+    Standard BC3 -> unswizzled RGBA8, in pure Python. This decodes a
+    whole 4x4 block at a time, so it's fast enough for the few tiles
+    Tile._makeSomeTilesFromGtx() asks for, but not for entire tilesets.
+    The result is the same as _calculateRGBAFromBC3AtPosition()'s.
+    """
+    output = bytearray(w * h * 4)
+
+    pointer = 0
+    for blockY in range(0, h, 4):
+        for blockX in range(0, w, 4):
+            block = data[pointer:pointer + 16]
+            pointer += 16
+
+            # Alpha palette
+            alpha0, alpha1 = block[0], block[1]
+            if alpha0 > alpha1:
+                alphas = [alpha0, alpha1] + [
+                    (alpha0 * (8 - code) + alpha1 * (code - 1)) // 7
+                    for code in range(2, 8)]
+            else:
+                alphas = [alpha0, alpha1] + [
+                    (alpha0 * (6 - code) + alpha1 * (code - 1)) // 5
+                    for code in range(2, 6)] + [0, 255]
+            alphaBits = int.from_bytes(block[2:8], 'little')
+
+            # Color palette (BC3 always uses the four-color mode)
+            color0 = block[8] | (block[9] << 8)
+            color1 = block[10] | (block[11] << 8)
+            r0, g0, b0 = _expand5[color0 >> 11], _expand6[(color0 >> 5) & 0x3F], _expand5[color0 & 0x1F]
+            r1, g1, b1 = _expand5[color1 >> 11], _expand6[(color1 >> 5) & 0x3F], _expand5[color1 & 0x1F]
+            colors = [
+                (r0, g0, b0),
+                (r1, g1, b1),
+                ((r0 * 2 + r1) // 3, (g0 * 2 + g1) // 3, (b0 * 2 + b1) // 3),
+                ((r0 + r1 * 2) // 3, (g0 + g1 * 2) // 3, (b0 + b1 * 2) // 3),
+                ]
+            colorBits = int.from_bytes(block[12:16], 'little')
+
+            for y in range(min(4, h - blockY)):
+                outputPos = ((blockY + y) * w + blockX) * 4
+                for x in range(min(4, w - blockX)):
+                    texel = y * 4 + x
+                    r, g, b = colors[(colorBits >> (texel * 2)) & 3]
+                    a = alphas[(alphaBits >> (texel * 3)) & 7]
+                    output[outputPos:outputPos + 4] = bytes((r, g, b, a))
+                    outputPos += 4
+
+    return bytes(output)
+
+
 def _calculateRGBAFromBC3AtPosition(width, pixdata, i, j, noalpha):
     """
     Fetches a RGBA texel from position (i, j) in a BC3 texture.
@@ -329,35 +457,31 @@ def _renderBC3_AmdCompress(bc3, w, h):
     # read whatever it gives us and call it a day.
 
     # AMDCompressCLI requires that the cwd be its own folder. Sigh.
-    tempIn = os.path.abspath(TEMP_FILE_NAME + '.dds')
-    tempOut = os.path.abspath(TEMP_FILE_NAME + '2.dds')
-
-    with open(tempIn, 'wb') as f:
-        f.write(header + bc3)
-
-    origcwd = os.getcwd()
-    os.chdir(AmdCompressFolder)
-
-    with subprocess.Popen(
-        [
-            'AMDCompressCLI.exe',
-            '-fd ARGB_8888',
-            '-nomipmap',
-            tempIn,
-            tempOut,
-        ],
-        stdout=_common.getDevNull(),
-        ) as proc:
-
-        proc.communicate() # lets us wait for AMDCompress to finish
-
-    os.chdir(origcwd)
-
-    with open(tempOut, 'rb') as f:
-        rgba = f.read()[0x80:] # strip DDS header
-
-    os.remove(tempIn)
-    os.remove(tempOut)
+    # The files go in a temporary folder of their own, so that several
+    # processes can use it at once.
+    with _common.tempFolder() as folder:
+        tempIn = os.path.join(folder, TEMP_FILE_NAME + '.dds')
+        tempOut = os.path.join(folder, TEMP_FILE_NAME + '2.dds')
+
+        with open(tempIn, 'wb') as f:
+            f.write(header + bc3)
+
+        with subprocess.Popen(
+            [
+                os.path.join(AmdCompressFolder, 'AMDCompressCLI.exe'),
+                '-fd ARGB_8888',
+                '-nomipmap',
+                tempIn,
+                tempOut,
+            ],
+            stdout=_common.getDevNull(),
+            cwd=AmdCompressFolder,
+            ) as proc:
+
+            proc.communicate() # lets us wait for AMDCompress to finish
+
+        with open(tempOut, 'rb') as f:
+            rgba = f.read()[0x80:] # strip DDS header
 
     return rgba
 
@@ -382,43 +506,37 @@ def _encodeBC3_AmdCompress(image):
         raise RuntimeError('AMD Compress could not be found')
 
     # Pick file paths
-    tempIn = os.path.abspath(TEMP_FILE_NAME + '.png')
-    tempOut = os.path.abspath(TEMP_FILE_NAME + '.dds')
-
-    # Make the PNG
-    image.save(tempIn)
-
-    # Change directory to AMD Compress's folder
-    origcwd = os.getcwd()
-    os.chdir(AmdCompressFolder)
-
-    with subprocess.Popen(
-        [
-            'AMDCompressCLI.exe',
-            '-fd',
-            'BC3',
-            '-nomipmap',
-            tempIn,
-            tempOut,
-        ],
-        stdout=_common.getDevNull(),
-        ) as proc:
-
-        proc.communicate() # lets us wait for AMDCompress to finish
-
-    os.chdir(origcwd)
-
-    with open(tempOut, 'rb') as f:
-        data = f.read()
+    with _common.tempFolder() as folder:
+        tempIn = os.path.join(folder, TEMP_FILE_NAME + '.png')
+        tempOut = os.path.join(folder, TEMP_FILE_NAME + '.dds')
+
+        # Make the PNG
+        image.save(tempIn)
+
+        # AMD Compress has to be run from its own folder
+        with subprocess.Popen(
+            [
+                os.path.join(AmdCompressFolder, 'AMDCompressCLI.exe'),
+                '-fd',
+                'BC3',
+                '-nomipmap',
+                tempIn,
+                tempOut,
+            ],
+            stdout=_common.getDevNull(),
+            cwd=AmdCompressFolder,
+            ) as proc:
+
+            proc.communicate() # lets us wait for AMDCompress to finish
+
+        with open(tempOut, 'rb') as f:
+            data = f.read()
 
     type_ = data[0x54:0x58].decode('latin-1')
     if type_ != 'DXT5':
         raise RuntimeError('AMD Compress failed to produce BC3 output -- it instead gave "%s".' % type_)
     bc3 = data[0x80:] # strip DDS header
 
-    os.remove(tempIn)
-    os.remove(tempOut)
-
     return bc3
 
 
@@ -0,0 +1,121 @@
+import concurrent.futures
+import os
+import os.path
+
+from PIL import Image
+
+from . import Object
+
+
+# Helpers for reading new-format (OneTileset) folders, shared by
+# Tileset.loadFromNew() and TilesetPack
+
+# Starting worker processes takes a while, so decodeImageGroups() only
+# does that if there are at least this many images to decode
+MIN_IMAGES_FOR_PROCESS_POOL = 32
+
+
+def fileStamp(path):
+    """
+    Return (size, mtime) for the file at path, or None if it doesn't
+    exist. Used to tell if a cached file is still up to date.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def packImage(img):
+    """
+    PIL Image -> (mode, size, pixel data), or None if the image can't
+    be rebuilt from just that (for example, paletted images)
+    """
+    if img.mode not in ('RGBA', 'RGB', 'LA', 'L'): return None
+    return img.mode, img.size, img.tobytes()
+
+
+def unpackImage(packed):
+    """
+    The reverse of packImage()
+    """
+    mode, size, data = packed
+    return Image.frombytes(mode, size, data)
+
+
+def decodeImageGroup(fullName):
+    """
+    Load the collisions, main image and normal map for the .colls/.png
+    pair at fullName (without an extension). Returns (collsData,
+    packedMain, packedNml), with the images packed by packImage() so
+    that they're cheap to send back from a worker process. The packed
+    images are None if they can't be packed.
+    """
+    with open(fullName + '.colls', 'rb') as f:
+        collsData = f.read()
+    imgmain, imgnml = Object._loadImgAndNml(fullName + '.png')
+    return collsData, packImage(imgmain), packImage(imgnml)
+
+
+def decodeImageGroups(fullNames, processes=None):
+    """
+    Yield decodeImageGroup(fullName) for each of fullNames, in order.
+    If there are enough of them, they're decoded in up to `processes`
+    worker processes (by default, one per CPU). Pass processes=1 to
+    decode everything in this process.
+    """
+    if processes == 1 or len(fullNames) < MIN_IMAGES_FOR_PROCESS_POOL:
+        yield from map(decodeImageGroup, fullNames)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        yield from executor.map(decodeImageGroup, fullNames, chunksize=4)
+
+
+def scanNewFormatFolder(folder):
+    """
+    Find all of the .colls/.png and .json/.objlyt pairs in a new-format
+    folder. Returns the hierarchy (see Tileset.loadFromNew()), a list of image
+    names (full paths without extensions) and a list of
+    (folder, file name, image name, object name) tuples for the
+    objects, in the order in which they should be loaded.
+    """
+    hierarchy = {}
+    imageNames = []
+    objectNames = []
+
+    def scanFolder(folder, outerLevelOfHierarchy):
+        collsAndPngs = []
+        jsonAndObjlyts = []
+        for itemName in os.listdir(folder):
+            fullItemName = os.path.join(folder, itemName)
+            if os.path.isdir(fullItemName) and not itemName.startswith('_'):
+                outerLevelOfHierarchy[itemName] = {}
+                scanFolder(fullItemName, outerLevelOfHierarchy[itemName])
+            elif itemName.endswith('.json') and os.path.isfile(fullItemName[:-5] + '.objlyt'):
+                jsonAndObjlyts.append(itemName[:-5])
+            elif itemName.endswith('.colls') and os.path.isfile(fullItemName[:-6] + '.png'):
+                collsAndPngs.append(itemName[:-6])
+
+        for name in collsAndPngs:
+            imageNames.append(os.path.join(folder, name))
+
+        # Keep track of the object names, skipping the ones we won't
+        # have the tiles for
+        objList = []
+        for name in jsonAndObjlyts:
+            if name.count('.') != 1: continue
+            imageName, objectName = name.split('.')
+            if imageName not in collsAndPngs: continue
+            objectNames.append((folder, name, imageName, objectName))
+            objList.append(objectName)
+
+        # If there are no objects at this level, we don't need the object list
+        # in the hierarchy
+        if objList:
+            outerLevelOfHierarchy['/'] = objList
+
+    scanFolder(folder, hierarchy)
+
+    return hierarchy, imageNames, objectNames
@@ -162,17 +162,47 @@ def iterLayoutStr(layoutStr):
         off += 1
 
 
-def renderObject(
-        layoutStr, width, height, *,
-        fullslope=False,
+class _CompiledLayout:
+    """
+    A layout string that has already been split up into rows, columns
+    and repeating spans, so that it can be rendered at any size without
+    being parsed again. Use compileLayout() to make one of these.
+    """
+    diagonal = False
+
+    # Standard objects: the rows before, inside and after the Y-repeating
+    # span. Each row is itself a (before, inside, after) tuple of tuples of
+    # normalized tile values, for the X-repeating span.
+    rowsBeforeRepeat = ()
+    rowsInRepeat = ()
+    rowsAfterRepeat = ()
+
+    # Diagonal objects: the main and sub blocks (tuples of rows), and the
+    # direction of the slope
+    mainBlock = None
+    subBlock = None
+    outward = False
+    floor = False
+
+
+def compileLayout(
+        layoutStr,
         normalizeTileStep=(lambda tileStep: tileStep.tilesetNum * 256 + tileStep.tileNum)
         ):
     """
-    Render a tileset object into an array
+    Compile a list of layout string steps into a _CompiledLayout, which
+    can be rendered quickly (and repeatedly) with renderCompiled().
     """
+    layout = _CompiledLayout()
 
     if layoutStr[0].type == 'slope':
-        return _renderDiagonalObject(layoutStr, width, height, fullslope, normalizeTileStep)
+        layout.diagonal = True
+        mainBlock, subBlock = _getSlopeSections(layoutStr, normalizeTileStep)
+        layout.mainBlock = tuple(tuple(row) for row in mainBlock)
+        if subBlock is not None:
+            layout.subBlock = tuple(tuple(row) for row in subBlock)
+        layout.outward, layout.floor = layoutStr[0].outward, layoutStr[0].floor
+        return layout
 
     # Identify repeating rows with respect to Y
 
@@ -185,12 +215,13 @@ def renderObject(
     currentRow = []
     for step in layoutStr:
         if step.type == 'lf':
+            row = _compileStandardRow(currentRow, normalizeTileStep)
             if thisRowRepeats:
-                rowsInRepeat.append(currentRow)
+                rowsInRepeat.append(row)
             elif not repeatExists:
-                rowsBeforeRepeat.append(currentRow)
+                rowsBeforeRepeat.append(row)
             else:
-                rowsAfterRepeat.append(currentRow)
+                rowsAfterRepeat.append(row)
             currentRow = []
             thisRowRepeats = False
         else:
@@ -199,33 +230,16 @@ def renderObject(
                 thisRowRepeats = True
             currentRow.append(step)
 
-    # _render
+    layout.rowsBeforeRepeat = tuple(rowsBeforeRepeat)
+    layout.rowsInRepeat = tuple(rowsInRepeat)
+    layout.rowsAfterRepeat = tuple(rowsAfterRepeat)
+    return layout
 
-    dest = []
-    if not rowsInRepeat:
-        # No Y-repeating
-        for y in range(height):
-            dest.append(_renderStandardRow(rowsBeforeRepeat[y % len(rowsBeforeRepeat)], width, normalizeTileStep))
-    else:
-        # Y-repeating
-        for y in range(height):
-            if y < len(rowsBeforeRepeat):
-                dest.append(_renderStandardRow(rowsBeforeRepeat[y], width, normalizeTileStep))
-            elif y >= height - len(rowsAfterRepeat):
-                dest.append(_renderStandardRow(rowsAfterRepeat[y - height + len(rowsAfterRepeat)], width, normalizeTileStep))
-            else:
-                dest.append(_renderStandardRow(rowsInRepeat[(y - len(rowsBeforeRepeat)) % len(rowsInRepeat)], width, normalizeTileStep))
-
-    return dest
 
-
-def _renderStandardRow(steps, width, normalizeTileStep):
+def _compileStandardRow(steps, normalizeTileStep):
     """
-    _render a row from an object
+    Identify the repeating steps in a row from an object
     """
-
-    # Identify repeating steps
-
     repeatExists = False
     stepsBeforeRepeat = []
     stepsInRepeat = []
@@ -237,43 +251,153 @@ def _renderStandardRow(steps, width, normalizeTileStep):
 
         if step.repeatX:
             repeatExists = True
-            stepsInRepeat.append(step)
+            stepsInRepeat.append(normalizeTileStep(step))
         elif not repeatExists:
-            stepsBeforeRepeat.append(step)
+            stepsBeforeRepeat.append(normalizeTileStep(step))
         else:
-            stepsAfterRepeat.append(step)
+            stepsAfterRepeat.append(normalizeTileStep(step))
 
-    # _render
+    return tuple(stepsBeforeRepeat), tuple(stepsInRepeat), tuple(stepsAfterRepeat)
 
+
+def renderObject(
+        layoutStr, width, height, *,
+        fullslope=False,
+        normalizeTileStep=(lambda tileStep: tileStep.tilesetNum * 256 + tileStep.tileNum)
+        ):
+    """
+    Render a tileset object into an array
+    """
+    layout = compileLayout(layoutStr, normalizeTileStep)
+    return [list(row) for row in renderCompiled(layout, width, height, fullslope=fullslope)]
+
+
+def renderCompiled(layout, width, height, *, fullslope=False):
+    """
+    Render a compiled tileset object (see compileLayout()) into an
+    array. The return value is a list of rows, each of which is a
+    tuple. Identical rows may be the same tuple object.
+    """
+
+    if layout.diagonal:
+        return _renderDiagonalObject(layout, width, height, fullslope)
+
+    rows = _expandSpans(
+        layout.rowsBeforeRepeat, layout.rowsInRepeat, layout.rowsAfterRepeat, height)
+
+    # Render each distinct row only once
+    renderedRows = {}
     dest = []
-    if not stepsInRepeat:
-        # No X-repeating
-        for x in range(width):
-            dest.append(normalizeTileStep(stepsBeforeRepeat[x % len(stepsBeforeRepeat)]))
-    else:
-        # X-repeating
-        for x in range(width):
-            if x < len(stepsBeforeRepeat):
-                dest.append(normalizeTileStep(stepsBeforeRepeat[x]))
-            elif x >= width - len(stepsAfterRepeat):
-                dest.append(normalizeTileStep(stepsAfterRepeat[x - width + len(stepsAfterRepeat)]))
+    for row in rows:
+        rendered = renderedRows.get(id(row))
+        if rendered is None:
+            rendered = renderedRows[id(row)] = tuple(_expandSpans(*row, width))
+        dest.append(rendered)
+
+    return dest
+
+
+def rerenderCompiled(layout, previous, width, height, *, fullslope=False):
+    """
+    Render a compiled tileset object at a new size, reusing as much as
+    possible of `previous`, which must be a rendering of the same
+    object returned by renderCompiled() or rerenderCompiled() (with the
+    same `fullslope` value). Only the rows and columns that actually
+    change are recomputed. The result is identical to what
+    renderCompiled() would return.
+    """
+    prevHeight = len(previous)
+    prevWidth = len(previous[0]) if previous else 0
+    if not prevHeight or not prevWidth:
+        return renderCompiled(layout, width, height, fullslope=fullslope)
+
+    if layout.diagonal:
+        return _rerenderDiagonalObject(
+            layout, previous, prevWidth, prevHeight, width, height, fullslope)
+
+    spans = layout.rowsBeforeRepeat, layout.rowsInRepeat, layout.rowsAfterRepeat
+    prevRows = _expandSpans(*spans, prevHeight)
+    rows = _expandSpans(*spans, height)
+
+    # Each row's source row only depends on the height, and its contents
+    # only on the width. So we can reuse (part of) any previous row that
+    # came from the same source row.
+    renderedRows = {}
+    for prevRow, prevRendered in zip(prevRows, previous):
+        renderedRows.setdefault(id(prevRow), prevRendered)
+
+    newRows = {}
+    dest = []
+    for row in rows:
+        rendered = newRows.get(id(row))
+        if rendered is None:
+            prevRendered = renderedRows.get(id(row))
+            if prevRendered is None:
+                rendered = tuple(_expandSpans(*row, width))
+            elif width == prevWidth:
+                rendered = prevRendered
             else:
-                dest.append(normalizeTileStep(stepsInRepeat[(x - len(stepsBeforeRepeat)) % len(stepsInRepeat)]))
+                keep = min(_unchangedPrefixLength(*row, prevWidth, width), width)
+                rendered = prevRendered[:keep] + tuple(_expandSpans(*row, width, keep))
+            newRows[id(row)] = rendered
+        dest.append(rendered)
 
     return dest
 
 
-def _renderDiagonalObject(layoutStr, width, height, fullslope, normalizeTileStep):
+def _expandSpans(before, inside, after, length, start=0):
     """
-    _render a diagonal object
+    Expand a (before, inside, after) set of spans to the length given,
+    repeating the inside span as needed. If there's no inside span, the
+    whole thing repeats. This is used for both rows and columns.
+    If `start` is given, only items from that index onward are returned.
+    """
+    if not inside:
+        # No repeating
+        return list((before * (length // len(before) + 1))[start:length])
+
+    # Repeating
+    tailStart = max(len(before), length - len(after))
+
+    head = before[start:length]
+
+    midStart = max(start, len(before))
+    midLen = max(0, tailStart - midStart)
+    offset = (midStart - len(before)) % len(inside)
+    middle = ((inside[offset:] + inside * (midLen // len(inside) + 1))[:midLen]
+              if midLen else ())
+
+    tailFrom = max(start, tailStart)
+    tail = after[tailFrom - length + len(after):] if tailFrom < length else ()
+
+    return list(head) + list(middle) + list(tail)
+
+
+def _unchangedPrefixLength(before, inside, after, oldLength, newLength):
+    """
+    Return the number of leading items that are the same when this set
+    of spans is expanded to oldLength and to newLength
+    """
+    if not inside:
+        return min(oldLength, newLength)
+    return min(
+        max(len(before), oldLength - len(after)),
+        max(len(before), newLength - len(after)),
+        oldLength, newLength)
+
+
+def _diagonalPlacements(layout, width, height, fullslope):
+    """
+    Return a list with one entry for each repetition of the main (and
+    sub) block of this diagonal object, in drawing order. Each entry is
+    a list of (x, y, block) tuples.
     """
 
     # Get sections
-    mainBlock, subBlock = _getSlopeSections(layoutStr, normalizeTileStep)
+    mainBlock, subBlock = layout.mainBlock, layout.subBlock
 
     # Get direction
-    slopeStep = layoutStr[0]
-    outward, floor = slopeStep.outward, slopeStep.floor
+    outward, floor = layout.outward, layout.floor
 
     # Decide on the amount to draw by seeing how much we can fit in each direction
     if fullslope:
@@ -318,29 +442,120 @@ def _renderDiagonalObject(layoutStr, width, height, fullslope, normalizeTileStep
         yi = -len(mainBlock)
 
 
-    # Create a dest and initialize it to empty tiles
-    dest = []
-    for _ in range(height):
-        dest.append([])
-        for _ in range(width):
-            dest[-1].append(EMPTY_TILE_VALUE)
-
-    # Finally, draw it
+    # Finally, place the blocks
+    placements = []
     for i in range(drawAmount):
-        _putObjectArray(dest, x, y, mainBlock, width, height)
+        placement = [(x, y, mainBlock)]
         if subBlock is not None:
             xb = x
             if not outward: xb = x + len(mainBlock[0]) - len(subBlock[0])
             if not floor:
-                _putObjectArray(dest, xb, y - len(subBlock), subBlock, width, height)
+                placement.append((xb, y - len(subBlock), subBlock))
             else:
-                _putObjectArray(dest, xb, y + len(mainBlock), subBlock, width, height)
+                placement.append((xb, y + len(mainBlock), subBlock))
+        placements.append(placement)
         x += xi
         y += yi
 
+    return placements
+
+
+def _renderDiagonalObject(layout, width, height, fullslope):
+    """
+    _render a diagonal object
+    """
+
+    # Create a dest and initialize it to empty tiles
+    dest = []
+    for _ in range(height):
+        dest.append([])
+        for _ in range(width):
+            dest[-1].append(EMPTY_TILE_VALUE)
+
+    # Finally, draw it
+    for placement in _diagonalPlacements(layout, width, height, fullslope):
+        for x, y, block in placement:
+            _putObjectArray(dest, x, y, block, width, height)
+
+    return [tuple(row) for row in dest]
+
+
+def _rerenderDiagonalObject(
+        layout, previous, prevWidth, prevHeight, width, height, fullslope):
+    """
+    Re-render a diagonal object at a new size, reusing rows from the
+    previous rendering. The repetitions common to both sizes only move
+    vertically, so a row is recomputed only if a repetition that exists
+    at just one of the two sizes touches it.
+    """
+    prevPlacements = _diagonalPlacements(layout, prevWidth, prevHeight, fullslope)
+    placements = _diagonalPlacements(layout, width, height, fullslope)
+    common = min(len(prevPlacements), len(placements))
+
+    # The vertical distance the common repetitions moved by
+    if common:
+        dy = placements[0][0][1] - prevPlacements[0][0][1]
+    else:
+        dy = 0
+
+    # Find the rows (in new coordinates) touched by any repetition that
+    # isn't common to both renderings
+    dirtyRows = set()
+    for placement in prevPlacements[common:]:
+        for _, y, block in placement:
+            dirtyRows.update(range(y + dy, y + dy + len(block)))
+    for placement in placements[common:]:
+        for _, y, block in placement:
+            dirtyRows.update(range(y, y + len(block)))
+
+    # Rows outside of the previous rendering have to be drawn, too
+    dirtyRows.update(range(0, min(dy, height)))
+    dirtyRows.update(range(max(prevHeight + dy, 0), height))
+
+    # Index the blocks by the rows they touch, for rows we need to
+    # (partially) redraw
+    keep = min(width, prevWidth)
+    blocksByRow = {}
+    for placement in placements:
+        for x, y, block in placement:
+            if x + len(block[0]) <= keep and not dirtyRows.intersection(range(y, y + len(block))):
+                # This block can only be reused from the previous
+                # rendering
+                continue
+            for by in range(max(y, 0), min(y + len(block), height)):
+                blocksByRow.setdefault(by, []).append((x, y, block))
+
+    dest = []
+    for y in range(height):
+        prevY = y - dy
+        if y in dirtyRows:
+            dest.append(_drawDiagonalRow(blocksByRow.get(y, ()), y, 0, width))
+        elif keep == width:
+            row = previous[prevY]
+            dest.append(row if len(row) == width else row[:width])
+        else:
+            dest.append(previous[prevY][:keep]
+                + _drawDiagonalRow(blocksByRow.get(y, ()), y, keep, width))
+
     return dest
 
 
+def _drawDiagonalRow(blocks, y, x0, x1):
+    """
+    Draw columns x0 to x1 of row y from the (x, y, block) tuples given,
+    in order. Returns a tuple.
+    """
+    row = [EMPTY_TILE_VALUE] * (x1 - x0)
+    for bx, by, block in blocks:
+        if not by <= y < by + len(block): continue
+        srow = block[y - by]
+        for x in range(max(bx, x0), min(bx + len(srow), x1)):
+            row[x - x0] = srow[x - bx]
+    return tuple(row)
+
+
+
+
 
 def _getSlopeSections(layoutStr, normalizeTileStep):
     """
@@ -0,0 +1,294 @@
+# Renders previews of a whole folder of levels to PNGs, without opening
+# Satoru or any other window.
+#
+# Usage: python renderLevels.py [options] <course_res_pack folder> <output folder>
+# Run it with --help for the options.
+
+import argparse
+import concurrent.futures
+import functools
+import multiprocessing
+import os
+import os.path
+import sys
+import time
+
+import nsmbulib
+import nsmbulib.Level
+
+
+TILE_WIDTH = nsmbulib.Level.TILE_SIZE
+
+# Sprites this far outside of the rendered rect (in tiles) are skipped,
+# since they can't have any part of their images in it
+SPRITE_MARGIN = 16
+
+
+########################################################################
+############################# Sprite Layer #############################
+########################################################################
+
+
+class _SpriteParent:
+    """
+    Stands in for the editor's SpriteItem, which the sprite image
+    classes in sprites.py expect as their parent
+    """
+    BoundingRect = None
+    aux = ()
+    width = height = 16
+
+    def __init__(self, sprite):
+        self.type = sprite.type
+        self.objx = sprite.x
+        self.objy = sprite.y
+        self.spritedata = sprite.data
+
+    def setZValue(self, z):
+        pass
+
+
+class SpriteLayer:
+    """
+    Paints sprite images with the editor's sprite image classes
+    (sprites.py). That needs PyQt5, but not a window: Qt is started on
+    the offscreen platform.
+    """
+
+    def __init__(self):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        global QtGui, ImageQt, SLib, sprites
+        from PyQt5 import QtGui, QtWidgets
+        from PIL.ImageQt import ImageQt
+        import spritelib as SLib
+        import sprites
+
+        self.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+        # spritelib loads its images relative to Satoru's folder
+        SLib.OutlineColor = QtGui.QColor(0, 0, 0)
+        SLib.main()
+
+        # Sprite types that couldn't be drawn
+        self.broken = set()
+
+
+    def imageFor(self, sprite):
+        """
+        Return the sprite image object for this sprite, or None if it
+        doesn't have one
+        """
+        cls = sprites.ImageClasses.get(sprite.type)
+        if cls is None or sprite.type in self.broken: return None
+
+        try:
+            SLib.loadSpriteImages(sprite.type, cls)
+            imageObj = cls(_SpriteParent(sprite))
+            imageObj.dataChanged()
+            return imageObj
+        except Exception as e:
+            # These are written for the editor, so not all of them work
+            # here. Only warn about each type once.
+            print('WARNING: Could not draw sprite %d (%s)' % (sprite.type, e))
+            self.broken.add(sprite.type)
+            return None
+
+
+    def paint(self, img, area, rect, tileSize, mainTileset):
+        """
+        Paint the sprites in rect (x, y, w, h, in tiles) over img, a PIL
+        image of the area's objects, and return the result as a QImage
+        """
+        SLib.Tiles = mainTileset
+
+        qimg = QtGui.QImage(ImageQt(img)).convertToFormat(QtGui.QImage.Format_ARGB32_Premultiplied)
+        painter = QtGui.QPainter(qimg)
+        painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+        painter.scale(tileSize / TILE_WIDTH, tileSize / TILE_WIDTH)
+        painter.translate(-rect[0] * TILE_WIDTH, -rect[1] * TILE_WIDTH)
+
+        rx, ry, rw, rh = rect
+        for sprite in area.sprites:
+            x, y = sprite.x // 16, sprite.y // 16
+            if not rx - SPRITE_MARGIN <= x < rx + rw + SPRITE_MARGIN: continue
+            if not ry - SPRITE_MARGIN <= y < ry + rh + SPRITE_MARGIN: continue
+
+            imageObj = self.imageFor(sprite)
+            if imageObj is None: continue
+
+            painter.save()
+            painter.translate(
+                int((sprite.x + imageObj.xOffset) * TILE_WIDTH / 16),
+                int((sprite.y + imageObj.yOffset) * TILE_WIDTH / 16))
+            try:
+                imageObj.paint(painter)
+            except Exception as e:
+                print('WARNING: Could not draw sprite %d (%s)' % (sprite.type, e))
+                self.broken.add(sprite.type)
+            painter.restore()
+
+        painter.end()
+        return qimg
+
+
+# Each worker process makes its own sprite layer the first time it
+# needs one. False means that it couldn't be made.
+_spriteLayer = None
+
+def spriteLayer():
+    """
+    Return this process's SpriteLayer, or None if sprites can't be drawn
+    """
+    global _spriteLayer
+    if _spriteLayer is None:
+        try:
+            _spriteLayer = SpriteLayer()
+        except Exception as e:
+            print('WARNING: Sprites will not be drawn (%s)' % e)
+            _spriteLayer = False
+    return _spriteLayer or None
+
+
+########################################################################
+############################### Rendering ##############################
+########################################################################
+
+
+@functools.lru_cache(maxsize=None)
+def loadMainTilesets(folder):
+    """
+    Load the main tilesets (Pa0_*.sarc, like getPa0s.py makes) in the
+    folder, as a dict of tileset names -> SARC data
+    """
+    tilesets = {}
+    if folder is None: return tilesets
+
+    for fn in os.listdir(folder):
+        name, ext = os.path.splitext(fn)
+        if name.startswith('Pa0') and ext == '.sarc':
+            with open(os.path.join(folder, fn), 'rb') as f:
+                tilesets[name] = f.read()
+    return tilesets
+
+
+def renderLevel(levelPath, outputFolder, *, pa0Folder=None, zones=False,
+        tileSize=TILE_WIDTH, drawSprites=True):
+    """
+    Render each area of the level (or each zone, if zones is True) to a
+    PNG in outputFolder. Main tilesets the level doesn't contain itself
+    are loaded from pa0Folder.
+    This can run in a worker process. It returns the paths of the PNGs
+    and how long it took.
+    """
+    startTime = time.perf_counter()
+    levelName = os.path.splitext(os.path.basename(levelPath))[0]
+    level = nsmbulib.Level.load(levelPath)
+    layer = spriteLayer() if drawSprites else None
+
+    saved = []
+    for area in level.areas:
+        tilesets = level.loadTilesets(area, loadMainTilesets(pa0Folder))
+
+        if zones:
+            rects = [
+                ('%s_area%d_zone%d' % (levelName, area.number, zone.id), nsmbulib.Level.zoneRect(zone))
+                for zone in area.zones]
+        else:
+            rects = [('%s_area%d' % (levelName, area.number), area.bounds())]
+
+        for outName, rect in rects:
+            if rect[2] <= 0 or rect[3] <= 0: continue
+
+            img = nsmbulib.Level.renderArea(area, tilesets, rect, tileSize=tileSize)
+            path = os.path.join(outputFolder, outName + '.png')
+            if layer is None:
+                img.save(path)
+            else:
+                layer.paint(img, area, rect, tileSize, tilesets[0]).save(path, 'PNG')
+            saved.append(path)
+
+    return saved, time.perf_counter() - startTime
+
+
+def findLevels(folder):
+    """
+    Return the paths of the levels in a course_res_pack folder
+    """
+    return [
+        os.path.join(folder, fn) for fn in sorted(os.listdir(folder))
+        if fn.endswith('.szs') or fn.endswith('.sarc')]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description='Render previews of every level in a folder to PNGs.')
+    parser.add_argument('levels', help='the course_res_pack folder (or any folder of levels)')
+    parser.add_argument('output', help='the folder to save the PNGs in')
+    parser.add_argument('--pa0', metavar='FOLDER',
+        help='a folder with the Pa0 tilesets, for levels that don\'t contain them (see getPa0s.py)')
+    parser.add_argument('--zones', action='store_true',
+        help='save each zone separately, instead of each area')
+    parser.add_argument('--tile-size', type=int, default=TILE_WIDTH, metavar='PIXELS',
+        help='how wide each tile is in the PNGs (default: %(default)s)')
+    parser.add_argument('--no-sprites', action='store_true',
+        help='don\'t draw sprite images (these need PyQt5)')
+    parser.add_argument('--processes', type=int, default=None,
+        help='how many worker processes to use (default: one per CPU)')
+    args = parser.parse_args(argv[1:])
+
+    levels = findLevels(os.path.abspath(args.levels))
+    outputFolder = os.path.abspath(args.output)
+    pa0Folder = os.path.abspath(args.pa0) if args.pa0 else None
+    os.makedirs(outputFolder, exist_ok=True)
+
+    # The sprite images are found relative to this folder
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    kwargs = {
+        'pa0Folder': pa0Folder,
+        'zones': args.zones,
+        'tileSize': args.tile_size,
+        'drawSprites': not args.no_sprites,
+        }
+
+    startTime = time.perf_counter()
+    done = failed = 0
+    def finished(levelPath, result=None, error=None):
+        nonlocal done, failed
+        done += 1
+        if error is None:
+            saved, seconds = result
+            print('[%d/%d] %s: %d image(s) in %.2fs' % (done, len(levels), levelPath, len(saved), seconds))
+        else:
+            failed += 1
+            print('[%d/%d] WARNING: Could not render %s (%s)' % (done, len(levels), levelPath, error))
+
+    processes = args.processes or os.cpu_count() or 1
+    if processes == 1:
+        for levelPath in levels:
+            try:
+                finished(levelPath, renderLevel(levelPath, outputFolder, **kwargs))
+            except Exception as e:
+                finished(levelPath, error=e)
+    else:
+        # Each level is independent of the others, so they can all be
+        # rendered at the same time
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            futures = {
+                executor.submit(renderLevel, levelPath, outputFolder, **kwargs): levelPath
+                for levelPath in levels}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    finished(futures[future], future.result())
+                except Exception as e:
+                    finished(futures[future], error=e)
+
+    print('%d levels rendered (%d failed) in %.2fs' % (
+        done - failed, failed, time.perf_counter() - startTime))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    # Worker processes import this file again
+    multiprocessing.freeze_support()
+    sys.exit(main(sys.argv))
@@ -40,9 +40,14 @@ if currentRunningVersion < minimum:
 
 # Stdlib imports
 import base64
+import bisect
+import collections
+import copy
+import hashlib
 import importlib
 import io
-from math import floor as math_floor
+from math import ceil as math_ceil, floor as math_floor
+import multiprocessing
 import os
 import os.path
 import pickle
@@ -56,9 +61,12 @@ import zipfile
 
 # nsmbulib
 import nsmbulib.Object
+import nsmbulib.ObjectSearch
+import nsmbulib.PngWriter
 import nsmbulib.Sarc
 import nsmbulib.Tile
 import nsmbulib.Tileset
+import nsmbulib.TilesetPack
 import nsmbulib.Yaz0
 
 import PIL.Image, PIL.ImageQt
@@ -111,6 +119,12 @@ EntranceTypeNames = None
 MainObjects = [] # Pa0
 OneTilesetObjects = {}
 OneTilesetHierarchy = {}
+OneTilesetIndex = None # nsmbulib.ObjectSearch.ObjectIndex
+ObjectPreviews = None
+PreviewRenderer = None
+TilePixmaps = collections.OrderedDict() # see tilePixmap()
+TilePixmapsGeneration = 0 # incremented whenever TilePixmaps is cleared
+TILE_PIXMAP_CACHE_SIZE = 8192
 EmbeddedObjects = [] # Pa1/2/3
 EmbeddedObjectsLoadedFrom = {} # (tilesetnum, objectnum): index
 Area = None
@@ -771,6 +785,12 @@ def SetDirty(noautosave=False):
     global Dirty, DirtyOverride, AutoSaveDirty
     if DirtyOverride > 0: return
 
+    # Anything that changes the level can change the overview, too
+    try:
+        mainWindow.levelOverview.invalidate()
+    except Exception:
+        pass
+
     if not noautosave: AutoSaveDirty = True
     if Dirty: return
 
@@ -809,6 +829,92 @@ def MapPositionToZoneID(zones, x, y, useid=False):
 
     return rval
 
+class ZoneIndex:
+    """
+    An index of zones, for finding the one containing or nearest a lot
+    of positions quickly. lookup() gives the same results as
+    MapPositionToZoneID(). Make a new one whenever the zones change.
+    """
+    def __init__(self, zones):
+        # (index in the list, zone ID, left, top, right, bottom), for
+        # the nearest-zone fallback
+        self.zones = []
+
+        # x edges of the zones, sorted. atEdge[i] are the zones (in list
+        # order) that contain x == edges[i], and between[i] are the ones
+        # that contain the x values between edges[i - 1] and edges[i].
+        self.edges = []
+        self.atEdge = []
+        self.between = []
+
+        spans = [] # (index, left, right, top, bottom), normalized
+        for i, zone in enumerate(zones):
+            r = zone.ZoneRect
+            self.zones.append((i, zone.id, r.left(), r.top(), r.right(), r.bottom()))
+
+            # Like QRectF.contains(): edges are included, and empty rects
+            # don't contain anything
+            l, r2 = sorted((r.left(), r.right()))
+            t, b = sorted((r.top(), r.bottom()))
+            if l == r2 or t == b: continue
+            spans.append((i, l, r2, t, b))
+
+        self.edges = sorted({l for _, l, _, _, _ in spans} | {r for _, _, r, _, _ in spans})
+        for x in self.edges:
+            self.atEdge.append([span for span in spans if span[1] <= x <= span[2]])
+        for j in range(len(self.edges) + 1):
+            if j == 0 or j == len(self.edges):
+                self.between.append([])
+            else:
+                lo, hi = self.edges[j - 1], self.edges[j]
+                self.between.append([span for span in spans if span[1] <= lo and span[2] >= hi])
+
+    def lookup(self, x, y, useid=False):
+        """
+        Return the ID (if useid) or list index of the first zone
+        containing this position, or the ID of the nearest one if none
+        do (or -1 if there are no zones)
+        """
+        j = bisect.bisect_left(self.edges, x)
+        if j < len(self.edges) and self.edges[j] == x:
+            candidates = self.atEdge[j]
+        else:
+            candidates = self.between[j]
+        for i, l, r, t, b in candidates:
+            if t <= y <= b:
+                return self.zones[i][1] if useid else i
+
+        # Fall back to the nearest one
+        minimumdist = -1
+        rval = -1
+        for i, zoneid, left, top, right, bottom in self.zones:
+            xdist = ydist = 0
+            if x <= left: xdist = left - x
+            if x >= right: xdist = x - right
+            if y <= top: ydist = top - y
+            if y >= bottom: ydist = y - bottom
+
+            dist = xdist ** 2 + ydist ** 2
+            if dist < minimumdist or minimumdist == -1:
+                minimumdist = dist
+                rval = zoneid
+
+        return rval
+
+    def lookupAll(self, positions, useid=False):
+        """
+        Return lookup(x, y, useid) for every (x, y) in positions. Items
+        that share a position are only looked up once.
+        """
+        found = {}
+        results = []
+        for pos in positions:
+            zone = found.get(pos)
+            if zone is None:
+                zone = found[pos] = self.lookup(pos[0], pos[1], useid)
+            results.append(zone)
+        return results
+
 def FilesAreMissing():
     """
     Checks to see if any of the required files for Satoru are missing
@@ -1152,6 +1258,8 @@ def LoadOverrides():
     """
     global Overrides
 
+    clearTilePixmaps()
+
     OverrideImage = PIL.Image.open('satorudata/overrides.png')
     Overrides = [None] * 256
     idx = 0
@@ -1242,12 +1350,8 @@ def LoadGameDef(name=None, dlg=None):
             spriteClasses = gamedef.getImageClasses()
 
             for s in Area.sprites:
-                if s.type in SLib.SpriteImagesLoaded: continue
                 if s.type not in spriteClasses: continue
-
-                spriteClasses[s.type].loadImages()
-
-                SLib.SpriteImagesLoaded.add(s.type)
+                SLib.loadSpriteImages(s.type, spriteClasses[s.type])
 
             for s in Area.sprites:
                 if s.type in spriteClasses:
@@ -1353,16 +1457,94 @@ def LoadActionsLists():
 # UNSORTED
 #############
 
+def tilePixmap(tile, contentsValue=0, size=TileWidth):
+    """
+    Return a QPixmap of tile.reprImage(contentsValue, item=True), or of
+    the "unavailable" override if tile is nsmbulib.Tile.TileUnavailable,
+    scaled down to size x size pixels.
+    Each tile is only converted once for each contents value, override
+    image and size; the cache is cleared when tilesets are reloaded.
+    """
+    if tile is nsmbulib.Tile.TileUnavailable:
+        key = (None, None, size)
+        source = None
+    else:
+        key = (id(tile), contentsValue, size)
+        source = tile._contentsOverrides.get(contentsValue, tile.override)
+        if source is None: source = tile._image
+
+    cached = TilePixmaps.get(key)
+    if cached is not None and cached[0] is tile and cached[1] is source:
+        TilePixmaps.move_to_end(key)
+        return cached[2]
+
+    if tile is nsmbulib.Tile.TileUnavailable:
+        image = Overrides[0]
+    else:
+        image = tile.reprImage(contentsValue, item=True)
+    qimage = PIL.ImageQt.ImageQt(image)
+    if size != TileWidth:
+        qimage = qimage.scaled(size, size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    pixmap = QtGui.QPixmap.fromImage(qimage)
+
+    # The cache holds references to the tiles, so that their IDs can't
+    # be reused by other tiles while they're in it
+    TilePixmaps[key] = (tile, source, pixmap)
+    while len(TilePixmaps) > TILE_PIXMAP_CACHE_SIZE:
+        TilePixmaps.popitem(last=False)
+    return pixmap
+
+
+def clearTilePixmaps():
+    """
+    Forget all of the tile pixmaps, since the tiles or overrides may
+    have changed. Layer chunks drawn with them are redrawn, too.
+    """
+    global TilePixmapsGeneration
+    TilePixmaps.clear()
+    TilePixmapsGeneration += 1
+
+
+def objectExists(item):
+    """
+    Check if the object definition an ObjectItem uses is available
+    """
+    if item.from_ == OBJECT_FROM_MAIN:
+        return item.idx < len(MainObjects)
+    elif item.from_ == OBJECT_FROM_MEGA:
+        return item.idx in OneTilesetObjects
+    else:
+        return item.idx < len(EmbeddedObjects)
+
+
 class LevelScene(QtWidgets.QGraphicsScene):
     """
     GraphicsScene subclass for the level scene
     """
+
+    # Each layer is drawn in square chunks of this many tiles. A chunk
+    # is rendered to a pixmap once, and only rendered again when
+    # something in it changes.
+    CHUNK_SIZE = 16
+
+    # How much memory the chunk pixmaps can take up, in bytes
+    CHUNK_CACHE_MEMORY = 384 * 1024 * 1024
+
+    # Tile sizes (levels of detail) chunks can be rendered at. When
+    # zoomed out, chunks are rendered with smaller tiles, so they're
+    # faster to render and draw and more of them fit in the cache.
+    LOD_TILE_SIZES = [TileWidth, 30, 15, 8, 4]
+
     def __init__(self, *args):
         global theme
 
         self.bgbrush = QtGui.QBrush(theme.color('bg'))
         super().__init__(*args)
 
+        # (layer, chunk x, chunk y, tile size) -> (signature, objects, pixmap)
+        self.chunks = collections.OrderedDict()
+        self.chunksMemory = 0
+
     def drawTiles(self, painter):
         """
         Draws all visible tiles (only used when sprites are supposed to go behind layer 0)
@@ -1374,21 +1556,12 @@ class LevelScene(QtWidgets.QGraphicsScene):
             layer = Area.layers[layernum]
 
             for obj in layer:
-                # Check if the object exists
-                if obj.from_ == OBJECT_FROM_MAIN:
-                    exists = obj.idx < len(MainObjects)
-                elif obj.from_ == OBJECT_FROM_MEGA:
-                    exists = obj.idx in OneTilesetObjects
-                else:
-                    exists = obj.idx < len(EmbeddedObjects)
-
-                if exists:
+                if objectExists(obj):
                     # Paint the object
                     obj.paint(painter)
                 else:
                     # Paint an image indicating the tile is unavailable
-                    im = PIL.ImageQt.ImageQt(Overrides[0])
-                    painter.drawImage(obj.objx, obj.objy, im)
+                    painter.drawPixmap(obj.objx, obj.objy, tilePixmap(nsmbulib.Tile.TileUnavailable))
 
     def drawBackground(self, painter, rect):
         """
@@ -1399,97 +1572,117 @@ class LevelScene(QtWidgets.QGraphicsScene):
 
         if setting('drawSpritesBehindL0'):
             self.drawTiles(painter)
-        else:
-            drawrect = QtCore.QRectF(rect.x() / TileWidth, rect.y() / TileWidth, rect.width() / TileWidth + 1, rect.height() / TileWidth + 1)
-            isect = drawrect.intersects
-
-            layer0 = []
-            l0add = layer0.append
-            layer1 = []
-            l1add = layer1.append
-            layer2 = []
-            l2add = layer2.append
-
-            type_obj = ObjectItem
-            ii = isinstance
-
-            x1 = 1024
-            y1 = 512
-            x2 = 0
-            y2 = 0
-
-            # iterate through each object
-            funcs = [layer0.append, layer1.append, layer2.append]
-            show = [Layer0Shown, Layer1Shown, Layer2Shown]
-            for layer, add, process in zip(Area.layers, funcs, show):
-                if not process: continue
-                for item in layer:
-                    if not isect(item.LevelRect): continue
-                    add(item)
-                    xs = item.objx
-                    xe = xs+item.width
-                    ys = item.objy
-                    ye = ys+item.height
-                    if xs < x1: x1 = xs
-                    if xe > x2: x2 = xe
-                    if ys < y1: y1 = ys
-                    if ye > y2: y2 = ye
-
-            width = x2 - x1
-            height = y2 - y1
-            # All variables up to and including here are CORRECT.
-
-            layernum = 2
-            # create and draw the tilemaps
-            for layer in [layer2, layer1, layer0]:
-                if len(layer) == 0:
-                    continue
-
-                tmap = []
-                i = 0
-                while i < height:
-                    tmap.append([None] * width)
-                    i += 1
-
-                for item in layer:
-                    startx = item.objx - x1
-                    desty = item.objy - y1
+            return
 
-                    if item.from_ == OBJECT_FROM_MAIN:
-                        exists = item.idx < len(MainObjects)
-                    elif item.from_ == OBJECT_FROM_MEGA:
-                        exists = item.idx in OneTilesetObjects
+        # Pick the smallest tile size that won't look blurry at the
+        # current zoom level
+        zoom = painter.worldTransform().m11()
+        lod = TileWidth
+        for tileSize in self.LOD_TILE_SIZES:
+            if tileSize >= TileWidth * zoom:
+                lod = tileSize
+
+        size = self.CHUNK_SIZE
+        cx1 = max(int(rect.x() / TileWidth), 0) // size
+        cy1 = max(int(rect.y() / TileWidth), 0) // size
+        cx2 = int(rect.right() / TileWidth) // size
+        cy2 = int(rect.bottom() / TileWidth) // size
+
+        # Find the objects in each visible chunk of each shown layer
+        show = [Layer0Shown, Layer1Shown, Layer2Shown]
+        layerChunks = []
+        for layernum in [2, 1, 0]:
+            if not show[layernum]: continue
+
+            chunkItems = {}
+            visibleItems = Area.layers[layernum].itemsIn(
+                cx1 * size, cy1 * size, (cx2 - cx1 + 1) * size, (cy2 - cy1 + 1) * size)
+            for item in visibleItems:
+                for cy in range(max(item.objy // size, cy1), min((item.objy + item.height - 1) // size, cy2) + 1):
+                    for cx in range(max(item.objx // size, cx1), min((item.objx + item.width - 1) // size, cx2) + 1):
+                        chunkItems.setdefault((cx, cy), []).append(item)
+            layerChunks.append((layernum, chunkItems))
+
+        # The layers share one cache. If all of their chunks don't fit
+        # in it, they'd just push each other out, so don't bother.
+        chunkCount = sum(len(chunkItems) for _, chunkItems in layerChunks)
+        useCache = chunkCount * (size * lod) ** 2 * 4 <= self.CHUNK_CACHE_MEMORY
+
+        chunkRect = QtCore.QRectF(0, 0, size * TileWidth, size * TileWidth)
+        for layernum, chunkItems in layerChunks:
+            for (cx, cy), items in chunkItems.items():
+                pixmap = self.chunkPixmap(layernum, cx, cy, items, lod, useCache)
+                chunkRect.moveTo(cx * size * TileWidth, cy * size * TileWidth)
+                if lod == TileWidth:
+                    painter.drawPixmap(chunkRect.topLeft(), pixmap)
+                else:
+                    painter.drawPixmap(chunkRect, pixmap, QtCore.QRectF(pixmap.rect()))
+
+    def chunkPixmap(self, layernum, cx, cy, items, tileSize=TileWidth, useCache=True):
+        """
+        Return a pixmap of one chunk of a layer, which contains these
+        objects (in drawing order), with tiles tileSize pixels wide.
+        It's only rendered again if the objects or the tiles have
+        changed since the last time.
+        """
+        # Objects are compared by identity; the cache entry keeps them
+        # alive so that the IDs can't be reused in the meantime
+        objects = [(item, item.objdata) for item in items]
+        signature = (TilePixmapsGeneration, tuple(
+            (id(item), id(objdata), item.objx, item.objy, item.data, objectExists(item))
+            for item, objdata in objects))
+
+        key = (layernum, cx, cy, tileSize)
+        cached = self.chunks.get(key)
+        if cached is not None and cached[0] == signature:
+            self.chunks.move_to_end(key)
+            return cached[2]
+
+        size = self.CHUNK_SIZE
+        x0 = cx * size
+        y0 = cy * size
+
+        # Make the tilemap. Later objects replace the tiles of earlier ones.
+        tmap = [[None] * size for _ in range(size)]
+        for item, objdata in objects:
+            if objdata is None: continue
+            unavailable = None if objectExists(item) else tilePixmap(nsmbulib.Tile.TileUnavailable, size=tileSize)
+
+            for y in range(max(item.objy, y0), min(item.objy + len(objdata), y0 + size)):
+                row = objdata[y - item.objy]
+                destrow = tmap[y - y0]
+                for x in range(max(item.objx, x0), min(item.objx + len(row), x0 + size)):
+                    if unavailable is not None:
+                        destrow[x - x0] = unavailable
                     else:
-                        exists = item.idx < len(EmbeddedObjects)
-
-                    for row in item.objdata:
-                        destrow = tmap[desty]
-                        destx = startx
-                        for tile in row:
-                            if exists:
-                                if tile is not None:
-                                    destrow[destx] = tile.reprImage(item.data, item=True)
-                            else:
-                                destrow[destx] = nsmbulib.Tile.TileUnavailable
-                            destx += 1
-                        desty += 1
+                        tile = row[x - item.objx]
+                        if tile is not None: # None = blank tile
+                            destrow[x - x0] = tilePixmap(tile, item.data, tileSize)
+
+        pixmap = QtGui.QPixmap(size * tileSize, size * tileSize)
+        pixmap.fill(Qt.transparent)
+        painter = QtGui.QPainter(pixmap)
+        desty = 0
+        for row in tmap:
+            destx = 0
+            for tilePix in row:
+                if tilePix is not None:
+                    painter.drawPixmap(destx, desty, tilePix)
+                destx += tileSize
+            desty += tileSize
+        painter.end()
 
-                painter.save()
-                painter.translate(x1 * TileWidth, y1 * TileWidth)
-                desty = 0
-                for row in tmap:
-                    destx = 0
-                    for tileImage in row:
-                        if tileImage not in (nsmbulib.Tile.TileUnavailable, None): # TileUnavailable = unavailable tile, None = blank tile
-                            im = PIL.ImageQt.ImageQt(tileImage)
-                            painter.drawImage(destx, desty, im)
-                        elif tileImage is nsmbulib.Tile.TileUnavailable:
-                            im = PIL.ImageQt.ImageQt(Overrides[0])
-                            painter.drawImage(destx, desty, im)
+        if useCache:
+            if cached is not None:
+                self.chunksMemory -= cached[2].width() * cached[2].height() * 4
+            self.chunks[key] = (signature, objects, pixmap)
+            self.chunks.move_to_end(key)
+            self.chunksMemory += pixmap.width() * pixmap.height() * 4
+            while self.chunksMemory > self.CHUNK_CACHE_MEMORY:
+                _, (_, _, oldPixmap) = self.chunks.popitem(last=False)
+                self.chunksMemory -= oldPixmap.width() * oldPixmap.height() * 4
 
-                        destx += TileWidth
-                    desty += TileWidth
-                painter.restore()
+        return pixmap
 
 
 class HexSpinBox(QtWidgets.QSpinBox):
@@ -1907,6 +2100,15 @@ def module_path():
         return os.path.dirname(os.path.abspath(sys.argv[0]))
     return None
 
+def getCachePath(name):
+    """
+    Return the path to the cache file with the given name, making the
+    cache folder first if it doesn't exist yet
+    """
+    if not os.path.isdir('satorucache'):
+        os.makedirs('satorucache')
+    return os.path.join('satorucache', name)
+
 def SetGamePath(newpath):
     """
     Sets the NSMBU game path
@@ -1927,6 +2129,7 @@ def SetGamePath(newpath):
 
 def LoadMainTileset(data, name):
     global MainObjects
+    clearTilePixmaps()
     try:
         MainObjects = nsmbulib.Tileset.load(data)
     except:
@@ -1941,6 +2144,7 @@ def LoadMainTileset(data, name):
 
 def LoadLevelTilesets(data1, data2, data3):
     global EmbeddedObjects, EmbeddedObjectsLoadedFrom
+    clearTilePixmaps()
 
     ts1, ts2, ts3 = [], [], []
     try:
@@ -1978,23 +2182,47 @@ def LoadOneTileset():
     """
     What the function name says.
     """
-    global OneTilesetObjects, OneTilesetHierarchy
+    global OneTilesetObjects, OneTilesetHierarchy, OneTilesetIndex
+    clearTilePixmaps()
+
+    # This can also be a file made with nsmbulib.TilesetPack
     path = setting('OneTilesetPath')
-    if not path or not os.path.isdir(path):
+    if not path or not os.path.exists(path):
         path = getOneTilesetPath()
         if not path:
             # The user wouldn't pick one. So we quit.
             sys.exit()
 
-    # Make a "Loading" box
-    loadingBox = QtWidgets.QMessageBox()
+    # Make a "Loading" box with a progress bar
+    loadingBox = QtWidgets.QProgressDialog()
     loadingBox.setWindowTitle('Loading')
-    loadingBox.setText('Loading OneTileset... please wait...')
+    loadingBox.setLabelText('Loading OneTileset... please wait...')
+    loadingBox.setCancelButton(None)
+    loadingBox.setMinimumDuration(0)
+    loadingBox.setRange(0, 0)
     loadingBox.show()
-    loadingBox.update()
-
-    # Load it
-    OneTilesetObjects, OneTilesetHierarchy = nsmbulib.Tileset.loadFromNew(path)
+    QtWidgets.QApplication.processEvents()
+
+    def updateProgress(done, total):
+        # Only repaint when the percentage changes
+        if done * 100 // total == (done - 1) * 100 // total: return
+        loadingBox.setRange(0, total)
+        loadingBox.setValue(done)
+        QtWidgets.QApplication.processEvents()
+
+    # Load it. Objects only load their tiles once they're actually
+    # used, and tiles that haven't been used in a while are unloaded
+    # again if they take up more memory than this (in MB)
+    budget = int(setting('OneTilesetMemoryBudget', 256))
+    nsmbulib.Object.LAZY_TILES_MEMORY_BUDGET = budget * 1024 * 1024
+    OneTilesetObjects, OneTilesetHierarchy = nsmbulib.Tileset.loadFromNew(
+        path, cachePath=getCachePath('onetileset.cache'), progress=updateProgress,
+        lazy=True)
+
+    # Index the objects for the search box. This only needs their
+    # metadata, so it doesn't load any tiles.
+    OneTilesetIndex = nsmbulib.ObjectSearch.ObjectIndex(
+        OneTilesetObjects, OneTilesetHierarchy)
 
     # Hide the loading box
     loadingBox.hide()
@@ -2011,7 +2239,24 @@ def getOneTilesetPath():
     if currentDir:
         dirArg = [currentDir]
 
-    path = QtWidgets.QFileDialog.getExistingDirectory(None, 'Choose your OneTileset folder', *dirArg)
+    # OneTileset can be either a folder or a tileset pack made from one
+    # (see nsmbulib.TilesetPack)
+    msg = QtWidgets.QMessageBox()
+    msg.setText('Is your OneTileset a folder or a tileset pack?')
+    folderButton = msg.addButton('Folder', QtWidgets.QMessageBox.AcceptRole)
+    packButton = msg.addButton('Tileset pack', QtWidgets.QMessageBox.AcceptRole)
+    msg.addButton(QtWidgets.QMessageBox.Cancel)
+    msg.setDefaultButton(folderButton)
+    msg.exec_()
+
+    if msg.clickedButton() is folderButton:
+        path = QtWidgets.QFileDialog.getExistingDirectory(None, 'Choose your OneTileset folder', *dirArg)
+    elif msg.clickedButton() is packButton:
+        path = QtWidgets.QFileDialog.getOpenFileName(
+            None, 'Choose your OneTileset pack', currentDir or '',
+            'Tileset packs (*%s)' % nsmbulib.TilesetPack.EXTENSION)[0]
+    else:
+        return False
 
     if not path:
         return False
@@ -2509,7 +2754,11 @@ class AbstractParsedArea(AbstractArea):
         self.pathdata = []
         self.paths = []
         self.comments = []
-        self.layers = [[], [], []]
+        self.layers = [ObjectLayer(), ObjectLayer(), ObjectLayer()]
+
+        # The tilesets built by the last save, so they can be reused if
+        # the objects haven't changed since (see RegenerateTilesets())
+        self.lastTilesetBuild = None
 
         # Metadata
         self.LoadSatoruInfo(None)
@@ -2522,11 +2771,15 @@ class AbstractParsedArea(AbstractArea):
         # Load in the course file and blocks
         self.LoadBlocks(course)
 
+        # Start loading the sprites' images in the background. The
+        # sprites themselves are made after the tilesets are loaded, so
+        # the images can be loaded while that happens.
+        SLib.preloadImages(self.LoadSpriteTypes())
+
         # Load stuff from individual blocks
         self.tileset0name, ts1, ts2, ts3 = self.LoadTilesetNames() # block 1
         self.LoadOptions() # block 2
         self.LoadEntrances() # block 7
-        self.LoadSprites() # block 8
         self.LoadZones() # block 10 (also blocks 3, 5, and 6)
         self.LoadLocations() # block 11
         self.LoadPaths() # block 12 and 13
@@ -2580,9 +2833,11 @@ class AbstractParsedArea(AbstractArea):
         except:
             pass
 
+        self.LoadSprites() # block 8
+
 
         # Load the object layers
-        self.layers = [[], [], []]
+        self.layers = [ObjectLayer(), ObjectLayer(), ObjectLayer()]
 
         if L0 is not None:
             self.LoadLayer(0, L0)
@@ -2601,7 +2856,8 @@ class AbstractParsedArea(AbstractArea):
         Save the area back to a file
         """
         # Prepare this first because otherwise the game refuses to load some sprites
-        self.SortSpritesByZone()
+        zoneIndex = ZoneIndex(self.zones)
+        self.SortSpritesByZone(zoneIndex)
 
         # Also this
         tilesets = self.RegenerateTilesets(areaNum, separateTilesets)
@@ -2609,8 +2865,8 @@ class AbstractParsedArea(AbstractArea):
         # Save each block
         self.SaveTilesetNames() # block 1
         self.SaveOptions() # block 2
-        self.SaveEntrances() # block 7
-        self.SaveSprites() # block 8
+        self.SaveEntrances(zoneIndex) # block 7
+        self.SaveSprites(zoneIndex) # block 8
         self.SaveLoadedSprites() # block 9
         self.SaveZones() # block 10 (and 3 and 5)
         self.SaveLocations() # block 11
@@ -2667,19 +2923,17 @@ class AbstractParsedArea(AbstractArea):
             upd = layer[i]
             upd.setZValue(upd.zValue() - 1)
 
-    def SortSpritesByZone(self):
+    def SortSpritesByZone(self, zoneIndex=None):
         """
         Sorts the sprite list by zone ID so it will work in-game
         """
+        if zoneIndex is None: zoneIndex = ZoneIndex(self.zones)
 
         split = {}
         zones = []
 
-        f_MapPositionToZoneID = MapPositionToZoneID
-        zonelist = self.zones
-
-        for sprite in self.sprites:
-            zone = f_MapPositionToZoneID(zonelist, sprite.objx, sprite.objy)
+        spriteZones = zoneIndex.lookupAll([(sprite.objx, sprite.objy) for sprite in self.sprites])
+        for sprite, zone in zip(self.sprites, spriteZones):
             sprite.zoneID = zone
             if not zone in split:
                 split[zone] = []
@@ -2725,7 +2979,7 @@ class Area_NSMBU(AbstractParsedArea):
         self.locations = []
         self.pathdata = []
         self.pathinfo = []
-        self.layers = [[], [], []]
+        self.layers = [ObjectLayer(), ObjectLayer(), ObjectLayer()]
 
     def LoadBlocks(self, course):
         """
@@ -2778,6 +3032,14 @@ class Area_NSMBU(AbstractParsedArea):
             offset += 24
         self.entrances = entrances
 
+    def LoadSpriteTypes(self):
+        """
+        Returns the types of the sprites in block 8, without loading
+        the sprites
+        """
+        spritedata = self.blocks[7]
+        return [struct.unpack_from('>H', spritedata, offset)[0] for offset in range(0, len(spritedata) - 23, 24)]
+
     def LoadSprites(self):
         """
         Loads block 8, the sprites
@@ -3058,16 +3320,17 @@ class Area_NSMBU(AbstractParsedArea):
         buffer[offset + 1] = 0xFF
         return bytes(buffer)
 
-    def SaveEntrances(self):
+    def SaveEntrances(self, zoneIndex=None):
         """
         Saves the entrances back to block 7
         """
+        if zoneIndex is None: zoneIndex = ZoneIndex(self.zones)
+
         offset = 0
         entstruct = struct.Struct('>HHxBxxBBBBBBxBxBBBBBBx')
         buffer = bytearray(len(self.entrances) * 24)
-        zonelist = self.zones
-        for entrance in self.entrances:
-            zoneID = MapPositionToZoneID(zonelist, entrance.objx, entrance.objy)
+        entranceZones = zoneIndex.lookupAll([(entrance.objx, entrance.objy) for entrance in self.entrances])
+        for entrance, zoneID in zip(self.entrances, entranceZones):
             entstruct.pack_into(buffer, offset, int(entrance.objx), int(entrance.objy), int(entrance.unk05), int(entrance.entid), int(entrance.destarea), int(entrance.destentrance), int(entrance.enttype), int(entrance.unk0C), zoneID, int(entrance.unk0F), int(entrance.entsettings), int(entrance.unk12), int(entrance.unk13), int(entrance.unk14), int(entrance.unk15), int(entrance.unk16))
             offset += 24
         self.blocks[6] = bytes(buffer)
@@ -3109,17 +3372,20 @@ class Area_NSMBU(AbstractParsedArea):
             nodestruct.pack_into(buffer, offset, int(node['x']), int(node['y']), float(node['speed']), float(node['accel']), int(node['delay']), 0, 0, 0, 0)
             offset += 20
 
-    def SaveSprites(self):
+    def SaveSprites(self, zoneIndex=None):
         """
         Saves the sprites back to block 8
         """
+        if zoneIndex is None: zoneIndex = ZoneIndex(self.zones)
+
         offset = 0
         sprstruct = struct.Struct('>HHH10sBB3sxxx')
         buffer = bytearray((len(self.sprites) * 24) + 4)
         f_int = int
-        for sprite in self.sprites:
+        spriteZoneIDs = zoneIndex.lookupAll([(sprite.objx, sprite.objy) for sprite in self.sprites], True)
+        for sprite, zoneID in zip(self.sprites, spriteZoneIDs):
             try:
-                sprstruct.pack_into(buffer, offset, f_int(sprite.type), f_int(sprite.objx), f_int(sprite.objy), sprite.spritedata[:10], MapPositionToZoneID(self.zones, sprite.objx, sprite.objy, True), 0, sprite.spritedata[10:] + b'\0')
+                sprstruct.pack_into(buffer, offset, f_int(sprite.type), f_int(sprite.objx), f_int(sprite.objy), sprite.spritedata[:10], zoneID, 0, sprite.spritedata[10:] + b'\0')
             except struct.error:
                 # Hopefully this will solve the mysterious bug, and will
                 # soon no longer be necessary.
@@ -3220,20 +3486,42 @@ class Area_NSMBU(AbstractParsedArea):
             self.compiledTilesetIdxs[(OBJECT_FROM_EMBED, i)] = i
 
         # Add the OneTileset objects used and also keep track of their indexes in the compiled tileset
+        # (Sorted, so that the same set of objects always ends up in the same order)
         oneTsetObjs = []
-        for i, name in enumerate(oneTsetObjNames):
+        for i, name in enumerate(sorted(oneTsetObjNames)):
             oneTsetObjs.append(OneTilesetObjects[name])
             self.compiledTilesetIdxs[(OBJECT_FROM_MEGA, name)] = len(EmbeddedObjects) + i
 
-        if separateTilesets:
-            baseTilesetName = 'level'
+        allObjs = EmbeddedObjects + oneTsetObjs
+
+        # If the objects are exactly the same ones we built the tilesets
+        # from last time, reuse those tilesets (and their names) as-is
+        last = self.lastTilesetBuild
+        if (last is not None
+                and last['areaNum'] == areaNum
+                and last['separateTilesets'] == separateTilesets
+                and len(last['objects']) == len(allObjs)
+                and all(a is b for a, b in zip(last['objects'], allObjs))):
+            baseTilesetName = last['name']
+            tilesets = last['tilesets']
+
         else:
-            baseTilesetName = gibberish.generate_word()
-        baseTilesetName += '_' + str(areaNum + 1)
+            if separateTilesets:
+                baseTilesetName = 'level'
+            else:
+                baseTilesetName = gibberish.generate_word()
+            baseTilesetName += '_' + str(areaNum + 1)
 
-        # Save
-        allObjs = EmbeddedObjects + oneTsetObjs
-        tilesets = nsmbulib.Tileset.save(allObjs, baseTilesetName)
+            # Save
+            tilesets = nsmbulib.Tileset.save(allObjs, baseTilesetName)
+
+            self.lastTilesetBuild = {
+                'areaNum': areaNum,
+                'separateTilesets': separateTilesets,
+                'objects': allObjs,
+                'name': baseTilesetName,
+                'tilesets': tilesets,
+                }
 
         # Pick tileset names
         self.tileset0name = ['Pa0_jyotyu', 'Pa0_jyotyu_chika', 'Pa0_jyotyu_yougan', 'Pa0_jyotyu_yougan2'][mainWindow.objPicker.mainTilesetDropdown.currentIndex()]
@@ -3487,11 +3775,176 @@ class LevelEditorItem(QtWidgets.QGraphicsItem):
         return self.BoundingRect
 
 
+class ObjectLayer(list):
+    """
+    A list of the ObjectItems in a layer, in drawing order. It also
+    keeps them in a uniform grid, so the ones in an area can be found
+    without checking all of them. The grid is kept up to date as
+    objects are added, removed, moved and resized.
+    """
+
+    # Size of the grid cells, in tiles
+    CELL_SIZE = 16
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.cells = {} # (cell x, cell y) -> set of ObjectItems
+        self.positions = None # ObjectItem -> index, or None if it needs to be remade
+        self.changed = set() # ObjectItems moved in or out of the grid since the level overview last looked
+        for item in self:
+            self.indexItem(item)
+
+    def cellRange(self, x, y, w, h):
+        """
+        Return the range of cells (x1, y1, x2, y2, inclusive) covering
+        this rect, in tiles
+        """
+        size = self.CELL_SIZE
+        return x // size, y // size, (x + max(w, 1) - 1) // size, (y + max(h, 1) - 1) // size
+
+    def indexItem(self, item):
+        """
+        Put the object in the grid cells it covers now
+        """
+        if item.indexedIn is not None:
+            item.indexedIn[0].unindexItem(item)
+        x1, y1, x2, y2 = self.cellRange(item.objx, item.objy, item.width, item.height)
+        cells = self.cells
+        for cy in range(y1, y2 + 1):
+            for cx in range(x1, x2 + 1):
+                cell = cells.get((cx, cy))
+                if cell is None:
+                    cell = cells[(cx, cy)] = set()
+                cell.add(item)
+        item.indexedIn = (self, (x1, y1, x2, y2))
+        self.changed.add(item)
+
+    def unindexItem(self, item):
+        """
+        Take the object out of the grid
+        """
+        if item.indexedIn is None or item.indexedIn[0] is not self: return
+        x1, y1, x2, y2 = item.indexedIn[1]
+        cells = self.cells
+        for cy in range(y1, y2 + 1):
+            for cx in range(x1, x2 + 1):
+                cell = cells.get((cx, cy))
+                if cell is None: continue
+                cell.discard(item)
+                if not cell: del cells[(cx, cy)]
+        item.indexedIn = None
+        self.changed.add(item)
+
+    def itemsIn(self, x, y, w, h):
+        """
+        Return the objects intersecting this rect (in tiles), in
+        drawing order
+        """
+        x1, y1, x2, y2 = self.cellRange(x, y, w, h)
+        found = set()
+        cells = self.cells
+        for cy in range(y1, y2 + 1):
+            for cx in range(x1, x2 + 1):
+                cell = cells.get((cx, cy))
+                if cell: found.update(cell)
+
+        x2, y2 = x + w, y + h
+        found = [item for item in found
+            if item.objx < x2 and item.objx + item.width > x
+            and item.objy < y2 and item.objy + item.height > y]
+
+        if self.positions is None:
+            self.positions = {item: i for i, item in enumerate(self)}
+        found.sort(key=lambda item: self.positions.get(item, -1))
+        return found
+
+    # Everything that changes the list has to keep the grid up to date
+
+    def append(self, item):
+        if self.positions is not None:
+            self.positions[item] = len(self)
+        super().append(item)
+        self.indexItem(item)
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def insert(self, idx, item):
+        super().insert(idx, item)
+        self.positions = None
+        self.indexItem(item)
+
+    def remove(self, item):
+        super().remove(item)
+        self.positions = None
+        self.unindexItem(item)
+
+    def pop(self, idx=-1):
+        item = super().pop(idx)
+        self.positions = None
+        self.unindexItem(item)
+        return item
+
+    def clear(self):
+        for item in self:
+            self.unindexItem(item)
+        super().clear()
+        self.positions = None
+
+    def __delitem__(self, key):
+        removed = self[key] if isinstance(key, slice) else [self[key]]
+        super().__delitem__(key)
+        self.positions = None
+        for item in removed:
+            self.unindexItem(item)
+
+    def __setitem__(self, key, value):
+        removed = self[key] if isinstance(key, slice) else [self[key]]
+        super().__setitem__(key, value)
+        self.positions = None
+        for item in removed:
+            self.unindexItem(item)
+        for item in (self[key] if isinstance(key, slice) else [self[key]]):
+            self.indexItem(item)
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self.positions = None
+
+    def reverse(self):
+        super().reverse()
+        self.positions = None
+
+
 class ObjectItem(LevelEditorItem):
     """
     Level editor item that represents an ingame object
     """
 
+    # (ObjectLayer, cells) this object is in the grid of, if any
+    indexedIn = None
+
+    # The position and size are properties, so that the layer's grid
+    # can be updated whenever they change
+    def _indexedProperty(name):
+        def getter(self):
+            return getattr(self, name)
+        def setter(self, value):
+            setattr(self, name, value)
+            if self.indexedIn is not None:
+                self.indexedIn[0].indexItem(self)
+        return property(getter, setter)
+    objx = _indexedProperty('_objx')
+    objy = _indexedProperty('_objy')
+    width = _indexedProperty('_width')
+    height = _indexedProperty('_height')
+    del _indexedProperty
+
     def __init__(self, from_, idx, layer, x, y, width, height, z, data=13):
         """
         Creates an object with specific data
@@ -3556,11 +4009,17 @@ class ObjectItem(LevelEditorItem):
         type = trans.string('Objects', typeStrId, '[id]', self.idx)
         self.setToolTip(trans.string('Objects', 0, '[type]', type, '[width]', self.width, '[height]', self.height, '[layer]', self.layer))
 
-    def updateObjCache(self):
+    def updateObjCache(self, resized=False):
         """
-        Updates the rendered object data
+        Updates the rendered object data. If resized is True, only the
+        width and/or height have changed since the last update, so the
+        parts of the old rendering that stay the same are reused.
         """
-        self.objdata = self.getObjectDefinition().render(self.width, self.height)
+        definition = self.getObjectDefinition()
+        if resized and self.objdata:
+            self.objdata = definition.renderResized(self.objdata, self.width, self.height)
+        else:
+            self.objdata = definition.render(self.width, self.height)
 
     def getObjectDefinition(self):
         """
@@ -3644,10 +4103,8 @@ class ObjectItem(LevelEditorItem):
             for row in self.objdata:
                 destx = 0
                 for tile in row:
-                    if tile is not None:
-                        image = tile.reprImage(self.data, item=True)
-                        if image is not None: # None = Blank tile
-                            painter.drawImage(destx * TileWidth, desty * TileWidth, PIL.ImageQt.ImageQt(image))
+                    if tile is not None: # None = Blank tile
+                        painter.drawPixmap(destx * TileWidth, desty * TileWidth, tilePixmap(tile, self.data))
                     destx += 1
                 desty += 1
 
@@ -3728,18 +4185,13 @@ class ObjectItem(LevelEditorItem):
                     newHeight = self.objsDragging[obj][1]
                     if newWidth < 1: newWidth = 1
                     if newHeight < 1: newHeight = 1
+                    if newWidth == obj.width and newHeight == obj.height: continue
                     obj.width = newWidth
                     obj.height = newHeight
 
-                    obj.updateObjCache()
-
-                    oldrect = obj.BoundingRect
-                    oldrect.translate(cx * TileWidth, cy * TileWidth)
-                    newrect = QtCore.QRectF(obj.x(), obj.y(), obj.width * TileWidth, obj.height * TileWidth)
-                    updaterect = oldrect.united(newrect)
-
+                    # UpdateRects() repaints the old and new areas of it
+                    obj.updateObjCache(resized=True)
                     obj.UpdateRects()
-                    obj.scene().update(updaterect)
                 SetDirty()
 
             event.accept()
@@ -4023,7 +4475,7 @@ class ZoneItem(LevelEditorItem):
                 self.setPos(int(self.objx * TileWidth / 16), int(self.objy * TileWidth / 16))
                 self.scene().update(updaterect)
 
-                mainWindow.levelOverview.update()
+                mainWindow.levelOverview.invalidate()
 
                 # Call the zoneRepositioned function of all
                 # the sprite auxs for this zone
@@ -4408,9 +4860,8 @@ class SpriteItem(LevelEditorItem):
             self.setZValue(15000) # Between layer 0 and layer 1
         self.resetTransform()
 
-        if (self.type in gamedef.getImageClasses()) and (self.type not in SLib.SpriteImagesLoaded):
-            gamedef.getImageClasses()[self.type].loadImages()
-            SLib.SpriteImagesLoaded.add(self.type)
+        if self.type in gamedef.getImageClasses():
+            SLib.loadSpriteImages(self.type, gamedef.getImageClasses()[self.type])
         self.ImageObj = obj(self)
 
         self.UpdateDynamicSizing()
@@ -5474,6 +5925,10 @@ class LevelOverviewWidget(QtWidgets.QWidget):
     """
     moveIt = QtCore.pyqtSignal(int, int)
 
+    # If more items than this changed at once, it's quicker to redraw
+    # the whole overview than each of their rects
+    MAX_DIRTY_RECTS = 64
+
     def __init__(self):
         """
         Constructor for the level overview widget
@@ -5503,6 +5958,17 @@ class LevelOverviewWidget(QtWidgets.QWidget):
         self.Wlocator = 80
         self.mainWindowScale = 1
 
+        # Everything but the viewbox is drawn to this image. It's only
+        # drawn again completely after Reset() or a resize; after
+        # invalidate(), just the parts that changed are. So scrolling
+        # the main view is just one blit.
+        self.contents = None
+        self.contentsDirty = True
+        self.contentsStale = False
+        self.drawnArea = None
+        self.drawnItems = {} # zone/sprite/entrance/location -> (rect, extent)
+        self.drawnObjects = {} # ObjectItem -> (rect, extent)
+
     def Reset(self):
         """
         Resets the max and scale variables
@@ -5512,6 +5978,18 @@ class LevelOverviewWidget(QtWidgets.QWidget):
         self.maxY = 1
         self.CalcSize()
         self.Rescale()
+        self.contentsDirty = True
+        self.update()
+
+    def invalidate(self):
+        """
+        Something in the level changed, so the overview needs to catch
+        up. Only the parts of it where something was added, removed,
+        moved or resized are redrawn, at the next paint. (Only the
+        viewbox moving doesn't need this; update() is enough for that.)
+        """
+        self.contentsStale = True
+        self.update()
 
     def CalcSize(self):
         """
@@ -5548,21 +6026,181 @@ class LevelOverviewWidget(QtWidgets.QWidget):
             # the level is created, but before it's loaded
             return
 
+        if self.contentsDirty or self.contents is None or self.contents.size() != self.size():
+            self.renderContents()
+        elif self.contentsStale:
+            self.updateContents()
+
         painter = QtGui.QPainter(self)
+        painter.drawImage(0, 0, self.contents)
+
         painter.setRenderHint(QtGui.QPainter.Antialiasing, True)
+        painter.scale(self.scale, self.scale)
+        painter.setPen(QtGui.QPen(theme.color('overview_viewbox'), 1))
+        painter.drawRect(self.Xposlocator/TileWidth/self.mainWindowScale, self.Yposlocator/TileWidth/self.mainWindowScale, self.Wlocator/TileWidth/self.mainWindowScale, self.Hlocator/TileWidth/self.mainWindowScale)
+
+    def scannedItems(self):
+        """
+        Yield (item, rect, extent) for everything in the overview but
+        the objects: rect is the rect (x, y, w, h, in tiles) the item
+        is drawn in, and extent is the point it makes the overview
+        reach (see calcMaxXY()). There are few enough of these to
+        check all of them for changes; objects tell their ObjectLayer
+        when they change instead.
+        """
+        for zone in Area.zones:
+            rect = (zone.objx / 16, zone.objy / 16, zone.width / 16, zone.height / 16)
+            yield zone, rect, (rect[0] + rect[2], rect[1] + rect[3])
+
+        for item in Area.sprites + Area.entrances:
+            yield item, item.LevelRect.getRect(), (item.objx / 16, item.objy / 16)
+
+        for location in Area.locations:
+            rect = (location.objx / 16, location.objy / 16, location.width / 16, location.height / 16)
+            yield location, rect, (rect[0] + rect[2], rect[1] + rect[3])
+
+    def calcMaxXY(self):
+        """
+        Find the bottom-right-most extent of everything in the level,
+        which the overview is scaled to fit
+        """
+        maxX = 0
+        maxY = 0
+
+        for layer in Area.layers:
+            for obj in layer:
+                if obj.objx > maxX:
+                    maxX = obj.objx
+                if obj.objy > maxY:
+                    maxY = obj.objy
 
+        for _, _, (x, y) in self.scannedItems():
+            maxX = max(maxX, x)
+            maxY = max(maxY, y)
+
+        self.maxX = maxX
+        self.maxY = maxY
+
+    def renderContents(self):
+        """
+        Draw everything except the viewbox to self.contents, at the
+        current widget size
+        """
+        self.calcMaxXY()
         self.Rescale()
+
+        self.contents = QtGui.QImage(self.size(), QtGui.QImage.Format_ARGB32_Premultiplied)
+        self.contents.fill(Qt.transparent)
+        self.contentsDirty = self.contentsStale = False
+
+        painter = QtGui.QPainter(self.contents)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing, True)
         painter.scale(self.scale, self.scale)
+        self.drawItems(painter)
+        painter.end()
+
+        # Remember where everything was drawn, so updateContents() can
+        # tell what changed since
+        self.drawnArea = Area
+        self.drawnItems = {item: (rect, extent) for item, rect, extent in self.scannedItems()}
+        self.drawnObjects = {}
+        for layer in Area.layers:
+            layer.changed.clear()
+            for obj in layer:
+                self.drawnObjects[obj] = ((obj.objx, obj.objy, obj.width, obj.height), (obj.objx, obj.objy))
+
+    def updateContents(self):
+        """
+        Redraw only the parts of self.contents where something was
+        added, removed, moved or resized since it was last drawn. If
+        that changes the scale, or there's too much to redraw, it's
+        all drawn again instead.
+        """
+        if Area is not self.drawnArea:
+            self.renderContents()
+            return
+        self.contentsStale = False
+
+        dirty = []
+        rescale = False
+        def check(drawn, item, new):
+            nonlocal rescale
+            old = drawn.pop(item, None)
+            if new is not None:
+                drawn[item] = new
+            if old == new: return
+
+            for shape in (old, new):
+                if shape is None: continue
+                dirty.append(shape[0])
+                # The scale might have to change if this is, or was,
+                # the bottom-right-most item
+                if shape[1][0] >= self.maxX or shape[1][1] >= self.maxY:
+                    rescale = True
+
+        seen = set()
+        for item, rect, extent in self.scannedItems():
+            seen.add(item)
+            check(self.drawnItems, item, (rect, extent))
+        for item in [item for item in self.drawnItems if item not in seen]:
+            check(self.drawnItems, item, None)
+
+        for layer in Area.layers:
+            for obj in layer.changed:
+                if obj.indexedIn is None:
+                    new = None
+                else:
+                    new = ((obj.objx, obj.objy, obj.width, obj.height), (obj.objx, obj.objy))
+                check(self.drawnObjects, obj, new)
+            layer.changed.clear()
+
+        if rescale:
+            oldMax = (self.maxX, self.maxY)
+            self.calcMaxXY()
+            if (self.maxX, self.maxY) != oldMax:
+                self.renderContents()
+                return
+
+        if len(dirty) > self.MAX_DIRTY_RECTS:
+            self.renderContents()
+            return
+
+        s = self.scale
+        painter = QtGui.QPainter(self.contents)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing, True)
+        for x, y, w, h in dirty:
+            # The outlines and antialiasing reach a bit past the rect
+            area = QtCore.QRectF(x * s, y * s, w * s, h * s).adjusted(-s - 2, -s - 2, s + 2, s + 2).toAlignedRect()
+
+            painter.resetTransform()
+            painter.setClipRect(area)
+            painter.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+            painter.fillRect(area, Qt.transparent)
+            painter.setCompositionMode(QtGui.QPainter.CompositionMode_SourceOver)
+
+            painter.scale(s, s)
+            self.drawItems(painter, (area.x() / s, area.y() / s, area.width() / s, area.height() / s))
+        painter.end()
+
+    def drawItems(self, painter, region=None):
+        """
+        Draw the background and the level's items with the painter,
+        which is scaled to tiles. If region (x, y, w, h, in tiles) is
+        given, only the items in it are drawn.
+        """
+        global theme
+
+        if region is None:
+            inRegion = lambda x, y, w, h: True
+        else:
+            rx, ry, rw, rh = region
+            inRegion = lambda x, y, w, h: x <= rx + rw and x + w >= rx and y <= ry + rh and y + h >= ry
+
         painter.fillRect(0, 0, 1024, 512, self.bgbrush)
 
-        maxX = self.maxX
-        maxY = self.maxY
         dr = painter.drawRect
         fr = painter.fillRect
 
-        maxX = 0
-        maxY = 0
-
         b = self.viewbrush
         painter.setPen(QtGui.QPen(theme.color('overview_zone_lines'), 1))
 
@@ -5571,43 +6209,32 @@ class LevelOverviewWidget(QtWidgets.QWidget):
             y = zone.objy / 16
             width = zone.width / 16
             height = zone.height / 16
+            if not inRegion(x, y, width, height): continue
             fr(x, y, width, height, b)
             dr(x, y, width, height)
-            if x+width > maxX:
-                maxX = x+width
-            if y+height > maxY:
-                maxY = y+height
 
         b = self.objbrush
 
         for layer in Area.layers:
-            for obj in layer:
+            if region is None:
+                objects = layer
+            else:
+                x, y = math_floor(rx), math_floor(ry)
+                objects = layer.itemsIn(x, y, math_ceil(rx + rw) - x + 1, math_ceil(ry + rh) - y + 1)
+            for obj in objects:
                 fr(obj.LevelRect, b)
-                if obj.objx > maxX:
-                    maxX = obj.objx
-                if obj.objy > maxY:
-                    maxY = obj.objy
-
 
         b = self.spritebrush
 
         for sprite in Area.sprites:
+            if not inRegion(*sprite.LevelRect.getRect()): continue
             fr(sprite.LevelRect, b)
-            if sprite.objx/16 > maxX:
-                maxX = sprite.objx/16
-            if sprite.objy/16 > maxY:
-                maxY = sprite.objy/16
-
 
         b = self.entrancebrush
 
         for ent in Area.entrances:
+            if not inRegion(*ent.LevelRect.getRect()): continue
             fr(ent.LevelRect, b)
-            if ent.objx/16 > maxX:
-                maxX = ent.objx/16
-            if ent.objy/16 > maxY:
-                maxY = ent.objy/16
-
 
         b = self.locationbrush
         painter.setPen(QtGui.QPen(theme.color('overview_location_lines'), 1))
@@ -5617,19 +6244,9 @@ class LevelOverviewWidget(QtWidgets.QWidget):
             y = location.objy / 16
             width = location.width / 16
             height = location.height / 16
+            if not inRegion(x, y, width, height): continue
             fr(x, y, width, height, b)
             dr(x, y, width, height)
-            if x+width > maxX:
-                maxX = x+width
-            if y+height > maxY:
-                maxY = y+height
-
-        self.maxX = maxX
-        self.maxY = maxY
-
-        b = self.locationbrush
-        painter.setPen(QtGui.QPen(theme.color('overview_viewbox'), 1))
-        painter.drawRect(self.Xposlocator/TileWidth/self.mainWindowScale, self.Yposlocator/TileWidth/self.mainWindowScale, self.Wlocator/TileWidth/self.mainWindowScale, self.Hlocator/TileWidth/self.mainWindowScale)
 
 
     def Rescale(self):
@@ -5690,6 +6307,18 @@ class ObjectPickerWidget(QtWidgets.QStackedWidget):
         self.embedImport = QtWidgets.QPushButton('Import')
         self.embedImport.clicked.connect(self.handleEmbedImport)
 
+        # Search results are shown in a list in place of the tree
+        self.megaSearch = QtWidgets.QLineEdit()
+        self.megaSearch.setPlaceholderText('Search (e.g. "grass role:top -decorative")')
+        self.megaSearch.setClearButtonEnabled(True)
+        self.megaSearch.textChanged.connect(self.handleMegaSearch)
+
+        self.megaResults = ObjectPickerListWidget(self, [])
+        self.megaResults.hide()
+        self.megaResultNames = []
+        self.megaResults.ObjChanged.connect(lambda idx: self.handleMegaResultChangedReplaced(idx, False))
+        self.megaResults.ObjReplace.connect(lambda idx: self.handleMegaResultChangedReplaced(idx, True))
+
         mainWrap = QtWidgets.QWidget()
         mainWrapL = QtWidgets.QVBoxLayout(mainWrap)
         mainWrapL.setContentsMargins(0, 0, 0, 0)
@@ -5702,8 +6331,15 @@ class ObjectPickerWidget(QtWidgets.QStackedWidget):
         embedWrapL.addWidget(self.embedImport)
         embedWrapL.addWidget(self.embedPicker)
 
+        megaWrap = QtWidgets.QWidget()
+        megaWrapL = QtWidgets.QVBoxLayout(megaWrap)
+        megaWrapL.setContentsMargins(0, 0, 0, 0)
+        megaWrapL.addWidget(self.megaSearch)
+        megaWrapL.addWidget(self.megaPicker)
+        megaWrapL.addWidget(self.megaResults)
+
         self.addWidget(mainWrap)
-        self.addWidget(self.megaPicker)
+        self.addWidget(megaWrap)
         self.addWidget(embedWrap)
 
 
@@ -5714,6 +6350,7 @@ class ObjectPickerWidget(QtWidgets.QStackedWidget):
         self.mainPicker.Load(MainObjects)
         self.megaPicker.Load(OneTilesetObjects, OneTilesetHierarchy)
         self.embedPicker.Load(EmbeddedObjects)
+        self.handleMegaSearch(self.megaSearch.text())
 
 
     def ShowTileset(self, which):
@@ -5730,6 +6367,36 @@ class ObjectPickerWidget(QtWidgets.QStackedWidget):
         self.ObjReplace.emit()
 
 
+    def handleMegaSearch(self, text):
+        """
+        The search text for the OneTileset tab changed
+        """
+        if not text.strip() or OneTilesetIndex is None:
+            self.megaResults.hide()
+            self.megaPicker.show()
+            return
+
+        # Showing more results than this isn't useful, and would make
+        # each keypress slow
+        self.megaResultNames = OneTilesetIndex.search(text, limit=1000)
+        self.megaResults.Load([OneTilesetObjects[name] for name in self.megaResultNames])
+
+        self.megaPicker.hide()
+        self.megaResults.show()
+
+
+    def handleMegaResultChangedReplaced(self, idx, replace):
+        """
+        An object in the search results was picked
+        """
+        if not 0 <= idx < len(self.megaResultNames): return
+        name = self.megaResultNames[idx]
+        if replace:
+            self.handleObjReplace(1, name)
+        else:
+            self.handleObjChanged(1, name)
+
+
     def handleEmbeddedObjUpdate(self, idx):
         return self.EmbeddedObjUpdate.emit(idx)
 
@@ -5770,6 +6437,9 @@ class ObjectPickerWidget(QtWidgets.QStackedWidget):
         """
         Set the current selected object to object idx.
         """
+        if self.currentIndex() == 1:
+            # Show it in the tree, even if it's not in the search results
+            self.megaSearch.clear()
         [self.mainPicker, self.megaPicker, self.embedPicker][self.currentIndex()].setObject(idx)
 
 
@@ -5806,7 +6476,7 @@ class ObjectPickerTreeWidget(QtWidgets.QTreeWidget):
             # Sort the name list (not in-place -- that would modify
             # the OneTilesetHierarchy global)
             nameList = sorted(nameList,
-                key=lambda name: objectsDict[name]
+                key=lambda name: objectsDict[name].sortKey
                 )
 
             # Convert that to a list of objects
@@ -5880,6 +6550,188 @@ class ObjectPickerTreeWidget(QtWidgets.QTreeWidget):
             self.ObjChanged.emit(self.objectListNames[widget][idx])
 
 
+class ObjectPreviewCache:
+    """
+    Keeps object picker previews between sessions, keyed by
+    Object.contentSignature. The previews are all stored in a single
+    sprite sheet image, next to an index of where each one is.
+    """
+    SHEET_WIDTH = 2048
+    MAX_SHEET_HEIGHT = 32767 # QImage can't be any taller than this
+    VERSION = 1
+
+    def __init__(self, name, params):
+        """
+        Load the cache with this name. params should hold everything
+        else that affects what the previews look like; if it changes,
+        the old previews are thrown away.
+        """
+        self.sheetPath = getCachePath(name + '.png')
+        self.indexPath = getCachePath(name + '.index')
+        self.params = params
+
+        self.sheet = None
+        self.rects = {}    # signature -> QRect in self.sheet
+        self.previews = {} # signature -> QPixmap, for the ones used this session
+        self.changed = False
+
+        if not (os.path.isfile(self.sheetPath) and os.path.isfile(self.indexPath)):
+            return
+        try:
+            with open(self.indexPath, 'rb') as f:
+                version, params, rects = pickle.load(f)
+        except Exception:
+            print('WARNING: Could not load the object preview cache index from ' + self.indexPath)
+            return
+        if version != self.VERSION or params != self.params: return
+
+        sheet = QtGui.QImage(self.sheetPath)
+        if sheet.isNull():
+            print('WARNING: Could not load the object preview cache from ' + self.sheetPath)
+            return
+
+        self.sheet = sheet
+        self.rects = {sig: QtCore.QRect(*rect) for sig, rect in rects.items()}
+
+
+    def get(self, signature):
+        """
+        Return the preview with this signature, or None
+        """
+        pm = self.previews.get(signature)
+        if pm is None and signature in self.rects:
+            pm = QtGui.QPixmap.fromImage(self.sheet.copy(self.rects[signature]))
+            self.previews[signature] = pm
+        return pm
+
+
+    def add(self, signature, pm):
+        """
+        Add a new preview
+        """
+        self.previews[signature] = pm
+        self.changed = True
+
+
+    def save(self):
+        """
+        Write the sprite sheet and index, if anything was added. The
+        previews used this session are packed in first, then the old
+        ones that weren't; whatever doesn't fit is dropped.
+        """
+        if not self.changed: return
+
+        entries = [(sig, pm.size(), pm) for sig, pm in self.previews.items()]
+        entries.sort(key=lambda e: -e[1].height())
+        oldEntries = [(sig, rect.size(), None) for sig, rect in self.rects.items()
+                      if sig not in self.previews]
+        oldEntries.sort(key=lambda e: -e[1].height())
+
+        # Pack them into rows, tallest first
+        rects = {}
+        x = y = rowHeight = 0
+        for sig, size, pm in entries + oldEntries:
+            if size.width() > self.SHEET_WIDTH: continue
+            if x + size.width() > self.SHEET_WIDTH:
+                x, y, rowHeight = 0, y + rowHeight, 0
+            if y + size.height() > self.MAX_SHEET_HEIGHT: continue
+            rects[sig] = QtCore.QRect(x, y, size.width(), size.height())
+            x += size.width()
+            rowHeight = max(rowHeight, size.height())
+
+        height = max([r.bottom() + 1 for r in rects.values()] + [1])
+        sheet = QtGui.QImage(self.SHEET_WIDTH, height, QtGui.QImage.Format_ARGB32_Premultiplied)
+        sheet.fill(Qt.transparent)
+        painter = QtGui.QPainter(sheet)
+        painter.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+        for sig, size, pm in entries + oldEntries:
+            if sig not in rects: continue
+            if pm is not None:
+                painter.drawPixmap(rects[sig].topLeft(), pm)
+            else:
+                painter.drawImage(rects[sig].topLeft(), self.sheet, self.rects[sig])
+        del painter
+
+        if not sheet.save(self.sheetPath, 'PNG'):
+            raise IOError('Could not write ' + self.sheetPath)
+        with open(self.indexPath, 'wb') as f:
+            pickle.dump(
+                (self.VERSION, self.params,
+                 {sig: r.getRect() for sig, r in rects.items()}),
+                f, pickle.HIGHEST_PROTOCOL)
+
+        self.sheet = sheet
+        self.rects = rects
+        self.changed = False
+
+
+class ObjectPreviewRenderer:
+    """
+    Renders object previews on a worker thread. The most recently
+    requested previews are rendered first, since those are the ones
+    that were just scrolled into view.
+    """
+
+    def __init__(self):
+        """
+        Start the worker thread
+        """
+        self.queue = collections.OrderedDict() # key -> (object, set of models)
+        self.condition = threading.Condition()
+
+        thread = threading.Thread(None, self.run, daemon=True)
+        thread.start()
+
+
+    def request(self, model, key, obj):
+        """
+        Render the preview for this object. model.previewRendered will
+        be emitted with the key and the image once it's done.
+        """
+        with self.condition:
+            if key in self.queue:
+                self.queue[key][1].add(model)
+                self.queue.move_to_end(key)
+            else:
+                self.queue[key] = (obj, {model})
+            self.condition.notify()
+
+
+    def cancel(self, model):
+        """
+        Forget about all of the previews this model asked for
+        """
+        with self.condition:
+            for key in list(self.queue):
+                models = self.queue[key][1]
+                models.discard(model)
+                if not models:
+                    del self.queue[key]
+
+
+    def run(self):
+        """
+        Render previews forever
+        """
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+                key, (obj, models) = self.queue.popitem()
+
+            try:
+                image = ObjectPickerListWidget.ObjectListModel._renderPreview(obj)
+            except Exception:
+                print('WARNING: Could not render a preview of ' + str(obj))
+                image = QtGui.QImage()
+
+            for model in models:
+                try:
+                    model.previewRendered.emit(key, image)
+                except RuntimeError:
+                    pass # The model was deleted in the meantime
+
+
 class ObjectPickerListWidget(QtWidgets.QListView):
     """
     Widget that shows a list of available objects
@@ -5949,6 +6801,16 @@ class ObjectPickerListWidget(QtWidgets.QListView):
         self.model_.Add(object)
 
 
+    def dataChanged(self, topLeft, bottomRight, roles=[]):
+        """
+        QListView only lays its items out again by itself when rows are
+        added or removed, so do that when one of them changes size, too
+        """
+        super().dataChanged(topLeft, bottomRight, roles)
+        if Qt.SizeHintRole in roles:
+            self.scheduleDelayedItemsLayout()
+
+
     def contextMenuEvent(self, e):
         """
         The user right-clicked the object view widget
@@ -5959,6 +6821,7 @@ class ObjectPickerListWidget(QtWidgets.QListView):
 
         menu = QtWidgets.QMenu()
         menu.addAction('Export...', lambda: self.exportObject(idx.row()))
+        menu.addAction('Export All...', self.exportAllObjects)
         if self.allowImportReplace:
             menu.addAction('Import Replacement...', lambda: self.importReplaceObject(idx.row()))
         if self.allowDelete:
@@ -5980,6 +6843,39 @@ class ObjectPickerListWidget(QtWidgets.QListView):
                 f.write(fd)
 
 
+    def exportAllObjects(self):
+        """
+        The user hit Export All.
+        """
+        folder = QtWidgets.QFileDialog.getExistingDirectory(self, 'Export All Objects to This Folder')
+        if not folder: return
+
+        # Objects without names would all overwrite each other's files
+        objects = []
+        for i, obj in enumerate(self.objects):
+            if not obj.name:
+                obj = copy.copy(obj)
+                obj.name = 'object%d' % i
+            objects.append(('', obj))
+
+        progressBox = QtWidgets.QProgressDialog()
+        progressBox.setWindowTitle('Exporting')
+        progressBox.setLabelText('Exporting objects... please wait...')
+        progressBox.setCancelButton(None)
+        progressBox.setMinimumDuration(0)
+        progressBox.setRange(0, len(objects))
+        progressBox.show()
+        QtWidgets.QApplication.processEvents()
+
+        def updateProgress(done, total):
+            progressBox.setValue(done)
+            QtWidgets.QApplication.processEvents()
+
+        nsmbulib.Tileset.exportToNew(objects, folder, progress=updateProgress)
+
+        progressBox.hide()
+
+
     def importReplaceObject(self, num):
         """
         The user hit Import Replacement.
@@ -6044,8 +6940,8 @@ class ObjectPickerListWidget(QtWidgets.QListView):
 
             p = index.model().data(index, Qt.DecorationRole)
             if p is not None:
-                # p might be None due to threading issues from progressive
-                # tileset loading.
+                # p is None until the preview has been rendered in the
+                # background. Asking for it starts that.
                 painter.drawPixmap(option.rect.x()+2, option.rect.y()+2, p)
             #painter.drawText(option.rect, str(index.row()))
 
@@ -6059,20 +6955,30 @@ class ObjectPickerListWidget(QtWidgets.QListView):
 
     class ObjectListModel(QtCore.QAbstractListModel):
         """
-        Model containing all the objects in a tileset
+        Model containing all the objects in a tileset. Previews are
+        rendered in the background by ObjectPreviewRenderer, only once
+        a row is actually painted; until then, the row is blank.
         """
 
         forceNumbering = False
 
+        # Emitted (from the renderer thread) with each preview signature
+        # and QImage this model asked for
+        previewRendered = QtCore.pyqtSignal(str, QtGui.QImage)
+
         def __init__(self):
             """
             Initializes the model
             """
             super().__init__()
-            self.objects = [None] * 256
-            self.ritems = [None] * 256
+            self.objects = []
+            self.ritems = []
             self.itemsize = []
             self.tooltips = []
+            self.previewKeys = []
+            self.requested = set()
+
+            self.previewRendered.connect(self.handlePreviewRendered, Qt.QueuedConnection)
 
         def rowCount(self, parent=None):
             """
@@ -6090,6 +6996,8 @@ class ObjectPickerListWidget(QtWidgets.QListView):
             if n >= len(self.objects): return None
 
             if role == Qt.DecorationRole and n < len(self.ritems):
+                if self.ritems[n] is None:
+                    self._findPreview(n)
                 return self.ritems[n]
 
             if role == Qt.BackgroundRole:
@@ -6106,14 +7014,18 @@ class ObjectPickerListWidget(QtWidgets.QListView):
 
         def Load(self, defs):
             """
-            Renders all the object previews for the model
+            Load these objects into the model. Their previews are made
+            later, when they're first needed.
             """
             self.beginResetModel()
 
+            PreviewRenderer.cancel(self)
             self.objects = []
             self.ritems = []
             self.itemsize = []
             self.tooltips = []
+            self.previewKeys = []
+            self.requested = set()
 
             for obj in defs:
                 self._add(obj)
@@ -6125,26 +7037,24 @@ class ObjectPickerListWidget(QtWidgets.QListView):
             """
             Add this object to the model.
             """
-            self.beginResetModel()
+            row = len(self.objects)
+            self.beginInsertRows(QtCore.QModelIndex(), row, row)
             self._add(object)
-            self.endResetModel()
+            self.endInsertRows()
 
 
         def Replace(self, object, idx):
             """
             Replace the object at idx with this one.
             """
-            self.beginResetModel()
-
             self.objects[idx] = object
-
-            pm = self._makePreview(object)
-            self.ritems[idx] = pm
-            self.itemsize[idx] = pm.size() + QtCore.QSize(4, 4)
-
+            self.ritems[idx] = None
+            self.previewKeys[idx] = self._previewKey(object)
             self.tooltips[idx] = self._makeTooltip(object, idx, self.forceNumbering)
+            self._setItemSize(idx, self._previewSize(object))
 
-            self.endResetModel()
+            index = self.index(idx)
+            self.dataChanged.emit(index, index)
 
 
         def _add(self, object):
@@ -6156,38 +7066,122 @@ class ObjectPickerListWidget(QtWidgets.QListView):
             a name like "Object 22", even if it already has another name.
             """
             self.objects.append(object)
-
-            pm = self._makePreview(object)
-            self.ritems.append(pm)
-            self.itemsize.append(pm.size() + QtCore.QSize(4, 4))
+            self.ritems.append(None)
+            self.itemsize.append(self._previewSize(object) + QtCore.QSize(4, 4))
+            self.previewKeys.append(self._previewKey(object))
 
             self.tooltips.append(self._makeTooltip(object, len(self.objects) - 1, self.forceNumbering))
 
 
+        def _findPreview(self, n):
+            """
+            Get the preview for row n from the preview cache, or ask
+            for it to be rendered if it's not there
+            """
+            key = self.previewKeys[n]
+            pm = ObjectPreviews.get(key)
+            if pm is not None:
+                self.ritems[n] = pm
+                self._setItemSize(n, pm.size())
+            elif key not in self.requested:
+                self.requested.add(key)
+                PreviewRenderer.request(self, key, self.objects[n])
+
+
+        def handlePreviewRendered(self, key, image):
+            """
+            A preview we asked for has been rendered
+            """
+            self.requested.discard(key)
+            if image.isNull(): return
+
+            pm = QtGui.QPixmap.fromImage(image)
+            ObjectPreviews.add(key, pm)
+
+            for n, rowKey in enumerate(self.previewKeys):
+                if rowKey != key: continue
+                self.ritems[n] = pm
+                self._setItemSize(n, pm.size())
+                index = self.index(n)
+                self.dataChanged.emit(index, index)
+
+
+        def _setItemSize(self, n, size):
+            """
+            Set the size of row n's preview. If this isn't what we
+            guessed, the view has to lay that item out again.
+            """
+            size = size + QtCore.QSize(4, 4)
+            if self.itemsize[n] == size: return
+            self.itemsize[n] = size
+            index = self.index(n)
+            self.dataChanged.emit(index, index, [Qt.SizeHintRole])
+
+
+        # Preview size constants
+        FORCED_TILE_WIDTH = 32 # Objects will be resized so that each tile is this wide...
+        FORCED_MAX_WH = 250    # ... unless that causes the object to be taller or wider than
+                               # this, in which case it will be shrank until it fits this.
+
         @staticmethod
-        def _makePreview(obj):
+        def _previewKey(obj):
             """
-            Make a preview for this object.
+            Return the key this object's preview is cached under: its
+            content signature, plus any tile override images, since the
+            previews show those instead of the tiles
             """
+            key = obj.contentSignature
+            if isinstance(obj, nsmbulib.Object.LazyObject):
+                return key # These never have overrides
+
+            h = None
+            for tile in obj.allTiles:
+                if not isinstance(tile, nsmbulib.Tile.Tile): continue
+                override = tile._contentsOverrides.get(0, tile.override)
+                if override is None: continue
+                if h is None: h = hashlib.sha1()
+                h.update(override.tobytes())
 
-            # Constants
-            FORCED_TILE_WIDTH = 32 # Objects will be resized so that each tile is this wide...
-            FORCED_MAX_WH = 250    # ... unless that causes the object to be taller or wider than
-                                   # this, in which case it will be shrank until it fits this.
+            return key if h is None else key + '+' + h.hexdigest()
 
-            pm = QtGui.QPixmap.fromImage(PIL.ImageQt.ImageQt(nsmbulib.Tile.tilesToImage(obj.render(obj.width, obj.height), useRepr=True)))
+
+        @classmethod
+        def _previewSize(cls, obj):
+            """
+            Work out how big this object's preview will be, without
+            rendering it
+            """
+            FORCED_TILE_WIDTH, FORCED_MAX_WH = cls.FORCED_TILE_WIDTH, cls.FORCED_MAX_WH
+
+            w, h = obj.width * FORCED_TILE_WIDTH, obj.height * FORCED_TILE_WIDTH
+            if w > h and w > FORCED_MAX_WH:
+                w, h = FORCED_MAX_WH, round(h * FORCED_MAX_WH / w)
+            elif h > w and h > FORCED_MAX_WH:
+                w, h = round(w * FORCED_MAX_WH / h), FORCED_MAX_WH
+            return QtCore.QSize(w, h)
+
+
+        @classmethod
+        def _renderPreview(cls, obj):
+            """
+            Actually render a preview for this object, as a QImage.
+            This is safe to call from other threads.
+            """
+            FORCED_TILE_WIDTH, FORCED_MAX_WH = cls.FORCED_TILE_WIDTH, cls.FORCED_MAX_WH
+
+            img = PIL.ImageQt.ImageQt(nsmbulib.Tile.tilesToImage(obj.render(obj.width, obj.height), useRepr=True)).copy()
 
             # Resize objects while imposing a maximum width and height
             st = Qt.SmoothTransformation
-            w, h = pm.width() * FORCED_TILE_WIDTH / TileWidth, pm.height() * FORCED_TILE_WIDTH / TileWidth
+            w, h = img.width() * FORCED_TILE_WIDTH / TileWidth, img.height() * FORCED_TILE_WIDTH / TileWidth
             if w > h and w > FORCED_MAX_WH:
-                pm = pm.scaledToWidth(FORCED_MAX_WH, st)
+                img = img.scaledToWidth(FORCED_MAX_WH, st)
             elif h > w and h > FORCED_MAX_WH:
-                pm = pm.scaledToHeight(FORCED_MAX_WH, st)
+                img = img.scaledToHeight(FORCED_MAX_WH, st)
             else:
-                pm = pm.scaledToWidth(w, st)
+                img = img.scaledToWidth(int(w), st)
 
-            return pm
+            return img
 
 
         @staticmethod
@@ -6222,20 +7216,22 @@ class ObjectPickerListWidget(QtWidgets.QListView):
             """
             Remove the num'th object.
             """
-            self.beginResetModel()
+            self.beginRemoveRows(QtCore.QModelIndex(), num, num)
 
             # Remove the thing
             del self.objects[num]
             del self.ritems[num]
             del self.itemsize[num]
             del self.tooltips[num]
+            del self.previewKeys[num]
+
+            self.endRemoveRows()
 
             # Update object names for the objects with higher indices
             for idx in range(num, len(self.tooltips)):
                 self.tooltips[idx] = self._makeTooltip(self.objects[idx], idx, self.forceNumbering)
-
-            # Let Qt know we're done
-            self.endResetModel()
+            if num < len(self.tooltips):
+                self.dataChanged.emit(self.index(num), self.index(len(self.tooltips) - 1))
 
 
 class StampChooserWidget(QtWidgets.QListView):
@@ -8677,45 +9673,65 @@ class LevelViewWidget(QtWidgets.QGraphicsView):
         global theme
 
         Zoom = mainWindow.ZoomLevel
-        drawLine = painter.drawLine
-        GridColor = theme.color('grid')
+        tile, scale = self.overlayTile(Zoom, theme.color('grid'))
+
+        # The tile repeats from (0, 0) of the scene. It might be drawn
+        # scaled up, so that it can be smaller than one repeat. Its
+        # squares line up with whole pixels of it, so it's scaled
+        # without smoothing, which would blur their edges and leave
+        # seams where the repeats meet.
+        if scale != 1:
+            painter.save()
+            painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform, False)
+            painter.scale(scale, scale)
+            rect = QtCore.QRectF(rect.x() / scale, rect.y() / scale, rect.width() / scale, rect.height() / scale)
+        painter.drawTiledPixmap(rect, tile, QtCore.QPointF(rect.x(), rect.y()))
+        if scale != 1:
+            painter.restore()
+
+    # (grid type, zoom bracket, grid color) -> (pixmap, scale); see overlayTile()
+    overlayTiles = {}
+
+    def overlayTile(self, Zoom, GridColor):
+        """
+        Return a pixmap of one repeat of the grid or checkerboard at this
+        zoom level and color, and the scale to draw it at. They're only
+        drawn once for each zoom bracket and color.
+        """
+        if GridType == 'grid':
+            bracket = 0 if Zoom < 25 else 1 if Zoom < 50 else 2
+        else:
+            bracket = 0 if Zoom < 50 else 2
+        key = (GridType, bracket, GridColor.rgba())
+        if key in self.overlayTiles:
+            return self.overlayTiles[key]
+
+        # One repeat is 8x8 tiles
+        size = TileWidth * 8
+        tile = QtGui.QPixmap(size, size)
+        tile.fill(QtGui.QColor(0,0,0,0))
+        p = QtGui.QPainter(tile)
+        scale = 1
 
         if GridType == 'grid': # draw a classic grid
-            startx = rect.x()
-            startx -= (startx % TileWidth)
-            endx = startx + rect.width() + TileWidth
-
-            starty = rect.y()
-            starty -= (starty % TileWidth)
-            endy = starty + rect.height() + TileWidth
-
-            x = startx - TileWidth
-            while x <= endx:
-                x += TileWidth
-                if x % (TileWidth * 8) == 0:
-                    painter.setPen(QtGui.QPen(GridColor, 2 * TileWidth / 24, Qt.DashLine))
-                    drawLine(x, starty, x, endy)
-                elif x % (TileWidth * 4) == 0:
-                    if Zoom < 25: continue
-                    painter.setPen(QtGui.QPen(GridColor, 1 * TileWidth / 24, Qt.DashLine))
-                    drawLine(x, starty, x, endy)
+            majorPen = QtGui.QPen(GridColor, 2 * TileWidth / 24, Qt.DashLine)
+            mediumPen = QtGui.QPen(GridColor, 1 * TileWidth / 24, Qt.DashLine)
+            minorPen = QtGui.QPen(GridColor, 1 * TileWidth / 24, Qt.DotLine)
+
+            # The major lines are on the edges, so they're drawn on both
+            # sides so that the halves meet up when it's tiled
+            for i in range(9):
+                pos = i * TileWidth
+                if i % 8 == 0:
+                    p.setPen(majorPen)
+                elif i % 4 == 0:
+                    if bracket < 1: continue
+                    p.setPen(mediumPen)
                 else:
-                    if Zoom < 50: continue
-                    painter.setPen(QtGui.QPen(GridColor, 1 * TileWidth / 24, Qt.DotLine))
-                    drawLine(x, starty, x, endy)
-
-            y = starty - TileWidth
-            while y <= endy:
-                y += TileWidth
-                if y % (TileWidth * 8) == 0:
-                    painter.setPen(QtGui.QPen(GridColor, 2 * TileWidth / 24, Qt.DashLine))
-                    drawLine(startx, y, endx, y)
-                elif y % (TileWidth * 4) == 0 and Zoom >= 25:
-                    painter.setPen(QtGui.QPen(GridColor, 1 * TileWidth / 24, Qt.DashLine))
-                    drawLine(startx, y, endx, y)
-                elif Zoom >= 50:
-                    painter.setPen(QtGui.QPen(GridColor, 1 * TileWidth / 24, Qt.DotLine))
-                    drawLine(startx, y, endx, y)
+                    if bracket < 2: continue
+                    p.setPen(minorPen)
+                p.drawLine(pos, 0, pos, size)
+                p.drawLine(0, pos, size, pos)
 
         else: # draw a checkerboard
             L = 0.2
@@ -8726,50 +9742,30 @@ class LevelViewWidget(QtWidgets.QGraphicsView):
             Light.setAlpha(Light.alpha()*L)
             Dark.setAlpha(Dark.alpha()*D)
 
-            size = TileWidth if Zoom >= 50 else TileWidth * 8
+            # When zoomed out, the squares are 8 tiles wide instead of 1.
+            # This draws the same pattern, and then it's drawn scaled up.
+            if bracket < 2: scale = 8
 
-            board = QtGui.QPixmap(8*size, 8*size)
-            board.fill(QtGui.QColor(0,0,0,0))
-            p = QtGui.QPainter(board)
+            # A 2x2 block of 8x8 squares, alternating between light and
+            # dark, with each square a checkerboard of the dark color
+            # and nothing
             p.setPen(Qt.NoPen)
+            cell = TileWidth
+            for y in range(8):
+                for x in range(8):
+                    lightQuadrant = (x // 4) != (y // 4)
+                    if (x + y) % 2 == 0:
+                        p.setBrush(QtGui.QBrush(Dark))
+                    elif lightQuadrant:
+                        p.setBrush(QtGui.QBrush(Light))
+                    else:
+                        continue
+                    p.drawRect(x * cell, y * cell, cell, cell)
 
-            p.setBrush(QtGui.QBrush(Light))
-            for x, y in ((0, size), (size, 0)):
-                p.drawRect(x+(4*size), y,          size, size)
-                p.drawRect(x+(4*size), y+(2*size), size, size)
-                p.drawRect(x+(6*size), y,          size, size)
-                p.drawRect(x+(6*size), y+(2*size), size, size)
-
-                p.drawRect(x,          y+(4*size), size, size)
-                p.drawRect(x,          y+(6*size), size, size)
-                p.drawRect(x+(2*size), y+(4*size), size, size)
-                p.drawRect(x+(2*size), y+(6*size), size, size)
-            p.setBrush(QtGui.QBrush(Dark))
-            for x, y in ((0, 0), (size, size)):
-                p.drawRect(x,          y,          size, size)
-                p.drawRect(x,          y+(2*size), size, size)
-                p.drawRect(x+(2*size), y,          size, size)
-                p.drawRect(x+(2*size), y+(2*size), size, size)
-
-                p.drawRect(x,          y+(4*size), size, size)
-                p.drawRect(x,          y+(6*size), size, size)
-                p.drawRect(x+(2*size), y+(4*size), size, size)
-                p.drawRect(x+(2*size), y+(6*size), size, size)
-
-                p.drawRect(x+(4*size), y,          size, size)
-                p.drawRect(x+(4*size), y+(2*size), size, size)
-                p.drawRect(x+(6*size), y,          size, size)
-                p.drawRect(x+(6*size), y+(2*size), size, size)
-
-                p.drawRect(x+(4*size), y+(4*size), size, size)
-                p.drawRect(x+(4*size), y+(6*size), size, size)
-                p.drawRect(x+(6*size), y+(4*size), size, size)
-                p.drawRect(x+(6*size), y+(6*size), size, size)
-
-
-            del p
+        del p
 
-            painter.drawTiledPixmap(rect, board, QtCore.QPointF(rect.x(), rect.y()))
+        self.overlayTiles[key] = (tile, scale)
+        return tile, scale
 
 
 class InfoPreviewWidget(QtWidgets.QWidget):
@@ -12592,7 +13588,7 @@ class SatoruWindow(QtWidgets.QMainWindow):
                 self.clipboard = self.encodeObjects(clipboard_o, clipboard_s)
                 self.systemClipboard.setText(self.clipboard)
 
-        self.levelOverview.update()
+        self.levelOverview.invalidate()
         self.SelectionUpdateFlag = False
         self.ChangeSelectionHandler()
 
@@ -12772,7 +13768,7 @@ class SatoruWindow(QtWidgets.QMainWindow):
 
         OverrideSnapping = False
 
-        self.levelOverview.update()
+        self.levelOverview.invalidate()
         SetDirty()
         self.SelectionUpdateFlag = False
         self.ChangeSelectionHandler()
@@ -12956,7 +13952,7 @@ class SatoruWindow(QtWidgets.QMainWindow):
                 obj.delete()
                 obj.setSelected(False)
                 self.scene.removeItem(obj)
-                self.levelOverview.update()
+                self.levelOverview.invalidate()
                 SetDirty()
 
         if newx != 999999 and newy != 999999:
@@ -13731,6 +14727,20 @@ class SatoruWindow(QtWidgets.QMainWindow):
             setSetting('AutoSaveFilePath', 'none')
             setSetting('AutoSaveFileData', 'x')
 
+            # keep the tiles we encoded this session for next time
+            try:
+                nsmbulib.Tile.saveEncodedDataCache(getCachePath('encodedtiles.cache'))
+            except Exception:
+                print('WARNING: Could not save the encoded tile data cache')
+            try:
+                ObjectPreviews.save()
+            except Exception:
+                print('WARNING: Could not save the object preview cache')
+            try:
+                SLib.saveSpriteTypeImages(getCachePath('spriteimages.json'))
+            except Exception:
+                print('WARNING: Could not save the sprite image list')
+
             event.accept()
 
     def LoadLevel(self, game, name, isFullPath, areaNum):
@@ -13895,7 +14905,7 @@ class SatoruWindow(QtWidgets.QMainWindow):
             self.areaComboBox.addItem(trans.string('AreaCombobox', 0, '[num]', i))
         self.areaComboBox.setCurrentIndex(areaNum - 1)
 
-        self.levelOverview.update()
+        self.levelOverview.invalidate()
 
         # Scroll to the initial entrance
         startEntID = Area.startEntrance
@@ -13926,8 +14936,7 @@ class SatoruWindow(QtWidgets.QMainWindow):
         self.scene.update()
 
         self.levelOverview.Reset()
-        self.levelOverview.update()
-        QtCore.QTimer.singleShot(20, self.levelOverview.update)
+        QtCore.QTimer.singleShot(20, self.levelOverview.invalidate)
         self.updateTileCountLabel()
 
         # Set the Current Game setting
@@ -14266,7 +15275,7 @@ class SatoruWindow(QtWidgets.QMainWindow):
         if obj == self.selObj:
             if oldx == x and oldy == y: return
             SetDirty()
-        self.levelOverview.update()
+        self.levelOverview.invalidate()
 
     def CreationTabChanged(self, nt):
         """
@@ -14742,7 +15751,7 @@ class SatoruWindow(QtWidgets.QMainWindow):
             self.locationEditor.setLocation(loc)
             SetDirty()
         loc.UpdateListItem()
-        self.levelOverview.update()
+        self.levelOverview.invalidate()
 
     def HandleLocSizeChange(self, loc, width, height):
         """
@@ -14752,7 +15761,7 @@ class SatoruWindow(QtWidgets.QMainWindow):
             self.locationEditor.setLocation(loc)
             SetDirty()
         loc.UpdateListItem()
-        self.levelOverview.update()
+        self.levelOverview.invalidate()
 
     def UpdateModeInfo(self):
         """
@@ -14855,7 +15864,7 @@ class SatoruWindow(QtWidgets.QMainWindow):
                     obj.delete()
                     obj.setSelected(False)
                     self.scene.removeItem(obj)
-                    self.levelOverview.update()
+                    self.levelOverview.invalidate()
                 SetDirty()
                 event.accept()
                 self.SelectionUpdateFlag = False
@@ -15175,7 +16184,7 @@ class SatoruWindow(QtWidgets.QMainWindow):
                 z.cammode = tab.unk0E.value()
 
                 i = i + 1
-        self.levelOverview.update()
+        self.levelOverview.invalidate()
 
     # Handles setting the backgrounds
     def HandleBG(self):
@@ -15192,6 +16201,11 @@ class SatoruWindow(QtWidgets.QMainWindow):
 
         SetDirty()
 
+    # Whole-level and zone screenshots are rendered in bands of rows that
+    # take up at most this much memory each (in bytes), so that they
+    # don't need all of a possibly huge image in memory at once
+    SCREENSHOT_BAND_MEMORY = 64 * 1024 * 1024
+
     def HandleScreenshot(self):
         """
         Takes a screenshot of the entire level and saves it
@@ -15210,6 +16224,10 @@ class SatoruWindow(QtWidgets.QMainWindow):
                 RenderPainter = QtGui.QPainter(ScreenshotImage)
                 mainWindow.view.render(RenderPainter, QtCore.QRectF(0, 0, mainWindow.view.width(), mainWindow.view.height()), QtCore.QRect(QtCore.QPoint(0, 0), QtCore.QSize(mainWindow.view.width(), mainWindow.view.height())))
                 RenderPainter.end()
+
+                ScreenshotImage.save(fn, 'PNG', 50)
+                return
+
             elif dlg.zoneCombo.currentIndex() == 1:
                 maxX = maxY = 0
                 minX = minY = 0x0ddba11
@@ -15227,24 +16245,37 @@ class SatoruWindow(QtWidgets.QMainWindow):
                 minX = (0 if 40 > minX else minX-40)
                 minY = (40 if 40 > minY else minY-40)
 
-                ScreenshotImage = QtGui.QImage(int(maxX - minX), int(maxY - minY), QtGui.QImage.Format_ARGB32)
-                ScreenshotImage.fill(Qt.transparent)
+                sourceRect = QtCore.QRect(int(minX), int(minY), int(maxX - minX), int(maxY - minY))
 
-                RenderPainter = QtGui.QPainter(ScreenshotImage)
-                mainWindow.scene.render(RenderPainter, QtCore.QRectF(0, 0, int(maxX - minX), int(maxY - minY)), QtCore.QRectF(int(minX), int(minY), int(maxX - minX), int(maxY - minY)))
-                RenderPainter.end()
+            else:
+                z = Area.zones[dlg.zoneCombo.currentIndex() - 2]
+                sourceRect = QtCore.QRect(int(z.objx*TileWidth/16), int(z.objy*TileWidth/16), int(z.width*TileWidth/16), int(z.height*TileWidth/16))
 
+            self.saveSceneScreenshot(fn, sourceRect)
 
-            else:
-                i = dlg.zoneCombo.currentIndex() - 2
-                ScreenshotImage = QtGui.QImage(Area.zones[i].width*TileWidth/16, Area.zones[i].height*TileWidth/16, QtGui.QImage.Format_ARGB32)
-                ScreenshotImage.fill(Qt.transparent)
+    def saveSceneScreenshot(self, fn, sourceRect):
+        """
+        Render sourceRect of the scene to a PNG at fn, one band of rows
+        at a time (see SCREENSHOT_BAND_MEMORY)
+        """
+        width, height = sourceRect.width(), sourceRect.height()
+        if width <= 0 or height <= 0: return
+        bandHeight = max(1, min(height, self.SCREENSHOT_BAND_MEMORY // (width * 4)))
 
-                RenderPainter = QtGui.QPainter(ScreenshotImage)
-                mainWindow.scene.render(RenderPainter, QtCore.QRectF(0, 0, Area.zones[i].width*TileWidth/16, Area.zones[i].height*TileWidth/16), QtCore.QRectF(int(Area.zones[i].objx)*TileWidth/16, int(Area.zones[i].objy)*TileWidth/16, Area.zones[i].width*TileWidth/16, Area.zones[i].height*TileWidth/16))
+        Band = QtGui.QImage(width, bandHeight, QtGui.QImage.Format_RGBA8888)
+
+        with open(fn, 'wb') as f, nsmbulib.PngWriter.PngWriter(f, width, height) as png:
+            for y in range(0, height, bandHeight):
+                rows = min(bandHeight, height - y)
+                Band.fill(Qt.transparent)
+
+                RenderPainter = QtGui.QPainter(Band)
+                mainWindow.scene.render(RenderPainter, QtCore.QRectF(0, 0, width, rows), QtCore.QRectF(sourceRect.x(), sourceRect.y() + y, width, rows))
                 RenderPainter.end()
 
-            ScreenshotImage.save(fn, 'PNG', 50)
+                bits = Band.constBits()
+                bits.setsize(Band.bytesPerLine() * rows)
+                png.writeRows(bytes(bits))
 
 def main():
     """
@@ -15298,8 +16329,16 @@ def main():
     LoadNumberFont()
     LoadOverrides()
     LoadOneTileset()
+    nsmbulib.Tile.loadEncodedDataCache(getCachePath('encodedtiles.cache'))
+    global ObjectPreviews, PreviewRenderer
+    PreviewRenderer = ObjectPreviewRenderer()
+    ObjectPreviews = ObjectPreviewCache('objectpreviews', (
+        ObjectPickerListWidget.ObjectListModel.FORCED_TILE_WIDTH,
+        ObjectPickerListWidget.ObjectListModel.FORCED_MAX_WH,
+        TileWidth))
     SLib.OutlineColor = theme.color('smi')
     SLib.main()
+    SLib.loadSpriteTypeImages(getCachePath('spriteimages.json'))
 
     # Set the default window icon (used for random popups and stuff)
     app.setWindowIcon(GetIcon('satoru'))
@@ -15363,6 +16402,8 @@ if '-generatestringsxml' in sys.argv:
     ...
 
 if __name__ == '__main__':
+    # Needed for the OneTileset loader's worker processes in frozen builds
+    multiprocessing.freeze_support()
     try:
         main()
     except Exception:
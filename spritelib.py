@@ -30,7 +30,10 @@
 ################################################################
 
 # Imports
+import json
+import os
 import os.path
+import threading
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 Qt = QtCore.Qt
@@ -47,6 +50,24 @@ SpritesFolders = []
 RealViewEnabled = False
 Area = None
 
+# Lowercase image name -> path of the file it's loaded from. Files in
+# later SpritesFolders take precedence. See indexSpriteImages().
+SpriteImagePaths = {}
+_indexedFolders = None
+
+# Sprite type -> names of the images its loadImages() loads, so that
+# they can be preloaded before its sprites are made (see preloadImages()).
+# This is saved across sessions with saveSpriteTypeImages().
+SpriteTypeImages = {}
+_recordedImages = None
+
+# Path -> QImage, decoded by preloadImages() in the background. Images
+# GetImg() didn't ask for are dropped at the next preloadImages().
+PreloadedImages = {}
+_preloadPending = set()
+_preloadLock = threading.Lock()
+_preloadThread = None
+
 
 ################################################################
 ################################################################
@@ -73,28 +94,140 @@ def main():
     SpritesFolders = []
 
 
+def indexSpriteImages():
+    """
+    Find every sprite image file in satorudata/sprites and SpritesFolders.
+    Names are looked up case-insensitively, like the files themselves
+    are on Windows.
+    """
+    global _indexedFolders
+    SpriteImagePaths.clear()
+
+    for folder in ['satorudata/sprites'] + list(SpritesFolders):
+        for dirpath, dirnames, filenames in os.walk(folder):
+            subfolder = os.path.relpath(dirpath, folder).replace(os.sep, '/')
+            for fn in filenames:
+                name = fn if subfolder == '.' else subfolder + '/' + fn
+                SpriteImagePaths[name.lower()] = os.path.join(dirpath, fn)
+
+    _indexedFolders = tuple(SpritesFolders)
+
+
 def GetImg(imgname, image=False):
     """
     Returns the image path from the PNG filename imgname
     """
     imgname = str(imgname)
 
-    # Try to find the best path
-    path = 'satorudata/sprites/' + imgname
+    # SpritesFolders is changed from outside, so check if it's still
+    # the same as when the index was made
+    if _indexedFolders != tuple(SpritesFolders):
+        indexSpriteImages()
+
+    if _recordedImages is not None:
+        _recordedImages.add(imgname)
 
-    for folder in reversed(SpritesFolders): # find the most recent copy
-        tryPath = folder + '/' + imgname
-        if os.path.isfile(tryPath):
-            path = tryPath
-            break
+    path = SpriteImagePaths.get(imgname.lower())
+    if path is None:
+        raise RuntimeError('"%s" does not exist' % imgname)
+
+    # Use the preloaded image if there is one
+    if path in _preloadPending:
+        _preloadThread.join()
+    with _preloadLock:
+        preloaded = PreloadedImages.pop(path, None)
+    if preloaded is not None:
+        if image: return preloaded
+        else: return QtGui.QPixmap.fromImage(preloaded)
 
     # Return the appropriate object
-    if os.path.isfile(path):
-        if image: return QtGui.QImage(path)
-        else: return QtGui.QPixmap(path)
-    else:
-        print(os.getcwd())
-        raise RuntimeError('"%s" does not exist' % path)
+    if image: return QtGui.QImage(path)
+    else: return QtGui.QPixmap(path)
+
+
+def loadSpriteImages(type, cls):
+    """
+    Calls cls.loadImages() for the sprite type, if it hasn't been yet,
+    and remembers which images it loaded
+    """
+    global _recordedImages
+    if type in SpriteImagesLoaded: return
+
+    _recordedImages = set()
+    try:
+        cls.loadImages()
+    finally:
+        recorded, _recordedImages = _recordedImages, None
+        SpriteTypeImages[type] = sorted(recorded.union(SpriteTypeImages.get(type, ())))
+
+    SpriteImagesLoaded.add(type)
+
+
+def preloadImages(types):
+    """
+    Starts decoding the images the sprite types are known to need in a
+    background thread. GetImg() waits for them if it needs one of them
+    before the thread is done.
+    """
+    global _preloadThread
+    if _preloadThread is not None:
+        _preloadThread.join()
+
+    if _indexedFolders != tuple(SpritesFolders):
+        indexSpriteImages()
+
+    wanted = set()
+    for type in set(types):
+        if type in SpriteImagesLoaded: continue
+        for name in SpriteTypeImages.get(type, ()):
+            path = SpriteImagePaths.get(name.lower())
+            if path is not None:
+                wanted.add(path)
+
+    # Forget the images from last time that were never asked for
+    with _preloadLock:
+        for path in [path for path in PreloadedImages if path not in wanted]:
+            del PreloadedImages[path]
+        paths = wanted.difference(PreloadedImages)
+    if not paths: return
+
+    def preload():
+        # QPixmaps can only be made in the main thread, but QImages can
+        # be made anywhere
+        for path in paths:
+            img = QtGui.QImage(path)
+            with _preloadLock:
+                PreloadedImages[path] = img
+        _preloadPending.clear()
+
+    _preloadPending.update(paths)
+    _preloadThread = threading.Thread(target=preload, daemon=True)
+    _preloadThread.start()
+
+
+def loadSpriteTypeImages(path):
+    """
+    Loads SpriteTypeImages from the file at path, if it exists
+    """
+    if not os.path.isfile(path): return
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception:
+        print('WARNING: Could not load the sprite image list from ' + path)
+        return
+
+    for type, names in data.items():
+        SpriteTypeImages[int(type)] = names
+
+
+def saveSpriteTypeImages(path):
+    """
+    Saves SpriteTypeImages to the file at path
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({str(type): names for type, names in SpriteTypeImages.items()}, f)
 
 
 def loadIfNotInImageCache(name, filename):
@@ -102,6 +235,8 @@ def loadIfNotInImageCache(name, filename):
     If name is not in ImageCache, loads the image
     referenced by 'filename' and puts it there
     """
+    if _recordedImages is not None:
+        _recordedImages.add(filename)
     if name not in ImageCache:
         ImageCache[name] = GetImg(filename)
 
@@ -0,0 +1,45 @@
+import unittest
+
+from nsmbulib import Object
+from nsmbulib import ObjectSearch
+
+
+def makeObject(width, height, role, description='', decorative=False):
+    obj = Object.Object()
+    obj.width, obj.height = width, height
+    obj.role = role
+    obj.description = description
+    obj.decorative = decorative
+    return obj
+
+
+class ObjectIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        Role = Object.Object.Role
+        self.index = ObjectSearch.ObjectIndex({
+            'grassTop': makeObject(4, 1, Role.top, 'grass ledge'),
+            'grassSlope': makeObject(2, 2, Role.top_slope, 'grass slope'),
+            'castleBrick': makeObject(1, 1, Role.unknown, 'brick'),
+            'lavaPool': makeObject(8, 8, Role.unknown, 'lava', decorative=True),
+            })
+
+    def testPlainWordsDontMatchSpecialTokens(self):
+        for query in ['rol', 'role', 'siz', 'size']:
+            self.assertEqual(self.index.search(query), [], query)
+        self.assertEqual(self.index.search('grass -rol'), ['grassTop', 'grassSlope'])
+
+    def testSpecialTokens(self):
+        self.assertEqual(self.index.search('size:tiny'), ['castleBrick'])
+        self.assertEqual(self.index.search('role:top'), ['grassTop', 'grassSlope'])
+        self.assertEqual(self.index.search('grass -role:top_slope'), ['grassTop'])
+
+    def testShortPrefixes(self):
+        self.assertEqual(self.index.search('g'), ['grassTop', 'grassSlope'])
+        self.assertEqual(self.index.search('br'), ['castleBrick'])
+        self.assertEqual(self.index.search('-l'), ['grassSlope', 'castleBrick'])
+        self.assertEqual(self.index.search('q'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()